@@ -0,0 +1,131 @@
+"""Active set of the tick engine: the ranks to visit at a clock tick.
+
+The tick engine (simulator.simulate) advances the clock by one tick, but a
+rank only has something to do at a tick if
+    - its being-executed task ends at this clock
+    - it is free and has tasks in its queues, or it became free and did not
+      go idle yet
+A running rank is not visited until its task ends, its load is added at the
+end of the task (the runtime, one per executed tick). A free rank is woken
+up when its local or remote queue grows, by the length observers of the
+queues, e.g., when a balancing strategy gives it a task.
+
+The global counters (remaining tasks in the queues, running tasks) and the
+queue lengths of the ranks changed at a tick are kept incrementally, so a
+tick costs the number of ranks with an event, not the number of ranks:
+16k ranks with a few busy stragglers cost about as much as the stragglers.
+"""
+
+import heapq
+import math
+
+# -----------------------------------------------------
+# Queue lengths
+# -----------------------------------------------------
+"""Class QueueLengthTracker keeps the queue lengths of the ranks on change
+    - local_lengths, remote_lengths: from the length observers of the
+      local and remote queues
+    - num_remain_tasks: the tasks in all queues
+    - changed_lengths: {rank: queue length} of the ranks changed since the
+      last record of the queue status, for recorder.record_changes
+"""
+class QueueLengthTracker:
+    def __init__(self, local_queues, remote_queues):
+        self.local_lengths = [len(q) for q in local_queues]
+        self.remote_lengths = [len(q) for q in remote_queues]
+        self.num_remain_tasks = sum(self.local_lengths) + sum(self.remote_lengths)
+        self.changed_lengths = {}
+        for i in range(len(local_queues)):
+            local_queues[i].observe_length(i, self.update_local_length)
+            remote_queues[i].observe_length(i, self.update_remote_length)
+
+    def update_local_length(self, rank, length):
+        delta = length - self.local_lengths[rank]
+        self.local_lengths[rank] = length
+        self.update_length(rank, delta)
+
+    def update_remote_length(self, rank, length):
+        delta = length - self.remote_lengths[rank]
+        self.remote_lengths[rank] = length
+        self.update_length(rank, delta)
+
+    def update_length(self, rank, delta):
+        self.num_remain_tasks += delta
+        self.changed_lengths[rank] = self.local_lengths[rank] + self.remote_lengths[rank]
+
+    def pop_changed_lengths(self):
+        changed_lengths = self.changed_lengths
+        self.changed_lengths = {}
+        return changed_lengths
+
+# -----------------------------------------------------
+# Active set
+# -----------------------------------------------------
+"""Class ActiveSet keeps the ranks with an event and the global counters
+    - task_ends: the running ranks by the end time of their task (heap)
+    - next_ranks: the free ranks to visit at the next clock
+    - due_ranks: the ranks to visit at the current clock, in rank order
+      as the loop over all ranks (heap), a rank woken up after the rank
+      being visited is visited at this clock, otherwise at the next one
+    - num_running_tasks: the being-executed tasks
+    - the queue lengths, the remaining tasks and the changed ranks, as a
+      QueueLengthTracker
+"""
+class ActiveSet(QueueLengthTracker):
+    def __init__(self, local_queues, remote_queues, arr_being_exe_tasks):
+        super().__init__(local_queues, remote_queues)
+        num_procs = len(local_queues)
+        self.arr_being_exe_tasks = arr_being_exe_tasks
+        self.num_running_tasks = 0
+
+        # every rank is visited at the first clock
+        self.task_ends = []
+        self.next_ranks = set(range(num_procs))
+        self.due_ranks = []
+        self.due_set = set()
+        self.cur_rank = -1
+
+    def update_length(self, rank, delta):
+        super().update_length(rank, delta)
+        # a running rank or a free one with less tasks has nothing new to do
+        if delta > 0 and self.arr_being_exe_tasks[rank] is None:
+            self.wake(rank)
+
+    def wake(self, rank):
+        if rank > self.cur_rank:
+            if rank not in self.due_set:
+                self.due_set.add(rank)
+                heapq.heappush(self.due_ranks, rank)
+        else:
+            self.next_ranks.add(rank)
+
+    def start_clock(self, clock):
+        """Collect the ranks to visit at the clock, before the balancing."""
+        due_set = self.next_ranks
+        self.next_ranks = set()
+        task_ends = self.task_ends
+        while len(task_ends) != 0 and task_ends[0][0] <= clock:
+            due_set.add(heapq.heappop(task_ends)[1])
+        self.due_set = due_set
+        self.due_ranks = sorted(due_set) # a sorted list is a heap
+        self.cur_rank = -1
+
+    def next_due_rank(self):
+        """Get the next rank to visit at the current clock, -1 if none."""
+        if len(self.due_ranks) == 0:
+            return -1
+        self.cur_rank = heapq.heappop(self.due_ranks)
+        return self.cur_rank
+
+    def start_task(self, rank, task):
+        # the task ends at the first clock tick reaching its end time
+        self.num_running_tasks += 1
+        heapq.heappush(self.task_ends, (math.ceil(task.get_end_time()), rank))
+
+    def end_task(self, rank):
+        # the free rank pops a new task or goes idle at the next clock
+        self.num_running_tasks -= 1
+        self.next_ranks.add(rank)
+
+    def is_done(self):
+        return self.num_remain_tasks == 0 and self.num_running_tasks == 0
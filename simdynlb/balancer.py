@@ -1,5 +1,7 @@
-import numpy as np
 import random
+import bisect
+
+from logger import *
 
 """Balancing interface for taking decision when we migrate tasks
     - run on a separate thread
@@ -12,6 +14,7 @@ import random
     - info: e.g., 'steal_request', 'steal_accept'
     - send_time: time when the message is sent
     - recv_time: time when the message is arrived/received
+    - tasks: the tasks marked for stealing in a batch (accept messages)
 """
 class Message:
     def __init__(self, sender, receiver, info):
@@ -23,6 +26,8 @@ class Message:
         self.recv_time = 0.0
         # for marking nodes accept a request
         self.accept_rank = -1
+        # the tasks marked for a batched migration
+        self.tasks = []
             
     def set_time(self, send_time, recv_time):
         self.send_time = send_time
@@ -35,6 +40,261 @@ class Message:
         print('Message: sender({}), receiver({}), info({}), time(send-{} - recv-{})'.format(self.sender,
                 self.receiver, self.info, self.send_time, self.recv_time))
 
+"""Class LoadIndex keeps the queue lengths of all ranks for imbalance checks
+    - update(rank, length) on each change of a queue length, e.g., as an
+      observer of the queues (task.LengthObservers)
+    - the running sum and the sorted distinct lengths give Rimb in O(1)
+    - the ranks are bucketed by length in sorted lists, iter_ascending/
+      iter_descending give the k least/most loaded ranks in O(k), ties
+      ordered by rank
+"""
+class LoadIndex:
+    def __init__(self, queue_lengths):
+        self.lengths = list(queue_lengths)
+        self.num_procs = len(self.lengths)
+        self.total = sum(self.lengths)
+        self.buckets = {}
+        for r in range(self.num_procs):
+            self.buckets.setdefault(self.lengths[r], []).append(r)
+        self.sorted_lengths = sorted(self.buckets)
+
+    def update(self, rank, length):
+        old_length = self.lengths[rank]
+        if old_length == length:
+            return
+        self.lengths[rank] = length
+        self.total += length - old_length
+
+        # move the rank to the bucket of its new length
+        bucket = self.buckets[old_length]
+        del bucket[bisect.bisect_left(bucket, rank)]
+        if len(bucket) == 0:
+            del self.buckets[old_length]
+            del self.sorted_lengths[bisect.bisect_left(self.sorted_lengths, old_length)]
+        bucket = self.buckets.get(length)
+        if bucket is None:
+            bucket = self.buckets[length] = []
+            bisect.insort(self.sorted_lengths, length)
+        bisect.insort(bucket, rank)
+
+    def get_min_length(self):
+        return self.sorted_lengths[0]
+
+    def get_max_length(self):
+        return self.sorted_lengths[-1]
+
+    def get_rimb(self):
+        """Get [Rimb_avg, Rimb_minmax] as in check_imbalance_status."""
+        lmin = self.sorted_lengths[0]
+        lmax = self.sorted_lengths[-1]
+        lavg = self.total / self.num_procs
+        Rimb_avg = 0.0
+        Rimb_minmax = 0.0
+        if lavg != 0 and lmax != 0:
+            Rimb_avg = (lmax - lavg) / lavg
+            Rimb_minmax = (lmax - lmin) / lmax
+        return [Rimb_avg, Rimb_minmax]
+
+    def iter_ascending(self):
+        # the least loaded ranks first
+        for length in self.sorted_lengths:
+            for r in self.buckets[length]:
+                yield r
+
+    def iter_descending(self):
+        # the most loaded ranks first
+        for length in reversed(self.sorted_lengths):
+            for r in reversed(self.buckets[length]):
+                yield r
+
+"""Class RankSet is a set of ranks with a random choice in O(1)
+    - the ranks are kept in a list with their positions, a removed rank
+      is swapped with the last one
+    - sample(k) picks k distinct ranks in O(k), reordering the list
+"""
+class RankSet:
+    def __init__(self, ranks=()):
+        self.ranks = []
+        self.pos = {}
+        for r in ranks:
+            self.add(r)
+
+    def add(self, rank):
+        if rank not in self.pos:
+            self.pos[rank] = len(self.ranks)
+            self.ranks.append(rank)
+
+    def discard(self, rank):
+        idx = self.pos.pop(rank, None)
+        if idx is not None:
+            last = self.ranks.pop()
+            if last != rank:
+                self.ranks[idx] = last
+                self.pos[last] = idx
+
+    def sample(self, k):
+        ranks = self.ranks
+        for j in range(k):
+            idx = random.randrange(j, len(ranks))
+            ranks[j], ranks[idx] = ranks[idx], ranks[j]
+            self.pos[ranks[j]] = j
+            self.pos[ranks[idx]] = idx
+        return ranks[:k]
+
+    def __contains__(self, rank):
+        return rank in self.pos
+
+    def __len__(self):
+        return len(self.ranks)
+
+    def __iter__(self):
+        return iter(self.ranks)
+
+"""Class StealIndex keeps the state of the work-stealing protocol
+    - idle_ranks (empty queues) and busy_ranks (more than
+      MIN_TASKS_IN_QUEUE_FOR_STEAL tasks), from the queue lengths given by
+      update(rank, length), e.g., as an observer of the local queues
+    - the requests not sent yet, the arrived ones waiting for an accept,
+      and the accept messages arrived at this clock; the messages are sent
+      over the network, which delivers them by callbacks
+    - the ranks stealing a task and the ranks with tasks marked for stealing
+    - with a topology, the busy ranks per node and per switch, so
+      pair_closest(idle_ranks) pairs idle ranks with the closest busy ranks
+      in O(idle ranks)
+The changed ranks are classified by sync(), in rank order, so the sets are
+the same whatever the order of the queue changes within a clock.
+"""
+class StealIndex:
+    def __init__(self, queue_lengths, network, topology=None):
+        self.lengths = list(queue_lengths)
+        self.network = network
+        self.topology = topology
+        self.idle_ranks = RankSet()
+        self.busy_ranks = RankSet()
+        self.busy_groups = []
+        if topology is not None:
+            self.busy_groups = [(topology.node_of, {}), (topology.switch_of, {})]
+        self.changed_ranks = set(range(len(self.lengths)))
+        self.unrequested_ranks = set()
+        self.requesting_ranks = set()
+        self.waiting_ranks = RankSet()
+        self.arrived_accepts = set()
+        self.accepting_ranks = set()
+        self.stealing_ranks = set()
+        self.marked_ranks = set()
+        self.sync()
+
+    def update(self, rank, length):
+        self.lengths[rank] = length
+        # longer queues stay busy, no need to reclassify them
+        if length <= MIN_TASKS_IN_QUEUE_FOR_STEAL + 1:
+            self.changed_ranks.add(rank)
+
+    def sync(self):
+        if len(self.changed_ranks) == 0:
+            return
+        for r in sorted(self.changed_ranks):
+            length = self.lengths[r]
+            if length == 0:
+                self.idle_ranks.add(r)
+                if r not in self.requesting_ranks:
+                    self.unrequested_ranks.add(r)
+            else:
+                self.idle_ranks.discard(r)
+                self.unrequested_ranks.discard(r)
+            if length > MIN_TASKS_IN_QUEUE_FOR_STEAL:
+                self.add_busy(r)
+            else:
+                self.discard_busy(r)
+        self.changed_ranks.clear()
+
+    def add_busy(self, rank):
+        self.busy_ranks.add(rank)
+        for placement, groups in self.busy_groups:
+            group = groups.get(placement[rank])
+            if group is None:
+                group = groups[placement[rank]] = RankSet()
+            group.add(rank)
+
+    def discard_busy(self, rank):
+        self.busy_ranks.discard(rank)
+        for placement, groups in self.busy_groups:
+            group = groups.get(placement[rank])
+            if group is not None:
+                group.discard(rank)
+
+    def pair_closest(self, idle_ranks):
+        """Pair the idle ranks with random busy ranks on their node first,
+        then on their switch, then anywhere, as (busy, idle) pairs. There
+        should be no more idle ranks than busy ones."""
+        pairs = []
+        for placement, groups in self.busy_groups + [(None, None)]:
+            unpaired_ranks = []
+            for idle_rank in idle_ranks:
+                group = self.busy_ranks if groups is None else groups.get(placement[idle_rank])
+                if group is not None and len(group) != 0:
+                    # a paired busy rank is out of the groups until the end
+                    busy_rank = group.sample(1)[0]
+                    self.discard_busy(busy_rank)
+                    pairs.append((busy_rank, idle_rank))
+                else:
+                    unpaired_ranks.append(idle_rank)
+            idle_ranks = unpaired_ranks
+            if len(idle_ranks) == 0:
+                break
+        for busy_rank, idle_rank in pairs:
+            self.add_busy(busy_rank)
+        return pairs
+
+    def send_request(self, clock, request_msg):
+        self.unrequested_ranks.discard(request_msg.sender)
+        self.requesting_ranks.add(request_msg.sender)
+        return self.network.send(clock, request_msg, on_delivery=self.on_request_delivery)
+
+    def on_request_delivery(self, clock, request_msg):
+        self.waiting_ranks.add(request_msg.sender)
+
+    def send_accept(self, clock, accept_msg):
+        self.waiting_ranks.discard(accept_msg.receiver)
+        self.accepting_ranks.add(accept_msg.sender)
+        return self.network.send(clock, accept_msg, on_delivery=self.on_accept_delivery)
+
+    def on_accept_delivery(self, clock, accept_msg):
+        if accept_msg.recv_time == clock:
+            self.arrived_accepts.add(accept_msg.sender)
+
+    def pop_arrived_accepts(self):
+        arrived = sorted(self.arrived_accepts)
+        self.arrived_accepts.clear()
+        return arrived
+
+    def remove_steal(self, idle_rank, busy_rank, arr_accept_msg):
+        self.requesting_ranks.discard(idle_rank)
+        self.stealing_ranks.discard(idle_rank)
+        if len(arr_accept_msg[busy_rank]) == 0:
+            self.accepting_ranks.discard(busy_rank)
+
+"""Class OffloadIndex keeps the state of reactive offloading
+    - offloader_ranks: the ranks with offloader-victim pairs to process
+    - marked_ranks: the ranks with tasks marked for offloading, dropped
+      when offload_tasks finds no marked task left in their queue
+    - buffered_ranks: the victims with migrated tasks in their buffer,
+      from the buffer lengths given by update(rank, length), e.g., as an
+      observer of the buffers
+So the offloading steps visit these ranks only, not all ranks.
+"""
+class OffloadIndex:
+    def __init__(self):
+        self.offloader_ranks = set()
+        self.marked_ranks = set()
+        self.buffered_ranks = set()
+
+    def update(self, rank, length):
+        if length == 0:
+            self.buffered_ranks.discard(rank)
+        else:
+            self.buffered_ranks.add(rank)
+
 # -----------------------------------------------------
 # Constant Definition
 # -----------------------------------------------------
@@ -42,245 +302,121 @@ MIN_REL_LOAD_IMBALANCE = 0.05
 MIN_TASKS_IN_QUEUE_FOR_OFFLOAD = 2
 MIN_TASKS_IN_QUEUE_FOR_STEAL = 2
 MIN_ABS_LOAD_DIFFERENCE = 2
-LATENCY = 2
 
 # -----------------------------------------------------
 # Util Functions
 # -----------------------------------------------------
-def check_imbalance_status(clock, local_queues, arr_being_exe_tasks):
-    num_procs = len(local_queues)
-    num_tasks_being_executed = 0
-    queue_sizes = []
-    for i in range(num_procs):
-        queue_sizes.append(len(local_queues[i]))
-        if arr_being_exe_tasks[i] != None:
-            num_tasks_being_executed += 1
-
-    # calculate Rimb
-    lmin = np.min(queue_sizes)
-    lmax = np.max(queue_sizes)
-    lavg = np.average(queue_sizes)
-    Rimb_avg = 0.0
-    Rimb_minmax = 0.0
-    if lavg != 0 and lmax != 0:
-        Rimb_avg = (lmax - lavg) / lavg
-        Rimb_minmax = (lmax - lmin) / lmax
-
-    # show queue status
-    # print("[Tcomm] Clock[{}], Rimb_minmax={:5.2f}, Q_size=[{},{},{},{},{},{},{},{}]".format(clock, Rimb_minmax, 
-    #     queue_sizes[0], queue_sizes[1], queue_sizes[2], queue_sizes[3],
-    #     queue_sizes[4], queue_sizes[5], queue_sizes[6], queue_sizes[7]))
-
-    return Rimb_minmax
-
-def check_queue_status(clock, num_procs, local_queues):
-    arr_empty_queues = []
-    arr_busy_queues = []
-    for r in range(num_procs):
-        current_rank = r
-        queue_size = len(local_queues[r])
-        if queue_size == 0:
-            arr_empty_queues.append([current_rank, queue_size])
-        elif queue_size > MIN_TASKS_IN_QUEUE_FOR_STEAL:
-            arr_busy_queues.append([current_rank, queue_size])
-    return [arr_empty_queues, arr_busy_queues]
-
-
-def exchange_steal_request(clock, arr_queue_status, arr_request_msg, arr_accept_msg):
-    # check empty and busy queues
-    empty_queues = arr_queue_status[0]
-    busy_queues = arr_queue_status[1]
-
-    # -------------------------------------
-    # IDLE processes
-    # -------------------------------------
-    if len(empty_queues) != 0 and len(busy_queues) != 0:
-        for i in range(len(empty_queues)):
-            idle_rank = empty_queues[i][0]
-            # check if this rank has not sent any requests
-            if len(arr_request_msg[idle_rank]) == 0:
-                request_msg = Message(idle_rank, -1, 'steal_request')
-                request_msg.set_time(clock, clock+LATENCY)
-                arr_request_msg[idle_rank].append(request_msg)
-                print('[DEBUG] Clock {:5d}: R{:2d} SENDS steal_request (sent at {:5d}, will recv at {:5d})\n'.format(
-                        clock, idle_rank, clock, clock+LATENCY
-                ))
-                
-            # check if this rank has already sent a request but not selected, then we re-send it
-            else:
-                checkout_req_msg = arr_request_msg[idle_rank][0]
-                if checkout_req_msg.info == 'steal_request' and checkout_req_msg.recv_time < clock:
-                    checkout_req_msg.set_time(clock, clock) # renew time
-                    print('[DEBUG] Clock {:5d}: R{:2d} RE-SENDS steal_request (sent at {:5d}, will recv at {:5d})\n'.format(
-                            clock, idle_rank, checkout_req_msg.send_time, checkout_req_msg.recv_time
-                    ))
-
-        # -------------------------------------
-        # BUSY processes
-        # -------------------------------------
-        # check ranks with the current steal-request message has been sent and arrived
-        list_idle_ranks = []
-        for i in range(len(arr_request_msg)):
-            if len(arr_request_msg[i]) != 0:
-                req_msg = arr_request_msg[i][0]
-                if req_msg.info == 'steal_request' and req_msg.recv_time == clock:
-                    list_idle_ranks.append(i)
-
-        # check busy ranks available
-        list_busy_ranks = []
-        for i in range(len(busy_queues)):
-            busy_rank = busy_queues[i][0]
-            list_busy_ranks.append(busy_rank)
-
-        # check all pairs of idle and busy ranks
-        while len(list_busy_ranks) != 0 and len(list_idle_ranks) != 0:
-
-            # random choose a busy candidate
-            busy_candidate = random.choice(list_busy_ranks)
-            busy_candidate_queue_size = busy_queues[busy_candidate][1]
-
-            # exchange request and accept messages
-            if len(list_idle_ranks) != 0 and busy_candidate_queue_size >= MIN_TASKS_IN_QUEUE_FOR_STEAL:
-                idle_candidate = random.choice(list_idle_ranks)
-                checkout_req_msg = arr_request_msg[idle_candidate][0]
-                if checkout_req_msg.info == 'accepted':
-                    accept_rank = checkout_req_msg.accept_rank
-                    checkout_ack_msg = arr_accept_msg[accept_rank][0]
-                    arrival_time = checkout_ack_msg.recv_time
-                    if arrival_time < clock:
-                        if accept_rank != busy_candidate:
-                            # new accept for the current busy candidate
-                            new_accept_msg = Message(busy_candidate, idle_candidate, 'steal_accept')
-                            new_accept_msg.set_time(clock, clock+LATENCY)
-                            arr_accept_msg[busy_candidate].append(new_accept_msg)
-                            # removed the expired accept for the old accept rankt
-                            arr_accept_msg[accept_rank].pop(0)
-                            print('[DEBUG] Clock {:5d}: R{:2d} CONFIRMS accept for R{:2d} (sent at {:5d}, will recv at {:5d})\n'.format(
-                                clock, busy_candidate, idle_candidate, clock, clock+LATENCY))
-                        else:
-                            # only need to change the time
-                            checkout_ack_msg.set_time(clock, clock+LATENCY)
-                            print('[DEBUG] Clock {:5d}: R{:2d} CHANGES accept for R{:2d} (sent at {:5d}, will recv at {:5d})\n'.format(
-                                clock, busy_candidate, idle_candidate, clock, clock+LATENCY))
-                        
-                        # remove the processed busy and idle candidates
-                        list_idle_ranks.remove(idle_candidate)
-                        list_busy_ranks.remove(busy_candidate)
-                else:
-                    # because not yet get accepted, we creat the 1st accept now
-                    accept_msg = Message(busy_candidate, idle_candidate, 'steal_accept')
-                    accept_msg.set_time(clock, clock+LATENCY)
-                    arr_accept_msg[busy_candidate].append(accept_msg)
-                    # change the status of request
-                    checkout_req_msg.info = "accepted"
-                    checkout_req_msg.set_accept_proc(busy_candidate)
-                    print('[DEBUG] Clock {:5d}: R{:2d} CONFIRMS accept for R{:2d} (sent at {:5d}, will recv at {:5d})\n'.format(
-                        clock, busy_candidate, idle_candidate, clock, clock+LATENCY))
-                    
-                    # remove the processed busy and idle candidates
-                    list_idle_ranks.remove(idle_candidate)
-                    list_busy_ranks.remove(busy_candidate)
-
-
-def recv_steal_accept(clock, arr_queue_status, arr_request_msg, arr_accept_msg):
-
-    # side of processes with EMPTY queue
-    empty_queues = arr_queue_status[0]
-    if len(empty_queues) != 0:
-
-        # list for marking all accepted ranks per requested rank
-        list_accepted_ranks = []
-        for i in range(len(arr_request_msg)):
-            list_accepted_ranks.append([])
-
-        # list all available idle ranks
-        list_idle_ranks = []
-        for i in range(len(empty_queues)):
-            idle_rank = empty_queues[i][0]
-            list_idle_ranks.append(idle_rank)
-
-        # list all available and accepted busy ranks, but we need 
-        # to check the request messages not the accept messages
-        list_busy_ranks = []
-        for i in range(len(arr_accept_msg)):
-            if len(arr_accept_msg[i]) != 0:
-
-                checkout_accept_msg = arr_accept_msg[i][0]
-                arrived_time = checkout_accept_msg.recv_time
-                selected_idle_rank = checkout_accept_msg.receiver
-
-                if clock < 19200:
-                    print('Clock {:5d}: Idle R{:2d} acc_msg.info={}, acc_msg.arr={}, receiver={}'.format(clock, i, 
-                                                        checkout_accept_msg.info, arrived_time, selected_idle_rank))
-                
-                if arrived_time == clock and selected_idle_rank in list_idle_ranks:
-                    list_busy_ranks.append(i)
-                    list_accepted_ranks[selected_idle_rank].append(i)
-        
-        # check one-by-one idle ranks
-        for i in list_idle_ranks:
-            if len(list_accepted_ranks[i]) != 0 and len(list_busy_ranks) != 0:
-                busy_candidate = random.choice(list_accepted_ranks[i])
-                # check the request and accept messages
-                checkout_acc_msg = arr_accept_msg[busy_candidate][0]
-                checkout_acc_msg.info = 'sending_task'
-                checkout_req_msg = arr_request_msg[i][0]
-                checkout_req_msg.info = 'stealing_task'
-                checkout_req_msg.set_accept_proc(busy_candidate)
-                print('[DEBUG] Clock {:5d}: R{:2d} will STEAL task from R{:2d}'.format(clock, i, busy_candidate))
-                # remove the busy candidate from list_busy_ranks
-                list_busy_ranks.remove(busy_candidate)
-
+def check_imbalance_status(clock, load_index):
+    # the index keeps the queue lengths up to date, Rimb_minmax in O(1)
+    return load_index.get_rimb()[1]
+
+def exchange_steal_request(clock, steal_index, arr_request_msg, arr_accept_msg):
+    """Exchange the steal requests and accepts, with the ranks from the
+    index: idle ranks send a request, busy ranks accept the arrived ones.
+    The cost is the number of new requests and accepted pairs, not the
+    number of ranks. With a topology in the index, the idle ranks are
+    paired with the closest busy ranks first."""
+    if len(steal_index.idle_ranks) == 0 or len(steal_index.busy_ranks) == 0:
+        return
+
+    # idle ranks send their requests
+    for idle_rank in sorted(steal_index.unrequested_ranks):
+        request_msg = Message(idle_rank, -1, 'steal_request')
+        arr_request_msg[idle_rank].append(request_msg)
+        recv_time = steal_index.send_request(clock, request_msg)
+        if BALANCER_LOG.debug:
+            BALANCER_LOG.write(LOG_DEBUG, clock, 'send_request', idle_rank, clock, recv_time)
+
+    # busy ranks accept the arrived requests, random pairs
+    num_pairs = min(len(steal_index.busy_ranks), len(steal_index.waiting_ranks))
+    if steal_index.topology is None:
+        busy_candidates = steal_index.busy_ranks.sample(num_pairs)
+        idle_candidates = steal_index.waiting_ranks.sample(num_pairs)
+        pairs = zip(busy_candidates, idle_candidates)
+    else:
+        idle_candidates = steal_index.waiting_ranks.sample(num_pairs)
+        pairs = steal_index.pair_closest(idle_candidates)
+    for busy_candidate, idle_candidate in pairs:
+        checkout_req_msg = arr_request_msg[idle_candidate][0]
+        # a request not accepted before is re-sent at this clock
+        if checkout_req_msg.recv_time < clock:
+            checkout_req_msg.set_time(clock, clock)
+        accept_msg = Message(busy_candidate, idle_candidate, 'steal_accept')
+        arr_accept_msg[busy_candidate].append(accept_msg)
+        checkout_req_msg.info = "accepted"
+        checkout_req_msg.set_accept_proc(busy_candidate)
+        recv_time = steal_index.send_accept(clock, accept_msg)
+        if BALANCER_LOG.debug:
+            BALANCER_LOG.write(LOG_DEBUG, clock, 'confirm_accept', busy_candidate, idle_candidate, clock, recv_time)
+
+
+def recv_steal_accept(clock, steal_index, arr_request_msg, arr_accept_msg):
+    """Receive the accepts, an idle rank starts to steal from one of the
+    busy ranks accepting its request. Only the accepts delivered at this
+    clock are checked."""
+    arrived_accepts = steal_index.pop_arrived_accepts()
+    if len(steal_index.idle_ranks) == 0:
+        return
+
+    if BALANCER_LOG.trace:
+        for i in sorted(steal_index.accepting_ranks):
+            checkout_accept_msg = arr_accept_msg[i][0]
+            BALANCER_LOG.write(LOG_TRACE, clock, 'accept_status', i, checkout_accept_msg.info,
+                                checkout_accept_msg.recv_time, checkout_accept_msg.receiver)
+
+    # the busy ranks accepted per idle rank
+    list_accepted_ranks = {}
+    for i in arrived_accepts:
+        checkout_accept_msg = arr_accept_msg[i][0]
+        selected_idle_rank = checkout_accept_msg.receiver
+        if checkout_accept_msg.recv_time == clock and selected_idle_rank in steal_index.idle_ranks:
+            list_accepted_ranks.setdefault(selected_idle_rank, []).append(i)
+
+    for i in sorted(list_accepted_ranks):
+        busy_candidates = list_accepted_ranks[i]
+        busy_candidate = busy_candidates[0]
+        if len(busy_candidates) > 1:
+            busy_candidate = random.choice(busy_candidates)
+        checkout_acc_msg = arr_accept_msg[busy_candidate][0]
+        checkout_acc_msg.info = 'sending_task'
+        checkout_req_msg = arr_request_msg[i][0]
+        checkout_req_msg.info = 'stealing_task'
+        checkout_req_msg.set_accept_proc(busy_candidate)
+        steal_index.stealing_ranks.add(i)
+        if BALANCER_LOG.debug:
+            BALANCER_LOG.write(LOG_DEBUG, clock, 'start_steal', i, busy_candidate)
 
-# -----------------------------------------------------
-# Debug Functions
-# -----------------------------------------------------
-def show_sorted_load(clock, sortLCQ, local_queues):
-    str_R = ""
-    str_L = ""
-    for i in sortLCQ:
-        str_R += str(i) + ","
-        str_L += str(len(local_queues[i])) + ","
-    print("[Tcomm] clock[{}]: R{}, L={}...".format(clock, str_R, str_L))
 
 # -----------------------------------------------------
 # Balancing Functions
 # -----------------------------------------------------
-
-def react_task_offloading(clock, num_procs, Rimb, local_queues, arr_num_tasks_before_execution, arr_victim_offloader):
-    
-    # check the imb condition
-    if Rimb >= MIN_REL_LOAD_IMBALANCE:
-
-        # check queue sizes
-        queue_sizes = []
-        for i in range(num_procs):
-            queue_sizes.append(len(local_queues[i]))
-
-        # sort the queue sizes
-        sortLCQ = np.argsort(queue_sizes)
-        # show_sorted_load(clock, sortLCQ, local_queues)
-        
-        # select offloader-victim
-        for i in range(int(num_procs/2), num_procs):
-            offloader_rank = sortLCQ[i]
-            victim_rank = sortLCQ[num_procs-i-1]
-
-            offloader_qsize = len(local_queues[offloader_rank])
-            victim_qsize = len(local_queues[victim_rank])
-
-            diff_load = abs(offloader_qsize - victim_qsize)
-
-            # check the number of selected tasks for migration at the moment
-            num_offload_candidates = len(arr_victim_offloader[offloader_rank])
-
-            # if ok, select more tasks for offloading
-            if diff_load > MIN_ABS_LOAD_DIFFERENCE and \
-                offloader_qsize > MIN_TASKS_IN_QUEUE_FOR_OFFLOAD and \
-                num_offload_candidates < arr_num_tasks_before_execution[offloader_rank]:
-
-                # a pair of offloader-victim
-                offload_victim = [offloader_rank, victim_rank]
-                arr_victim_offloader[offloader_rank].append(offload_victim)
-                # print("[Tcomm] clock[{}]: offloader={}, victim={}...".format(clock, off_vic[0], off_vic[1]))
-    return 0
\ No newline at end of file
+def react_task_offloading(clock, num_procs, Rimb, load_index, arr_num_tasks_before_execution, arr_victim_offloader,
+                            offload_index):
+    """Select the offloader-victim pairs from the most/least loaded ranks
+    inwards, if the queues are imbalanced. The load difference and the
+    offloader queue size only decrease inwards, so the walk stops at the
+    first pair below the thresholds, the cost is the number of selected
+    pairs. The offloaders are added to the offload index."""
+    if Rimb < MIN_REL_LOAD_IMBALANCE:
+        return 0
+
+    num_pairs = num_procs - int(num_procs/2)
+    offloaders = load_index.iter_descending()
+    victims = load_index.iter_ascending()
+    for i in range(num_pairs):
+        offloader_rank = next(offloaders)
+        victim_rank = next(victims)
+
+        offloader_qsize = load_index.lengths[offloader_rank]
+        victim_qsize = load_index.lengths[victim_rank]
+        diff_load = abs(offloader_qsize - victim_qsize)
+        if diff_load <= MIN_ABS_LOAD_DIFFERENCE or offloader_qsize <= MIN_TASKS_IN_QUEUE_FOR_OFFLOAD:
+            break
+
+        # check the number of selected tasks for migration at the moment
+        num_offload_candidates = len(arr_victim_offloader[offloader_rank])
+        if num_offload_candidates < arr_num_tasks_before_execution[offloader_rank]:
+            offload_victim = [offloader_rank, victim_rank]
+            arr_victim_offloader[offloader_rank].append(offload_victim)
+            offload_index.offloader_ranks.add(offloader_rank)
+    return 0
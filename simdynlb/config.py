@@ -0,0 +1,204 @@
+"""Scenarios of the simulator, read from json files without pandas.
+
+A scenario is the context of a simulation. Its values are typed and checked
+by SCENARIO_FIELDS, the missing optional values get their defaults, and an
+unknown value is an error (e.g., a typo in a key). A file holds:
+    - one scenario: {"context_info": {...}}
+    - many scenarios: {"defaults": {...}, "scenarios": [{...}, ...]}, the
+      defaults are shared by all scenarios, a scenario can have a "name"
+    - a scenario and sweep axes: {"context_info": {...}, "sweep": {"noise":
+      [0, 1, 2], ...}}, one scenario per point of the grid
+so a batch of scenarios is parsed once and run in one process. The points of
+a grid are made by make_sweep_points, for the scenarios of a file as for the
+points of sweep.py: any scenario value is an axis, the points are the product
+of the axes in their order. A trace_file replaces num_tasks_per_rank, it is
+required only without one.
+
+  Typical usage example:
+  for scenario in load_scenarios('context_input.json'):
+      init_res = init_simulation(scenario)
+"""
+
+import itertools
+import json
+
+from strategies import *
+from migrator import *
+
+# -----------------------------------------------------
+# Constant Definition
+# -----------------------------------------------------
+REQUIRED = 'required' # default of the values a scenario must have
+NUMBER = (int, float)
+TRACE_REPLACED_FIELDS = ['num_tasks_per_rank'] # required only without a trace_file
+
+# name: (type, default, check), the check is None, 'positive', 'non-negative',
+# a list of the allowed values or a function raising a ValueError
+SCENARIO_FIELDS = {
+    'balancing_ops_cost':      (NUMBER, REQUIRED, 'non-negative'),
+    'clock_rate':              (NUMBER, REQUIRED, 'positive'),
+    'execution_rate':          (NUMBER, 1, 'positive'),
+    'migration_delay_cost':    (NUMBER, REQUIRED, 'non-negative'),
+    'noise':                   (NUMBER, REQUIRED, 'non-negative'),
+    'num_iterations':          (int, REQUIRED, 'positive'),
+    'num_process':             (int, REQUIRED, 'positive'),
+    'num_slowdown_rank':       (int, REQUIRED, 'non-negative'),
+    'num_tasks_per_rank':      (int, REQUIRED, 'non-negative'),
+    'slowdown_scale':          (NUMBER, REQUIRED, 'positive'),
+    # balancing strategies, e.g., "work_stealing,react_offloading"
+    'balancing_strategy':      (str, 'none', parse_balancing_strategies),
+    # network of the messages (network.py)
+    'network_latency':         (NUMBER, 2, 'non-negative'),
+    'network_bandwidth':       (NUMBER, None, 'positive'),
+    'network_latency_file':    (str, None, None),
+    'migration_cost_system':   (str, None, None),
+    'migration_cost_file':     (str, None, None),
+    # migrated tasks per handshake (migrator.py)
+    'migration_batch_size':    (int, 1, 'positive'),
+    'migration_batch_policy':  (str, 'diff', MIGRATION_BATCH_POLICIES),
+    # random streams (rng.py) and rank performance (performance.py)
+    'random_seed':             (int, 0, 'non-negative'),
+    'perf_model':              (str, None, None),
+    'perf_epoch':              (NUMBER, 1.0, 'positive'),
+    'runtime_multiplier_file': (str, None, None),
+    # task runtimes and their generation (workload.py)
+    'task_distribution':       (str, 'constant', None),
+    'task_dur_low':            (NUMBER, 0.5, 'positive'),
+    'task_dur_high':           (NUMBER, 1.5, 'positive'),
+    'task_dur_sigma':          (NUMBER, 0.5, 'non-negative'),
+    'imbalance_ratio':         (NUMBER, 1.0, 'non-negative'),
+    'workload_generation':     (str, 'auto', None),
+    'task_block_size':         (int, 4096, 'positive'),
+    # recorded task runtimes instead of a distribution (replay.py)
+    'trace_file':              (str, None, None),
+    # ranks on nodes on switches, the costs per level (topology.py)
+    'ranks_per_node':          (int, None, 'positive'),
+    'nodes_per_switch':        (int, None, 'positive'),
+    'intra_node_cost_scale':   (NUMBER, 0.1, 'positive'),
+    'intra_switch_cost_scale': (NUMBER, 1.0, 'positive'),
+    'inter_switch_cost_scale': (NUMBER, 1.0, 'positive')
+}
+
+# -----------------------------------------------------
+# Util Functions
+# -----------------------------------------------------
+def check_value(key, value, types, check):
+    # bool is an int in python, but not a number of a scenario
+    if isinstance(value, bool) or not isinstance(value, types):
+        if types is int and isinstance(value, float) and value.is_integer():
+            value = int(value)
+        else:
+            raise ValueError('scenario value {} should be {}, got {!r}'.format(key, get_type_name(types), value))
+    if check == 'positive' and value <= 0:
+        raise ValueError('scenario value {} should be positive, got {}'.format(key, value))
+    if check == 'non-negative' and value < 0:
+        raise ValueError('scenario value {} should be non-negative, got {}'.format(key, value))
+    if isinstance(check, list) and value not in check:
+        raise ValueError('unknown {} {}, should be one of {}'.format(key, value, check))
+    if callable(check):
+        check(value)
+    return value
+
+def get_type_name(types):
+    if types is NUMBER:
+        return 'a number'
+    return {int: 'an integer', str: 'a string'}[types]
+
+def make_sweep_points(sweep):
+    """The points {axis: value} of the sweep axes {axis: [v1, v2, ...]}."""
+    axes = list(sweep.keys())
+    for axis in axes:
+        if axis not in SCENARIO_FIELDS:
+            raise ValueError('unknown sweep axis {}, should be a scenario value'.format(axis))
+    return [dict(zip(axes, point)) for point in itertools.product(*[sweep[a] for a in axes])]
+
+def get_sweep_point_name(point):
+    return '_'.join('{}{}'.format(a, v) for a, v in point.items())
+
+def make_sweep_scenarios(values, sweep, name=None):
+    """One scenario per point of the sweep axes {axis: [v1, v2, ...]}."""
+    scenarios = []
+    for point in make_sweep_points(sweep):
+        point_values = dict(values)
+        point_values.update(point)
+        point_name = get_sweep_point_name(point)
+        if name is not None:
+            point_name = name + '_' + point_name
+        scenarios.append(Scenario(point_values, point_name))
+    return scenarios
+
+def parse_scenarios(config):
+    """Parse the scenarios of a config as read from a json file."""
+    if 'scenarios' in config:
+        defaults = config.get('defaults', {})
+        scenarios = []
+        for i, values in enumerate(config['scenarios']):
+            scenario_values = dict(defaults)
+            scenario_values.update(values)
+            name = scenario_values.pop('name', 'scenario{}'.format(i))
+            scenarios.append(Scenario(scenario_values, name))
+        return scenarios
+    if 'context_info' not in config:
+        raise ValueError('a scenario file should have "context_info" or "scenarios"')
+    if 'sweep' in config:
+        return make_sweep_scenarios(config['context_info'], config['sweep'])
+    return [Scenario(config['context_info'])]
+
+def read_config_file(filename):
+    with open(filename) as f:
+        return json.load(f)
+
+def load_scenarios(filename):
+    """Load the scenarios of a json file, see the formats above."""
+    return parse_scenarios(read_config_file(filename))
+
+"""Class Scenario holds the checked values of a simulation context
+    - the values as attributes, e.g., scenario.num_process
+    - get(key, default): the value, or the default if it is not set, as
+      the dict of the context_info
+    - to_dict(): the values, e.g., to make the points of a sweep
+"""
+class Scenario:
+    def __init__(self, values, name=None):
+        for key in values:
+            if key not in SCENARIO_FIELDS:
+                raise ValueError('unknown scenario value {}, should be one of {}'.format(
+                                    key, list(SCENARIO_FIELDS.keys())))
+        self.name = name
+        self.values = {}
+        for key, (types, default, check) in SCENARIO_FIELDS.items():
+            value = values.get(key, None)
+            if value is None:
+                value = default
+            if value is REQUIRED and key in TRACE_REPLACED_FIELDS and values.get('trace_file', None) is not None:
+                value = None
+            if value is REQUIRED:
+                raise ValueError('missing scenario value {}'.format(key))
+            if value is not None:
+                value = check_value(key, value, types, check)
+            self.values[key] = value
+            setattr(self, key, value)
+        if self.num_slowdown_rank > self.num_process:
+            raise ValueError('num_slowdown_rank {} should be at most num_process {}'.format(
+                                self.num_slowdown_rank, self.num_process))
+
+    def get(self, key, default=None):
+        value = self.values.get(key, None)
+        if value is None:
+            return default
+        return value
+
+    def __getitem__(self, key):
+        return self.values[key]
+
+    def to_dict(self):
+        return dict(self.values)
+
+    def __str__(self):
+        lines = []
+        if self.name is not None:
+            lines.append('{:<24} {}'.format('name', self.name))
+        for key, value in self.values.items():
+            if value is not None:
+                lines.append('{:<24} {}'.format(key, value))
+        return '\n'.join(lines)
@@ -0,0 +1,199 @@
+"""A discrete-event engine of the simulator for dynamic load balancing.
+
+Instead of advancing the clock by one tick and walking every rank, this
+engine keeps a priority queue of timestamped events and jumps straight to
+the next clock where something can happen:
+    - task end: a rank finishes its being-executed task
+    - dispatch: a rank is free and pops a new task from its queues
+    - arrival: a message or a migrated task of a balancing strategy
+      arrives, the strategies give these times (next_event_times)
+    - balancing trigger: the balancing strategies are active and need to
+      run at the next clock (is_active)
+
+The per-tick semantics of simulator.simulate() are kept, so both engines
+give the same per-rank local/remote load.
+"""
+
+import heapq
+import math
+
+from task import *
+from balancer import *
+from migrator import *
+from profiler import *
+from recorder import *
+from strategies import *
+from active_set import *
+
+# -----------------------------------------------------
+# Constant Definition
+# -----------------------------------------------------
+EVENT_BALANCING = 0
+EVENT_ARRIVAL = 1
+EVENT_TASK_END = 2
+EVENT_DISPATCH = 3
+
+# -----------------------------------------------------
+# Util Functions
+# -----------------------------------------------------
+def schedule_event(events, time, kind, rank=-1):
+    # events happen at the first clock tick reaching their time
+    heapq.heappush(events, (math.ceil(time), kind, rank))
+
+def add_task_load(rank, local_load_arr, remot_load_arr, task):
+    # the tick engine adds 1 per executed tick, that sums up to the task runtime
+    load = task.end_time - task.sta_time
+    if task.local_node == rank:
+        local_load_arr[rank] += load
+    else:
+        remot_load_arr[rank] += load
+
+def schedule_balancing_events(events, clock, scheduled_times, times):
+    """Add the future times given by the strategies (arrivals of messages
+    and migrated tasks) as events."""
+    for time in times:
+        time = math.ceil(time)
+        if time > clock and time not in scheduled_times:
+            scheduled_times.add(time)
+            schedule_event(events, time, EVENT_ARRIVAL)
+
+# -----------------------------------------------------
+# Simulation engine
+# -----------------------------------------------------
+def simulate_event_driven(local_queues, slowdown_procs, slowdown_scales, iter, clock_rate,
+                            cost_balancing, cost_migration_delay, noise):
+
+    # restore the initial local_queues, they are kept for next iterations
+    copy_local_queues = restore_local_queues(local_queues)
+
+    # for clocking and tracking task execution
+    clock = 0
+    remote_queues = []
+    arr_local_load = []
+    arr_remot_load = []
+
+    # the being-executed task of each process
+    arr_being_exe_tasks = []
+
+    # the event queue, every rank starts with a dispatch at the first clock
+    events = []
+    scheduled_times = set()
+    idle_ranks = set()
+
+    # check and init the queues for the first time
+    num_procs = len(copy_local_queues)
+    num_tasks_being_executed = 0
+    for i in range(num_procs):
+        remote_queues.append(TaskQueue())
+        arr_local_load.append(0.0)
+        arr_remot_load.append(0.0)
+        arr_being_exe_tasks.append(None)
+        schedule_event(events, 1, EVENT_DISPATCH, i)
+
+    # the remaining tasks and the ranks with a changed queue length, kept by
+    # the queues on change (active_set.py)
+    queue_lengths = QueueLengthTracker(copy_local_queues, remote_queues)
+
+    # the balancing strategies selected by the config, with their hooks
+    ctx = BalancingContext(copy_local_queues, remote_queues, arr_being_exe_tasks, slowdown_procs, slowdown_scales,
+                            iter, clock_rate, cost_balancing, cost_migration_delay, noise)
+    strategies = create_balancing_strategies(ctx)
+    tick_hooks = get_strategy_hooks(strategies, 'on_tick')
+
+    # the fluctuation of the rank speed, if any
+    performance = ctx.performance
+
+    # profile tasks executed by the profiling level
+    task_profiler = create_task_profiler(num_procs, cost_balancing, cost_migration_delay)
+
+    # the recorder keeps the queue status over the skipped ticks
+    arr_queue_status = create_queue_status_recorder(queue_lengths.local_lengths)
+
+    # --------------------------------------------------------
+    # Main loop
+    # --------------------------------------------------------
+    while len(events) != 0:
+        # --------------------------------------------------------
+        # jump to the next event, queues did not change in between
+        # --------------------------------------------------------
+        clock = events[0][0]
+        scheduled_times.discard(clock)
+
+        due_ranks = []
+        while len(events) != 0 and events[0][0] == clock:
+            _, kind, rank = heapq.heappop(events)
+            if kind == EVENT_TASK_END or kind == EVENT_DISPATCH:
+                due_ranks.append((rank, kind))
+
+        # --------------------------------------------------------
+        # balancing strategies, same hooks as the tick engine
+        # --------------------------------------------------------
+        for on_tick in tick_hooks:
+            on_tick(clock)
+
+        # idle ranks that got tasks by balancing pop them at this clock
+        for i in list(idle_ranks):
+            if len(remote_queues[i]) != 0 or len(copy_local_queues[i]) != 0:
+                idle_ranks.discard(i)
+                due_ranks.append((i, EVENT_DISPATCH))
+
+        # --------------------------------------------------------
+        # executing tasks and updating load
+        # --------------------------------------------------------
+        due_ranks.sort()
+        for i, kind in due_ranks:
+            if kind == EVENT_TASK_END:
+                cur_task = arr_being_exe_tasks[i]
+                add_task_load(i, arr_local_load, arr_remot_load, cur_task)
+                arr_being_exe_tasks[i] = None
+                num_tasks_being_executed -= 1
+                schedule_event(events, clock+1, EVENT_DISPATCH, i)
+                continue
+
+            # Prior 1: check remote queue
+            if len(remote_queues[i]) != 0:
+                task = remote_queues[i].popleft()
+                stime = clock
+            # Prior 2: check local queue
+            elif len(copy_local_queues[i]) != 0:
+                task = copy_local_queues[i].popleft()
+                stime = clock-1
+            else:
+                idle_ranks.add(i)
+                continue
+
+            exe_dur = task.get_dur()
+            if performance is not None:
+                exe_dur = performance.get_exe_dur(i, stime, exe_dur)
+            etime = exe_dur + stime
+            task.set_time(stime, etime)
+            arr_being_exe_tasks[i] = task
+            task_profiler.add(i, task)
+            num_tasks_being_executed += 1
+            schedule_event(events, etime, EVENT_TASK_END, i)
+
+        # record the queue status of the changed ranks at this clock
+        arr_queue_status.record_changes(clock, queue_lengths.pop_changed_lengths())
+
+        if queue_lengths.num_remain_tasks == 0 and num_tasks_being_executed == 0:
+            break
+
+        # --------------------------------------------------------
+        # schedule the next balancing triggers
+        # --------------------------------------------------------
+        if any(strategy.is_active(clock) for strategy in strategies):
+            if clock+1 not in scheduled_times:
+                scheduled_times.add(clock+1)
+                schedule_event(events, clock+1, EVENT_BALANCING)
+        else:
+            for strategy in strategies:
+                schedule_balancing_events(events, clock, scheduled_times, strategy.next_event_times())
+
+    # show/write the profiled tasks, a trace is plotted later by profiler.py
+    task_profiler.finish()
+
+    # write the queue status trace at the trace level
+    task_profiler.profile_queues(arr_queue_status)
+
+    # return simulated results
+    return [arr_local_load, arr_remot_load, arr_queue_status]
@@ -0,0 +1,255 @@
+"""Structured logging of the balancing protocol and the migrations.
+
+The components (balancer, migrator) log events with a level:
+    - info:  the migrations of tasks
+    - debug: the messages of the work-stealing protocol
+    - trace: the status of the pending messages at every tick
+A record is (clock, level, component, event, values), the values are the
+fields of the event in LOG_EVENTS. Nothing is formatted while simulating,
+the records are buffered and written as JSON lines or binary records, and
+the text of an event is only made when a log is shown:
+  $ python logger.py <simulation_log.jsonl|.bin>
+
+The loggers have a flag per level, a call site checks it first, e.g.,
+    if BALANCER_LOG.debug:
+        BALANCER_LOG.write(LOG_DEBUG, clock, 'send_request', rank, clock, recv_time)
+so a disabled level costs one attribute test.
+"""
+
+import numpy as np
+import atexit
+import json
+import sys
+import os
+
+# -----------------------------------------------------
+# Constant Definition
+# -----------------------------------------------------
+LOG_TRACE = 5
+LOG_DEBUG = 10
+LOG_INFO = 20
+LOG_NONE = 100
+LOG_LEVELS = {'trace': LOG_TRACE, 'debug': LOG_DEBUG, 'info': LOG_INFO, 'none': LOG_NONE}
+LOG_COMPONENTS = ['balancer', 'migrator']
+LOG_FORMATS = ['jsonl', 'binary']
+LOG_FILE_EXTS = {'jsonl': '.jsonl', 'binary': '.bin'}
+LOG_BUFFER_RECORDS = 65536 # records kept in memory before writing
+LOG_MAX_VALUES = 4         # values per record in the binary format
+LOG_STRING_FIELDS = ['info'] # the fields with strings, ids of strings in the binary format
+
+# the fields and the text of each event
+LOG_EVENTS = {
+    'send_request':   (('rank', 'send_time', 'recv_time'),
+                        'R{rank:2d} SENDS steal_request (sent at {send_time:5d}, will recv at {recv_time:5d})'),
+    'resend_request': (('rank', 'send_time', 'recv_time'),
+                        'R{rank:2d} RE-SENDS steal_request (sent at {send_time:5d}, will recv at {recv_time:5d})'),
+    'confirm_accept': (('rank', 'peer', 'send_time', 'recv_time'),
+                        'R{rank:2d} CONFIRMS accept for R{peer:2d} (sent at {send_time:5d}, will recv at {recv_time:5d})'),
+    'change_accept':  (('rank', 'peer', 'send_time', 'recv_time'),
+                        'R{rank:2d} CHANGES accept for R{peer:2d} (sent at {send_time:5d}, will recv at {recv_time:5d})'),
+    'accept_status':  (('rank', 'info', 'recv_time', 'peer'),
+                        'Idle R{rank:2d} acc_msg.info={info}, acc_msg.arr={recv_time}, receiver={peer}'),
+    'start_steal':    (('rank', 'peer'),
+                        'R{rank:2d} will STEAL task from R{peer:2d}'),
+    'steal_tasks':    (('rank', 'peer', 'num_tasks'),
+                        'R{rank:2d} steals {num_tasks} task(s) from R{peer:2d}'),
+    'select_offload': (('rank', 'peer', 'num_tasks', 'diff_load'),
+                        'R{rank:2d} selects {num_tasks} task(s) to offload to victim R{peer:2d}, diff={diff_load}'),
+    'offload_tasks':  (('rank', 'peer', 'num_tasks'),
+                        'R{rank:2d} sends {num_tasks} task(s) to victim R{peer:2d}'),
+    'receive_tasks':  (('rank', 'peer', 'num_tasks'),
+                        'victim R{rank:2d} receives {num_tasks} task(s) from R{peer:2d}')
+}
+
+# -----------------------------------------------------
+# Loggers
+# -----------------------------------------------------
+"""Class ComponentLogger gives the records of a component to the writer
+    - trace, debug, info: True if the level is logged
+"""
+class ComponentLogger:
+    def __init__(self, component):
+        self.component = component
+        self.set_level(LOG_NONE)
+
+    def set_level(self, level):
+        self.level = level
+        self.trace = level <= LOG_TRACE
+        self.debug = level <= LOG_DEBUG
+        self.info = level <= LOG_INFO
+
+    def write(self, level, clock, event, *values):
+        LOG_WRITER.write(clock, level, self.component, event, values)
+
+
+"""Class LogWriter buffers the records and writes them to a file
+    - jsonl: one JSON object per record
+    - binary: int64 records (clock, level, component, event, values), the
+      names and strings are in a .json file next to it
+A forked process writes to its own file, <name>.<pid><ext>.
+"""
+class LogWriter:
+    def __init__(self):
+        self.fmt = 'jsonl'
+        self.filename = None
+        self.records = []
+        self.open_pid = os.getpid()
+        self.pid = os.getpid()
+        self.strings = {}
+
+    def open(self, filename, fmt):
+        self.close()
+        self.filename = filename
+        self.fmt = fmt
+        self.open_pid = os.getpid()
+        self.start()
+
+    def start(self):
+        # start with an empty file in this process
+        self.records = []
+        self.pid = os.getpid()
+        self.strings = {}
+        open(self.get_filename(), 'w').close()
+        if self.fmt == 'binary':
+            self.write_strings()
+
+    def get_filename(self):
+        if self.pid == self.open_pid:
+            return self.filename
+        name, ext = os.path.splitext(self.filename)
+        return '{}.{}{}'.format(name, self.pid, ext)
+
+    def write(self, clock, level, component, event, values):
+        if self.filename is None:
+            return
+        if self.pid != os.getpid():
+            # a forked process, the records of the parent stay with it
+            self.start()
+        self.records.append((clock, level, component, event, values))
+        if len(self.records) >= LOG_BUFFER_RECORDS:
+            self.flush()
+
+    def get_string_id(self, value):
+        if value not in self.strings:
+            self.strings[value] = len(self.strings)
+        return self.strings[value]
+
+    def flush(self):
+        if self.filename is None or len(self.records) == 0 or self.pid != os.getpid():
+            return
+        if self.fmt == 'binary':
+            self.flush_binary()
+        else:
+            self.flush_jsonl()
+        self.records = []
+
+    def flush_jsonl(self):
+        level_names = {v: k for k, v in LOG_LEVELS.items()}
+        with open(self.get_filename(), 'a') as f:
+            for clock, level, component, event, values in self.records:
+                record = {'clock': int(clock), 'level': level_names[level],
+                            'component': component, 'event': event}
+                for field, value in zip(LOG_EVENTS[event][0], values):
+                    record[field] = value if isinstance(value, str) else int(value)
+                f.write(json.dumps(record) + '\n')
+
+    def flush_binary(self):
+        arr = np.zeros((len(self.records), 4 + LOG_MAX_VALUES), dtype=np.int64)
+        for i, (clock, level, component, event, values) in enumerate(self.records):
+            arr[i, 0] = clock
+            arr[i, 1] = level
+            arr[i, 2] = self.get_string_id(component)
+            arr[i, 3] = self.get_string_id(event)
+            for j, value in enumerate(values):
+                if isinstance(value, str):
+                    value = self.get_string_id(value)
+                arr[i, 4+j] = value
+        with open(self.get_filename(), 'ab') as f:
+            f.write(arr.tobytes())
+        self.write_strings()
+
+    def write_strings(self):
+        # the strings of the records, rewritten with each flush
+        with open(self.get_filename() + '.json', 'w') as f:
+            json.dump({'num_values': LOG_MAX_VALUES, 'strings': list(self.strings.keys())}, f)
+
+    def close(self):
+        self.flush()
+        self.filename = None
+
+
+LOG_WRITER = LogWriter()
+BALANCER_LOG = ComponentLogger('balancer')
+MIGRATOR_LOG = ComponentLogger('migrator')
+LOGGERS = {'balancer': BALANCER_LOG, 'migrator': MIGRATOR_LOG}
+
+# -----------------------------------------------------
+# Util Functions
+# -----------------------------------------------------
+def get_log_filename(fmt):
+    return './simulation_log' + LOG_FILE_EXTS[fmt]
+
+def set_logging(level, components=None, fmt='jsonl', filename=None):
+    """Log the components (names or comma-separated names, None: all) from
+    a level, to a file of the format."""
+    if level not in LOG_LEVELS:
+        raise ValueError('unknown log level {}, should be one of {}'.format(level, list(LOG_LEVELS.keys())))
+    if fmt not in LOG_FORMATS:
+        raise ValueError('unknown log format {}, should be one of {}'.format(fmt, LOG_FORMATS))
+    if components is None:
+        components = LOG_COMPONENTS
+    elif isinstance(components, str):
+        components = [c.strip() for c in components.split(',') if c.strip() != '']
+    for component in components:
+        if component not in LOGGERS:
+            raise ValueError('unknown log component {}, should be one of {}'.format(component, LOG_COMPONENTS))
+
+    for component, logger in LOGGERS.items():
+        logger.set_level(LOG_LEVELS[level] if component in components else LOG_NONE)
+    if LOG_LEVELS[level] == LOG_NONE:
+        LOG_WRITER.close()
+    else:
+        LOG_WRITER.open(filename if filename is not None else get_log_filename(fmt), fmt)
+
+def flush_log():
+    """Write the buffered records, e.g., at the end of a worker task."""
+    LOG_WRITER.flush()
+
+def read_log(filename):
+    """Read the records of a log file as dicts."""
+    records = []
+    if filename.endswith('.bin'):
+        with open(filename + '.json') as f:
+            meta = json.load(f)
+        strings = meta['strings']
+        level_names = {v: k for k, v in LOG_LEVELS.items()}
+        arr = np.fromfile(filename, dtype=np.int64).reshape(-1, 4 + meta['num_values'])
+        for row in arr.tolist():
+            event = strings[row[3]]
+            record = {'clock': row[0], 'level': level_names[row[1]],
+                        'component': strings[row[2]], 'event': event}
+            for j, field in enumerate(LOG_EVENTS[event][0]):
+                value = row[4+j]
+                record[field] = strings[value] if field in LOG_STRING_FIELDS else value
+            records.append(record)
+    else:
+        with open(filename) as f:
+            for line in f:
+                records.append(json.loads(line))
+    return records
+
+def format_record(record):
+    text = LOG_EVENTS[record['event']][1].format(**record)
+    return '[{}] Clock {:5d}: {}'.format(record['level'].upper(), record['clock'], text)
+
+atexit.register(flush_log)
+
+# -----------------------------------------------------
+# Main function
+# -----------------------------------------------------
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print('Usage: python logger.py <simulation_log.jsonl|.bin>')
+        sys.exit(1)
+    for record in read_log(sys.argv[1]):
+        print(format_record(record))
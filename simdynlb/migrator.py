@@ -1,7 +1,10 @@
 import numpy as np
-import random
 
 from task import *
+from network import *
+from logger import *
+from rng import *
+from performance import *
 
 """
 Offloading interface for migrating tasks from slow process to faster ones
@@ -17,51 +20,161 @@ OVERHEAD_BALANCING_OPS = 1.0 # in miliseconds
 OVERHEAD_DELAY = 1.0 # in miliseconds
 CLOCK_RATE = 1E3 # count as miliseconds
 NOISE = 0.15 # additional noise in task runtime when it is migrated
+MIN_TASK_INDEX_FOR_MIGRATION = 3 # the first tasks in a queue are not migrated
+MIGRATION_BATCH_SIZE = 1 # max tasks migrated per handshake, 1: one task as a single migration
+MIGRATION_BATCH_POLICIES = ['diff', 'cap']
+MIGRATION_BATCH_POLICY = 'diff' # diff: half of the load difference up to the size, cap: the size
 
 # -----------------------------------------------------
 # Util Functions
 # -----------------------------------------------------
-def randomize_cost(iter, cost_val, noise):
-    random.seed(iter)
+def set_migration_batch_size(batch_size, policy=None):
+    global MIGRATION_BATCH_SIZE, MIGRATION_BATCH_POLICY
+    batch_size = int(batch_size)
+    if batch_size < 1:
+        raise ValueError('migration batch size should be at least 1, got {}'.format(batch_size))
+    MIGRATION_BATCH_SIZE = batch_size
+    if policy is not None:
+        if policy not in MIGRATION_BATCH_POLICIES:
+            raise ValueError('unknown migration batch policy {}, should be one of {}'.format(
+                                policy, MIGRATION_BATCH_POLICIES))
+        MIGRATION_BATCH_POLICY = policy
+
+def get_batch_size(diff_load):
+    if MIGRATION_BATCH_POLICY == 'cap':
+        return MIGRATION_BATCH_SIZE
+    # half of the load difference balances a pair, up to the batch size
+    return max(1, min(MIGRATION_BATCH_SIZE, int(diff_load // 2)))
+
+def randomize_cost(iter, cost_val, noise, rank=0, cost_type='balancing'):
     # check noise value
     if noise > cost_val:
         noise = cost_val
     min = cost_val - noise
     max = cost_val + noise
-    res = random.randint(min, max)
+    res = draw_cost(iter, rank, cost_type, min, max)
     return res
 
 def estimate_new_task_runtime(old_dur, sld_processes, sld_scales, origin_node, new_node, iter, clock_rate):
-    
+
+    # the speed model compiled by init_simulation is a lookup
+    speed_model = get_rank_speed_model(sld_processes, sld_scales, clock_rate)
+    if speed_model is not None:
+        return speed_model.get_runtime(old_dur, origin_node, new_node, iter)
+
     # assume the task runtime is the same if remote node is not the slowdown one
     new_dur = old_dur
 
-    # if the remote node is the slowdown one
+    # the speed of the origin node, 1.0 if it is not a slowdown one
+    origin_speed = 1.0
+    for i in range(len(sld_processes)):
+        if origin_node == sld_processes[i]:
+            origin_speed = sld_scales[i]
+
+    # if the remote node is the slowdown one, the runtime scales by the
+    # speed of the origin node over the one of the remote node
     for i in range(len(sld_processes)):
         tmp_proc = sld_processes[i]
         tmp_scal = sld_scales[i]
         if origin_node == tmp_proc and new_node != tmp_proc:
-            new_dur = randomize_cost(iter, old_dur/2, old_dur/4)
+            new_dur = randomize_cost(iter, old_dur/2, old_dur/4, new_node, 'runtime')
         elif origin_node != tmp_proc and new_node == tmp_proc:
-            dur = 1.0 / tmp_scal
-            dur = dur * clock_rate
-            new_dur = dur
+            new_dur = max(1, round(old_dur * origin_speed / tmp_scal))
 
     return new_dur
 
+def get_migration_delay_cost(data, cost_migration_delay, clock_rate, sender=-1, receiver=-1):
+    # the delay of the task data on the system of the migration cost model,
+    # otherwise the flat cost of the context plus the bandwidth time if any,
+    # scaled by the level of the ranks in the topology (topology.py)
+    delay = get_migration_delay(data, clock_rate)
+    if delay is None:
+        delay = cost_migration_delay + get_bandwidth_delay(data)
+    return delay * get_cost_scale(sender, receiver)
+
+def draw_migration_delay(iter, cost_delay, noise, rank):
+    # a migrated task arrives one tick later at least, e.g., with a small
+    # intra-node cost
+    return max(1, randomize_cost(iter, cost_delay, noise, rank, 'delay'))
+
+def mark_tasks_to_migrate(queue, rnode, num_tasks):
+    # mark a batch of the last unmarked tasks for migrating to rnode
+    tasks = []
+    while len(tasks) < num_tasks:
+        task = queue.mark_migratable(rnode, MIN_TASK_INDEX_FOR_MIGRATION)
+        if task is None:
+            break
+        tasks.append(task)
+    return tasks
+
+def set_batch_time(tasks, rank, migrate_time, iter, cost_migration_delay, noise, clock_rate):
+    # a batch is one transfer: the latency once plus the bandwidth time of
+    # the total data
+    data = sum(task.data for task in tasks)
+    cost_delay = get_migration_delay_cost(data, cost_migration_delay, clock_rate, rank, tasks[0].remot_node)
+    arrive_time = migrate_time + draw_migration_delay(iter, cost_delay, noise, rank)
+    for task in tasks:
+        task.set_mig_time(migrate_time)
+        task.set_arr_time(arrive_time)
+    return arrive_time
+
+def pop_arrived_tasks(queue, rnode, clock):
+    # pop the tasks at rear marked for rnode and arrived at this clock
+    tasks = []
+    while len(queue) > 2:
+        task = queue[-1]
+        if task.remot_node != rnode or task.arr_time != clock:
+            break
+        tasks.append(queue.pop())
+    return tasks
+
+def update_migrated_task(task, new_node, sld_processes, sld_scales, iter, clock_rate):
+    old_dur = task.get_dur()
+    task.dur = estimate_new_task_runtime(old_dur, sld_processes, sld_scales, task.local_node, new_node, iter, clock_rate)
+
+def update_migrated_tasks(tasks, new_node, sld_processes, sld_scales, iter, clock_rate):
+    # the runtimes of a batch are estimated by one call of the speed model
+    speed_model = get_rank_speed_model(sld_processes, sld_scales, clock_rate)
+    if speed_model is None or len(tasks) == 1:
+        for task in tasks:
+            update_migrated_task(task, new_node, sld_processes, sld_scales, iter, clock_rate)
+        return
+    new_durs = speed_model.get_runtimes([task.get_dur() for task in tasks], [task.local_node for task in tasks],
+                                        new_node, iter)
+    for task, new_dur in zip(tasks, new_durs.tolist()):
+        task.dur = new_dur
+
+"""Class TaskBatch is the message of a batch of tasks migrated as one
+transfer over the network
+    - sender, receiver: the offloader and the victim
+    - tasks: the migrated tasks
+"""
+class TaskBatch:
+    def __init__(self, sender, receiver, tasks):
+        self.sender = sender
+        self.receiver = receiver
+        self.tasks = tasks
+        self.send_time = 0.0
+        self.recv_time = 0.0
+
+    def set_time(self, send_time, recv_time):
+        self.send_time = send_time
+        self.recv_time = recv_time
+
 # -----------------------------------------------------
 # Offload Functions
 # -----------------------------------------------------
-def select_tasks_to_offload(clock, local_queues, arr_victim_offloader, 
-                            iter, cost_balancing, cost_migration_delay, noise):
+def select_tasks_to_offload(clock, local_queues, arr_victim_offloader, offload_index,
+                            iter, cost_balancing, cost_migration_delay, noise, clock_rate=CLOCK_RATE):
     
-    num_procs = len(arr_victim_offloader)
-
-    for i in range(num_procs):
+    # only the offloaders with pairs, in rank order
+    for i in sorted(offload_index.offloader_ranks):
         num_tasks_for_migrating = len(arr_victim_offloader[i])
         if num_tasks_for_migrating > 0:
             # proceed the first pair
-            pair_off_vic = arr_victim_offloader[i].pop(0)
+            pair_off_vic = arr_victim_offloader[i].popleft()
+            if len(arr_victim_offloader[i]) == 0:
+                offload_index.offloader_ranks.discard(i)
             off_rank = pair_off_vic[0]
             vic_rank = pair_off_vic[1]
             assert(i == off_rank)
@@ -69,111 +182,180 @@ def select_tasks_to_offload(clock, local_queues, arr_victim_offloader,
             queue_length_victim = len(local_queues[vic_rank])
             diff_load = abs(queue_length_offloader - queue_length_victim)
         
+            # choose the last tasks which are going to be offloaded as a batch
+            if queue_length_offloader > 2 and diff_load > 2 and MIGRATION_BATCH_SIZE > 1:
+                tasks2offload = mark_tasks_to_migrate(local_queues[i], vic_rank, get_batch_size(diff_load))
+                if len(tasks2offload) != 0:
+                    migrate_time = clock + randomize_cost(iter, cost_balancing, noise, off_rank, 'balancing')
+                    set_batch_time(tasks2offload, off_rank, migrate_time, iter, cost_migration_delay, noise, clock_rate)
+                    offload_index.marked_ranks.add(off_rank)
+                    if MIGRATOR_LOG.info:
+                        MIGRATOR_LOG.write(LOG_INFO, clock, 'select_offload', off_rank, vic_rank, len(tasks2offload), diff_load)
+
             # choose the last task which is going to be offloaded
-            if queue_length_offloader > 2 and diff_load > 2:
-                for j in range(queue_length_offloader-1, 2, -1):
-                    task2offload = local_queues[i][j]
-                    remote_node  = task2offload.remot_node
-                    if remote_node == -1:
-                        # set remote node
-                        task2offload.set_remote_node(vic_rank)
-                        # set migrate time
-                        migrate_time = clock + randomize_cost(iter, cost_balancing, noise)
-                        task2offload.set_mig_time(migrate_time)
-                        # set arrive time
-                        arrive_time = migrate_time + randomize_cost(iter, cost_migration_delay, noise)
-                        task2offload.set_arr_time(arrive_time)
-                        # check
-                        # print("[Tcomm] clock[{}]: (select_tasks) R{}-victim R{}, diff={}".format(clock, off_rank, vic_rank, diff_load))
-                        break
-
-def steal_tasks(clock, local_queues, arr_queue_status, arr_steal_request_msg, arr_steal_accept_msg, 
+            elif queue_length_offloader > 2 and diff_load > 2:
+                task2offload = local_queues[i].mark_migratable(vic_rank, MIN_TASK_INDEX_FOR_MIGRATION)
+                if task2offload is not None:
+                    # set migrate time
+                    migrate_time = clock + randomize_cost(iter, cost_balancing, noise, off_rank, 'balancing')
+                    task2offload.set_mig_time(migrate_time)
+                    # set arrive time
+                    cost_delay = get_migration_delay_cost(task2offload.data, cost_migration_delay, clock_rate,
+                                                            off_rank, vic_rank)
+                    arrive_time = migrate_time + draw_migration_delay(iter, cost_delay, noise, off_rank)
+                    task2offload.set_arr_time(arrive_time)
+                    offload_index.marked_ranks.add(off_rank)
+                    if MIGRATOR_LOG.info:
+                        MIGRATOR_LOG.write(LOG_INFO, clock, 'select_offload', off_rank, vic_rank, 1, diff_load)
+
+def steal_from_busy_queue(clock, local_queues, idle_rank, busy_rank, checkout_accept_msg,
+                            iter, cost_migration_delay, sld_processes, sld_scales, clock_rate, noise):
+    """Steal the tasks marked for the idle rank if they arrive at this clock,
+    and mark the ones to steal. Return True if tasks are stolen."""
+    busy_queue = local_queues[busy_rank]
+    if len(busy_queue) <= 2:
+        return False
+
+    # a batch is marked once per handshake and stolen as a whole
+    if MIGRATION_BATCH_SIZE > 1:
+        stolen_tasks = pop_arrived_tasks(busy_queue, idle_rank, clock)
+        update_migrated_tasks(stolen_tasks, idle_rank, sld_processes, sld_scales, iter, clock_rate)
+        for stolen_task in stolen_tasks:
+            local_queues[idle_rank].append(stolen_task)
+        if len(stolen_tasks) != 0 and MIGRATOR_LOG.info:
+            MIGRATOR_LOG.write(LOG_INFO, clock, 'steal_tasks', idle_rank, busy_rank, len(stolen_tasks))
+        if len(stolen_tasks) == 0 and len(checkout_accept_msg.tasks) == 0:
+            diff_load = len(busy_queue) - len(local_queues[idle_rank])
+            tasks2steal = mark_tasks_to_migrate(busy_queue, idle_rank, get_batch_size(diff_load))
+            if len(tasks2steal) != 0:
+                set_batch_time(tasks2steal, busy_rank, clock, iter, cost_migration_delay, noise, clock_rate)
+                checkout_accept_msg.tasks = tasks2steal
+        return len(stolen_tasks) != 0
+
+    # check the marked task at rear is arrived or not yet
+    stolen = False
+    task2steal = busy_queue[-1]
+    if task2steal.remot_node == idle_rank and task2steal.arr_time == clock:
+        stolen_task = busy_queue.pop()
+        # update some new info
+        update_migrated_task(stolen_task, idle_rank, sld_processes, sld_scales, iter, clock_rate)
+        # add this task to the remote side
+        local_queues[idle_rank].append(stolen_task)
+        stolen = True
+        if MIGRATOR_LOG.info:
+            MIGRATOR_LOG.write(LOG_INFO, clock, 'steal_tasks', idle_rank, busy_rank, 1)
+    # mark a new task for stealing
+    task2steal = busy_queue.mark_migratable(idle_rank, MIN_TASK_INDEX_FOR_MIGRATION)
+    if task2steal is not None:
+        task2steal.set_mig_time(clock)
+        cost_delay = get_migration_delay_cost(task2steal.data, cost_migration_delay, clock_rate, busy_rank, idle_rank)
+        arrive_time = clock + draw_migration_delay(iter, cost_delay, noise, busy_rank)
+        task2steal.set_arr_time(arrive_time)
+    return stolen
+
+def steal_tasks(clock, local_queues, steal_index, arr_steal_request_msg, arr_steal_accept_msg,
                 iter, cost_migration_delay, sld_processes, sld_scales, clock_rate, noise):
+    """Steal the tasks of the accepted requests, only the ranks stealing at
+    the moment (steal_index) are visited."""
+    if len(steal_index.idle_ranks) == 0 or len(steal_index.busy_ranks) == 0:
+        return
+    for idle_rank in sorted(steal_index.stealing_ranks):
+        checkout_request_msg = arr_steal_request_msg[idle_rank][0]
+        req_rank_for_stealing = checkout_request_msg.accept_rank
+        checkout_accept_msg = arr_steal_accept_msg[req_rank_for_stealing][0]
+        if checkout_accept_msg.info != 'sending_task' or checkout_accept_msg.receiver != idle_rank:
+            continue
+        stolen = steal_from_busy_queue(clock, local_queues, idle_rank, req_rank_for_stealing, checkout_accept_msg,
+                                        iter, cost_migration_delay, sld_processes, sld_scales, clock_rate, noise)
+        steal_index.marked_ranks.add(req_rank_for_stealing)
+        if stolen:
+            # remove the messages of request and accept
+            arr_steal_request_msg[idle_rank].pop()
+            arr_steal_accept_msg[req_rank_for_stealing].pop()
+            steal_index.remove_steal(idle_rank, req_rank_for_stealing, arr_steal_accept_msg)
+
+
+def has_marked_tasks(queue):
+    return queue.get_cursor() < len(queue) - 1
+
+def offload_tasks(clock, local_queues, remote_queues, arr_tmp_buffer_migrated_tasks, offload_index,
+                    sld_processes, sld_scales, iter, clock_rate, noise, network=None):
     
-    # check the processes with empty queues
-    empty_queues = arr_queue_status[0]
-    busy_queues  = arr_queue_status[1]
-    if len(empty_queues) != 0:
-        for i in range(len(empty_queues)):
-            idle_rank = empty_queues[i][0]
-            checkout_request_msg = arr_steal_request_msg[idle_rank][0]
-            req_status = checkout_request_msg.info
-            if req_status == 'stealing_task':
-                req_rank_for_stealing = checkout_request_msg.receiver
-                if len(busy_queues) != 0:
-                    checkout_accept_msg = arr_steal_accept_msg[req_rank_for_stealing][0]
-                    ack_status = checkout_accept_msg.info
-                    ack_idle_rank = checkout_accept_msg.receiver
-                    if ack_status == 'sending_task' and idle_rank == ack_idle_rank:
-                        # print('[DEBUG] Clock {:5d}: R{:2d} is idle | stealing task from R{:2d}'.format(clock, idle_rank, req_rank_for_stealing))
-                        # mark a task from the busy rank for stealing
-                        if len(local_queues[req_rank_for_stealing]) > 2:
-                            for j in range(len(local_queues[req_rank_for_stealing])-1, 2, -1):
-                                task2steal = local_queues[req_rank_for_stealing][j] # last task
-                                remote_node = task2steal.remot_node
-                                if remote_node == -1: # mark a new task for stealing
-                                    task2steal.set_remote_node(idle_rank)
-                                    task2steal.set_mig_time(clock)
-                                    arrive_time = clock + randomize_cost(iter, cost_migration_delay, noise)
-                                    task2steal.set_arr_time(arrive_time)
-                                    break
-                                else: # check the marked task is arrived or not yet
-                                    if remote_node == idle_rank and task2steal.arr_time == clock:
-                                        stolen_task = local_queues[req_rank_for_stealing].pop()
-                                        # update some new info
-                                        old_node = stolen_task.local_node
-                                        old_dur = stolen_task.get_dur()
-                                        new_dur = estimate_new_task_runtime(old_dur, sld_processes, sld_scales, old_node, i, iter, clock_rate)
-                                        stolen_task.dur = new_dur
-                                        # add this task to the remote side
-                                        local_queues[idle_rank].append(stolen_task)
-                                        # remove the messages of request and accept
-                                        arr_steal_request_msg[idle_rank].pop()
-                                        arr_steal_accept_msg[req_rank_for_stealing].pop()
-                                        
-
-def offload_tasks(clock, local_queues, remote_queues, arr_tmp_buffer_migrated_tasks, 
-                    sld_processes, sld_scales, iter, clock_rate, noise):
-    
-    num_procs = len(arr_tmp_buffer_migrated_tasks)
+    # ------------------------------------------------------
+    # batched migration: the marked tasks at rear leave together as one
+    # message, the network delivers it at the arrival time of the batch
+    # ------------------------------------------------------
+    if MIGRATION_BATCH_SIZE > 1 and network is not None:
+        def on_delivery(recv_clock, batch):
+            update_migrated_tasks(batch.tasks, batch.receiver, sld_processes, sld_scales, iter, clock_rate)
+            for task2receive in batch.tasks:
+                remote_queues[batch.receiver].append(task2receive)
+            if MIGRATOR_LOG.info:
+                MIGRATOR_LOG.write(LOG_INFO, recv_clock, 'receive_tasks', batch.receiver, batch.sender, len(batch.tasks))
+
+        for i in sorted(offload_index.marked_ranks):
+            batches = {}
+            while len(local_queues[i]) > 2:
+                tmp_offload = local_queues[i][-1]
+                if tmp_offload.remot_node == -1 or tmp_offload.mig_time > clock:
+                    break
+                task2migrate = local_queues[i].pop()
+                batches.setdefault(task2migrate.remot_node, []).append(task2migrate)
+            if not has_marked_tasks(local_queues[i]):
+                offload_index.marked_ranks.discard(i)
+            for victim, tasks in batches.items():
+                tasks.reverse() # in the order of the queue
+                batch = TaskBatch(i, victim, tasks)
+                network.send(clock, batch, size=sum(task.data for task in tasks),
+                                on_delivery=on_delivery, recv_time=tasks[0].arr_time)
+                if MIGRATOR_LOG.info:
+                    MIGRATOR_LOG.write(LOG_INFO, clock, 'offload_tasks', i, victim, len(tasks))
+        return 0
+
     # ------------------------------------------------------
     # proceed for sending tasks over the network
     # ------------------------------------------------------
-    for i in range(num_procs):
-        num_remain_tasks = len(local_queues[i])
-        if num_remain_tasks > 2:
+    for i in sorted(offload_index.marked_ranks):
+        # the costs are drawn per migration, a task marked later can be due
+        # before the one at rear, so all due tasks at rear leave now
+        while len(local_queues[i]) > 2:
             # check the tasks at rear
             tmp_offload = local_queues[i][-1] # choose the task at rear in the queue
             victim = tmp_offload.remot_node
-            if victim != -1:
-                # check the clock and migrate_time
-                if tmp_offload.mig_time == clock:
-                    # print("[Tcomm] clock[{}]: (offload_tasks) R{} to victim R{}".format(clock, i, victim))
-                    # pop the task
-                    tmp_offload = None
-                    task2migrate = local_queues[i].pop()
-                    # add task to the migrate buffer over network
-                    arr_tmp_buffer_migrated_tasks[victim].append(task2migrate)
+            # check the clock and migrate_time
+            if victim == -1 or tmp_offload.mig_time > clock:
+                break
+            if MIGRATOR_LOG.info:
+                MIGRATOR_LOG.write(LOG_INFO, clock, 'offload_tasks', i, victim, 1)
+            # pop the task
+            tmp_offload = None
+            task2migrate = local_queues[i].pop()
+            # add task to the migrate buffer over network
+            arr_tmp_buffer_migrated_tasks[victim].append(task2migrate)
+        if not has_marked_tasks(local_queues[i]):
+            offload_index.marked_ranks.discard(i)
     # ------------------------------------------------------
     # proceed for receiving tasks over the network
     # ------------------------------------------------------
-    for i in range(num_procs):
-        num_tasks_being_migrated = len(arr_tmp_buffer_migrated_tasks[i])
-        if num_tasks_being_migrated > 0:
+    for i in sorted(offload_index.buffered_ranks):
+        # the buffer is in sending order, the tasks arrived behind the one
+        # at front are received with it
+        while len(arr_tmp_buffer_migrated_tasks[i]) > 0:
             tmp_receive = arr_tmp_buffer_migrated_tasks[i][0] # choose the task at front in the buffer
             arrive_time = tmp_receive.arr_time
-            if arrive_time == clock:
-                # pop the task
-                tmp_receive = None
-                task2receive = arr_tmp_buffer_migrated_tasks[i].pop(0)
-                # varied the task runtime
-                old_node = task2receive.local_node
-                old_dur = task2receive.get_dur()
-                new_dur = estimate_new_task_runtime(old_dur, sld_processes, sld_scales, old_node, i, iter, clock_rate)
-                task2receive.dur = new_dur
-                # add task to the remote queue at the victim side
-                remote_queues[i].append(task2receive)
-                # check migration
-                # print("[Tcomm] clock[{}]: (receive_tasks) victim R{} from R{}, old_dur={}, new_dur={}".format(clock, i, old_node, old_dur, new_dur))
+            if arrive_time > clock:
+                break
+            # pop the task
+            tmp_receive = None
+            task2receive = arr_tmp_buffer_migrated_tasks[i].popleft()
+            # varied the task runtime
+            old_node = task2receive.local_node
+            old_dur = task2receive.get_dur()
+            new_dur = estimate_new_task_runtime(old_dur, sld_processes, sld_scales, old_node, i, iter, clock_rate)
+            task2receive.dur = new_dur
+            # add task to the remote queue at the victim side
+            remote_queues[i].append(task2receive)
+            if MIGRATOR_LOG.info:
+                MIGRATOR_LOG.write(LOG_INFO, clock, 'receive_tasks', i, old_node, 1)
     return 0
         
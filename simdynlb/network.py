@@ -0,0 +1,219 @@
+"""Network model of the simulator for the messages between ranks.
+
+A message sent at a clock arrives after the transfer time between its
+sender and receiver:
+    - latency: NETWORK_LATENCY ticks for any pair, or a per-pair value from
+      NETWORK_LATENCY_MATRIX (ranks x ranks)
+    - bandwidth: the size of the message / NETWORK_BANDWIDTH, if given
+A message takes at least one tick, a receiver -1 (any rank, e.g., a steal
+request) costs NETWORK_LATENCY. Without a latency matrix, the latency of a
+pair is scaled by its level in the topology of the ranks, if any
+(topology.py), e.g., 10x cheaper on the same node.
+
+The messages in flight are kept in one priority queue by arrival time, the
+strategies call deliver(clock) on each of their ticks and get the arrived
+messages by their callbacks, so the cost follows the number of messages,
+not the number of ranks.
+
+The migration of a task can cost the delay of its data on a real system,
+by the latency/bandwidth table of the OSU benchmarks (set_migration_cost_model),
+instead of the flat migration_delay_cost of the context.
+"""
+
+import heapq
+import math
+import csv
+import os
+import numpy as np
+
+from topology import *
+
+# -----------------------------------------------------
+# Constant Definition
+# -----------------------------------------------------
+DEFAULT_NETWORK_LATENCY = 2
+NETWORK_LATENCY = DEFAULT_NETWORK_LATENCY # in clock ticks, between any pair of ranks
+NETWORK_BANDWIDTH = None       # in MB per clock tick, None: no transfer time for the size
+NETWORK_LATENCY_MATRIX = None  # latency per pair of ranks, None: NETWORK_LATENCY
+LATENCY_BW_DATA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                    'estimator', 'k_estimator', 'avg_bound', 'latency_bw_data.csv')
+MIGRATION_COST_TABLE = None    # LatencyBandwidthTable, None: the flat migration_delay_cost
+
+# -----------------------------------------------------
+# Util Functions
+# -----------------------------------------------------
+def set_network_model(latency=None, bandwidth=None, latency_matrix=None):
+    global NETWORK_LATENCY, NETWORK_BANDWIDTH, NETWORK_LATENCY_MATRIX
+    if latency is not None:
+        NETWORK_LATENCY = latency
+    if bandwidth is not None:
+        if bandwidth <= 0:
+            raise ValueError('network bandwidth should be positive, got {}'.format(bandwidth))
+        NETWORK_BANDWIDTH = bandwidth
+    if latency_matrix is not None:
+        latency_matrix = np.asarray(latency_matrix, dtype=np.float64)
+        if latency_matrix.ndim != 2 or latency_matrix.shape[0] != latency_matrix.shape[1]:
+            raise ValueError('latency matrix should be ranks x ranks, got shape {}'.format(latency_matrix.shape))
+        NETWORK_LATENCY_MATRIX = latency_matrix
+
+def read_latency_matrix(filename):
+    """Read a ranks x ranks latency matrix from a .npy or a .csv file."""
+    if filename.endswith('.npy'):
+        return np.load(filename)
+    return np.loadtxt(filename, delimiter=',', ndmin=2)
+
+def read_latency_bw_table(filename, system):
+    """Read the latency/bandwidth rows of a system, e.g., coolmuc2, sng or
+    beast, from a table as written by estimate_upper_bound_task_offloading.py."""
+    sizes = []
+    latencies = []
+    bandwidths = []
+    systems = set()
+    if not os.path.exists(filename):
+        raise ValueError('latency/bandwidth data file {} not found, give migration_cost_file in the context'.format(filename))
+    with open(filename, newline='') as f:
+        for row in csv.DictReader(f):
+            systems.add(row['system'])
+            if row['system'] == system:
+                sizes.append(float(row['size(bytes)']))
+                latencies.append(float(row['latency(us)']))
+                bandwidths.append(float(row['bw(MB/s)']))
+    if len(sizes) == 0:
+        raise ValueError('no latency/bandwidth data for system {} in {}, should be one of {}'.format(
+                            system, filename, sorted(systems)))
+    return LatencyBandwidthTable(system, sizes, latencies, bandwidths)
+
+def set_migration_cost_model(system, filename=None):
+    """Charge the migrations by the latency/bandwidth table of a system,
+    the table is read once here. None: back to the flat cost."""
+    global MIGRATION_COST_TABLE
+    if system is None:
+        MIGRATION_COST_TABLE = None
+        return
+    if filename is None:
+        filename = LATENCY_BW_DATA_FILE
+    MIGRATION_COST_TABLE = read_latency_bw_table(filename, system)
+
+def get_migration_delay(data, clock_rate):
+    """Get the delay in clock ticks to migrate a task with data (MB), None
+    if there is no migration cost model."""
+    if MIGRATION_COST_TABLE is None:
+        return None
+    return max(1, math.ceil(MIGRATION_COST_TABLE.get_delay(data) * clock_rate))
+
+def get_bandwidth_delay(data):
+    """Get the clock ticks to transfer data (MB) at NETWORK_BANDWIDTH, 0 if
+    there is no bandwidth."""
+    if NETWORK_BANDWIDTH is None:
+        return 0
+    return math.ceil(data / NETWORK_BANDWIDTH)
+
+def set_network_model_from_context(context_info):
+    """Set the model by the optional network_latency, network_bandwidth,
+    network_latency_file, migration_cost_system and migration_cost_file
+    values of the context, the missing ones are the defaults."""
+    global NETWORK_BANDWIDTH, NETWORK_LATENCY_MATRIX
+    NETWORK_BANDWIDTH = None
+    NETWORK_LATENCY_MATRIX = None
+    latency_matrix = None
+    latency_file = context_info.get('network_latency_file', None)
+    if latency_file is not None:
+        latency_matrix = read_latency_matrix(latency_file)
+    set_network_model(latency=context_info.get('network_latency', DEFAULT_NETWORK_LATENCY),
+                        bandwidth=context_info.get('network_bandwidth', None),
+                        latency_matrix=latency_matrix)
+    set_migration_cost_model(context_info.get('migration_cost_system', None),
+                                context_info.get('migration_cost_file', None))
+
+def create_network(num_procs, topology=None):
+    """Create a network of the configured model for num_procs ranks, on the
+    topology of the ranks if given."""
+    latency_matrix = NETWORK_LATENCY_MATRIX
+    if latency_matrix is not None and len(latency_matrix) < num_procs:
+        raise ValueError('latency matrix for {} ranks, the simulation has {}'.format(len(latency_matrix), num_procs))
+    return Network(NETWORK_LATENCY, NETWORK_BANDWIDTH, latency_matrix, topology)
+
+"""Class Network keeps the messages in flight
+    - send(clock, msg, size, on_delivery, recv_time): set the send/recv
+      times of msg and keep it until its arrival, the recv_time can be
+      given by the sender, e.g., by the migration cost of tasks
+    - deliver(clock): call on_delivery(clock, msg) for the messages arrived
+      at or before the clock, by arrival time then by sending order
+    - arrival_times(): the arrival times of the messages in flight
+"""
+class Network:
+    def __init__(self, latency, bandwidth=None, latency_matrix=None, topology=None):
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.latency_matrix = latency_matrix
+        self.topology = topology
+        self.in_flight = []
+        self.num_sent = 0
+
+    def get_latency(self, sender, receiver):
+        if sender < 0 or receiver < 0:
+            return self.latency
+        if self.latency_matrix is not None:
+            return self.latency_matrix[sender, receiver]
+        if self.topology is not None:
+            return self.latency * self.topology.get_cost_scale(sender, receiver)
+        return self.latency
+
+    def get_transfer_time(self, sender, receiver, size=0.0):
+        transfer_time = self.get_latency(sender, receiver)
+        if self.bandwidth is not None and size > 0:
+            transfer_time += size / self.bandwidth
+        # the arrival is at a clock tick, one tick later at least
+        return max(1, math.ceil(transfer_time))
+
+    def send(self, clock, msg, size=0.0, on_delivery=None, recv_time=None):
+        if recv_time is None:
+            recv_time = clock + self.get_transfer_time(msg.sender, msg.receiver, size)
+        msg.set_time(clock, recv_time)
+        heapq.heappush(self.in_flight, (recv_time, self.num_sent, msg, on_delivery))
+        self.num_sent += 1
+        return recv_time
+
+    def deliver(self, clock):
+        in_flight = self.in_flight
+        while len(in_flight) != 0 and in_flight[0][0] <= clock:
+            recv_time, seq, msg, on_delivery = heapq.heappop(in_flight)
+            if on_delivery is not None:
+                on_delivery(clock, msg)
+
+    def arrival_times(self):
+        return [item[0] for item in self.in_flight]
+
+    def next_arrival_time(self):
+        if len(self.in_flight) == 0:
+            return None
+        return self.in_flight[0][0]
+
+    def __len__(self):
+        return len(self.in_flight)
+
+
+"""Class LatencyBandwidthTable gives the delay of a message by its size
+    - the latency (us) and bandwidth (MB/s) measured for sizes in bytes,
+      sorted once by size
+    - get_delay(data): latency + data/bandwidth in seconds for data in MB,
+      as in the estimator, interpolated between the measured sizes
+      (scalar or numpy array of sizes)
+"""
+class LatencyBandwidthTable:
+    def __init__(self, system, sizes, latencies, bandwidths):
+        order = np.argsort(sizes)
+        self.system = system
+        self.sizes = np.asarray(sizes, dtype=np.float64)[order]
+        self.latencies = np.asarray(latencies, dtype=np.float64)[order] * 1E-6
+        self.bandwidths = np.asarray(bandwidths, dtype=np.float64)[order]
+
+    def get_latency(self, size):
+        return np.interp(size, self.sizes, self.latencies)
+
+    def get_bandwidth(self, size):
+        return np.interp(size, self.sizes, self.bandwidths)
+
+    def get_delay(self, data):
+        size = np.multiply(data, 1024*1024)
+        return self.get_latency(size) + data / self.get_bandwidth(size)
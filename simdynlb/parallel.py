@@ -0,0 +1,65 @@
+"""Process-pool execution of independent simulations.
+
+Each iteration of a simulation context is independent: the workload is
+restored at the beginning of simulate() and the costs are drawn from the
+random streams of the iteration (rng.py). So iterations can run on a pool
+of processes and give the same results as in serial.
+    - the context (engine, workload, costs) is given to each worker once by
+      the pool initializer; with the fork start method it is inherited from
+      the parent process and not pickled at all
+    - the models and settings of the simulator (module globals set by
+      apply_scenario and the command line: network, speed model, queue
+      status policy, profiling, logging) are inherited by fork only, so a
+      pool is not started without it, e.g., on Windows run with --jobs 1
+    - the results are gathered in iteration order
+"""
+
+import io
+import contextlib
+import multiprocessing as mp
+
+from logger import *
+
+# -----------------------------------------------------
+# Constant Definition
+# -----------------------------------------------------
+POOL_CONTEXT = {} # the simulation context in a worker process
+
+# -----------------------------------------------------
+# Util Functions
+# -----------------------------------------------------
+def get_mp_context():
+    # fork only: the workers get the module globals of the parent, and the
+    # workload is shared copy-on-write
+    if 'fork' not in mp.get_all_start_methods():
+        raise RuntimeError('Parallel simulation needs the fork start method, not available on this platform, run with --jobs 1')
+    return mp.get_context('fork')
+
+def set_pool_context(context):
+    POOL_CONTEXT.clear()
+    POOL_CONTEXT.update(context)
+
+def start_pool(num_jobs, context):
+    """Start a pool of num_jobs processes holding the given context."""
+    mp_context = get_mp_context()
+    return mp_context.Pool(num_jobs, initializer=set_pool_context, initargs=(context,))
+
+# -----------------------------------------------------
+# Worker Functions
+# -----------------------------------------------------
+def simulate_iteration(iter):
+    """Simulate an iteration in a worker, the printed output is returned
+    together with the results to be shown in order by the parent."""
+    ctx = POOL_CONTEXT
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        simu_res = ctx['engine'](ctx['local_queues'], ctx['slowdown_procs'], ctx['slowdown_scales'],
+                                    iter, ctx['clock_rate'], ctx['cost_balancing'],
+                                    ctx['cost_migration_delay'], ctx['noise'])
+    # the log records of the worker are written before it gets the next task
+    flush_log()
+    return [simu_res, output.getvalue()]
+
+def simulate_iterations_in_parallel(pool, num_iterations):
+    """Iterate over [simu_res, output] of all iterations, in order."""
+    return pool.imap(simulate_iteration, range(num_iterations))
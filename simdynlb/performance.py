@@ -0,0 +1,300 @@
+"""Performance model of the ranks: their speed for the runtime of migrated
+tasks, and its fluctuation over time.
+
+The speed of the ranks is compiled once by init_simulation into per-rank
+tables, so the runtime of a migrated task is a lookup by its origin and
+target rank instead of a scan over the slowdown ranks:
+    - a task from a slowdown rank to another rank takes a random runtime
+      of 1/4..3/4 of its old one
+    - a task to a slowdown rank takes its old runtime times the speed of
+      the origin over the speed of the target, rounded to clock ticks, so
+      a runtime drawn from a distribution or replayed from a trace keeps
+      its size
+    - if both ranks are slowdown ones, the rule of the later one in the
+      slowdown list applies, as in the scan of estimate_new_task_runtime
+Instead of the rules, a (origin x target) multiplier matrix of the task
+runtime can be given by the runtime_multiplier_file value of the context,
+the runtimes are rounded to clock ticks.
+
+A whole batch of migrated tasks is re-estimated by one vectorized call.
+
+The speed of a rank can also fluctuate over time by a Markov chain over
+states, e.g., normal, throttled and noisy (PERF_MODELS or a .json file by
+the perf_model value of the context):
+    - a rank stays PERF_EPOCH seconds in a state, then moves by the
+      transition matrix, whose cumulative rows are computed once
+    - the states and duration factors of all ranks are sampled up front
+      per iteration, PERF_BLOCK_EPOCHS epochs at once vectorized over the
+      ranks, more blocks are sampled if the iteration lasts longer, into
+      buffers whose capacity doubles
+    - a task runs for its runtime times the factor of its rank at its
+      start, rounded to clock ticks
+"""
+
+import numpy as np
+import json
+
+from rng import *
+
+# -----------------------------------------------------
+# Constant Definition
+# -----------------------------------------------------
+RANK_SPEED_MODEL = None # the model of the current simulation, by init_simulation
+PERF_MODEL = None       # MarkovModel of the rank performance, None: constant speed
+DEFAULT_PERF_EPOCH = 1.0
+PERF_EPOCH = DEFAULT_PERF_EPOCH # in seconds, the time between the state transitions
+PERF_BLOCK_EPOCHS = 64  # epochs of the trajectories sampled at once
+
+# the states, the initial distribution (as markov_models/example1.py), the
+# transition matrix and the duration factor (scale, lognormal noise) per state
+PERF_MODELS = {
+    'normal_throttled_noisy': {
+        'states': ['throttled', 'normal', 'noisy'],
+        'p_init': [0.1, 0.8, 0.1],
+        'transition': [[0.90, 0.10, 0.00],
+                       [0.02, 0.96, 0.02],
+                       [0.00, 0.20, 0.80]],
+        'scales': [2.0, 1.0, 1.0],
+        'noises': [0.0, 0.0, 0.25]
+    }
+}
+
+# -----------------------------------------------------
+# Util Functions
+# -----------------------------------------------------
+def read_runtime_multipliers(filename):
+    """Read an origin x target multiplier matrix from a .npy or a .csv file."""
+    if filename.endswith('.npy'):
+        return np.load(filename)
+    return np.loadtxt(filename, delimiter=',', ndmin=2)
+
+def read_markov_model(filename):
+    """Read a MarkovModel from a .json file with the keys of PERF_MODELS."""
+    with open(filename) as f:
+        return MarkovModel(**json.load(f))
+
+def set_performance_model(model, epoch=None):
+    """Let the speed of the ranks fluctuate by a MarkovModel, the name of a
+    model in PERF_MODELS or a .json file. None: constant speed."""
+    global PERF_MODEL, PERF_EPOCH
+    if isinstance(model, str):
+        if model in PERF_MODELS:
+            model = MarkovModel(**PERF_MODELS[model])
+        elif model.endswith('.json'):
+            model = read_markov_model(model)
+        else:
+            raise ValueError('unknown performance model {}, should be one of {} or a .json file'.format(
+                                model, list(PERF_MODELS.keys())))
+    PERF_MODEL = model
+    if epoch is not None:
+        if epoch <= 0:
+            raise ValueError('performance epoch should be positive, got {}'.format(epoch))
+        PERF_EPOCH = epoch
+
+def set_performance_model_from_context(context_info):
+    """Set the model by the optional perf_model and perf_epoch (seconds)
+    values of the context, the missing ones are the defaults."""
+    set_performance_model(context_info.get('perf_model', None), context_info.get('perf_epoch', DEFAULT_PERF_EPOCH))
+
+def create_performance_trajectories(num_procs, iter, clock_rate):
+    """Sample the trajectories of the ranks for an iteration, None if the
+    speed is constant."""
+    if PERF_MODEL is None:
+        return None
+    epoch_ticks = max(1, round(PERF_EPOCH * clock_rate))
+    return PerformanceTrajectories(PERF_MODEL, num_procs, epoch_ticks, get_iteration_generator(iter, 'performance'))
+
+def set_rank_speed_model(model):
+    global RANK_SPEED_MODEL
+    RANK_SPEED_MODEL = model
+
+def get_rank_speed_model(sld_processes, sld_scales, clock_rate):
+    """Get the model of the simulation if it is the one of the slowdown
+    setting, otherwise None."""
+    model = RANK_SPEED_MODEL
+    if model is not None and model.is_model_of(sld_processes, sld_scales, clock_rate):
+        return model
+    return None
+
+"""Class RankSpeedModel holds the speed of the ranks
+    - speeds: the speed factor per rank, 1.0 or the slowdown scale
+    - sld_order: the position of a rank in the slowdown list, -1 if not
+    - multipliers: the optional origin x target runtime multipliers
+    - get_runtime(old_dur, origin, target, iter): the new runtime of a task
+    - get_runtimes(old_durs, origins, target, iter): the new runtimes of
+      tasks migrated together, as numpy array
+"""
+class RankSpeedModel:
+    def __init__(self, num_procs, sld_processes, sld_scales, clock_rate, multipliers=None):
+        self.num_procs = num_procs
+        self.sld_processes = sld_processes
+        self.sld_scales = sld_scales
+        self.clock_rate = clock_rate
+        # the slowdown setting by value, a copy of the lists is the same one
+        self.sld_setting = (tuple(sld_processes), tuple(sld_scales))
+        self.speeds = np.ones(num_procs, dtype=np.float64)
+        self.sld_order = np.full(num_procs, -1, dtype=np.int64)
+        for i in range(len(sld_processes)):
+            rank = sld_processes[i]
+            self.speeds[rank] = sld_scales[i]
+            self.sld_order[rank] = i
+        # lists for the lookups of single tasks
+        self.sld_order_list = self.sld_order.tolist()
+        self.speeds_list = self.speeds.tolist()
+
+        if multipliers is not None:
+            multipliers = np.asarray(multipliers, dtype=np.float64)
+            if multipliers.shape != (num_procs, num_procs):
+                raise ValueError('runtime multipliers should be {} x {}, got shape {}'.format(
+                                    num_procs, num_procs, multipliers.shape))
+        self.multipliers = multipliers
+
+    def is_model_of(self, sld_processes, sld_scales, clock_rate):
+        if self.clock_rate != clock_rate:
+            return False
+        # the lists of init_simulation themselves, without a comparison
+        if self.sld_processes is sld_processes and self.sld_scales is sld_scales:
+            return True
+        return self.sld_setting == (tuple(sld_processes), tuple(sld_scales))
+
+    def get_runtime(self, old_dur, origin, target, iter):
+        if origin == target:
+            return old_dur
+        if self.multipliers is not None:
+            return max(1, round(old_dur * self.multipliers[origin, target]))
+        origin_order = self.sld_order_list[origin]
+        target_order = self.sld_order_list[target]
+        new_dur = old_dur
+        if origin_order >= 0:
+            new_dur = draw_cost(iter, target, 'runtime', old_dur/2 - old_dur/4, old_dur/2 + old_dur/4)
+        if target_order > origin_order:
+            new_dur = max(1, round(old_dur * self.speeds_list[origin] / self.speeds_list[target]))
+        return new_dur
+
+    def get_runtimes(self, old_durs, origins, target, iter):
+        old_durs = np.asarray(old_durs, dtype=np.float64)
+        origins = np.asarray(origins, dtype=np.int64)
+        new_durs = old_durs.copy()
+        moved = origins != target
+        if self.multipliers is not None:
+            new_durs[moved] = np.maximum(1, np.round(old_durs[moved] * self.multipliers[origins[moved], target]))
+            return new_durs
+        origin_order = self.sld_order[origins]
+        drawn = moved & (origin_order >= 0)
+        if drawn.any():
+            drawn_durs = old_durs[drawn]
+            new_durs[drawn] = draw_costs(iter, target, 'runtime', drawn_durs/2 - drawn_durs/4,
+                                            drawn_durs/2 + drawn_durs/4)
+        slowed = moved & (self.sld_order[target] > origin_order)
+        new_durs[slowed] = np.maximum(1, np.round(old_durs[slowed] * self.speeds[origins[slowed]] / self.speeds[target]))
+        return new_durs
+
+
+"""Class MarkovModel holds a Markov chain of the rank performance
+    - states: the names of the states
+    - p_init: the initial distribution, transition: states x states
+    - scales, noises: the duration factor per state, scale * exp(noise * z)
+      with z standard normal
+    - sample_init(values), sample_next(states, values): the states of all
+      ranks from uniform values, by the cumulative distributions
+"""
+class MarkovModel:
+    def __init__(self, states, p_init, transition, scales, noises=None):
+        num_states = len(states)
+        if noises is None:
+            noises = [0.0] * num_states
+        self.states = list(states)
+        self.p_init = np.asarray(p_init, dtype=np.float64)
+        self.transition = np.asarray(transition, dtype=np.float64)
+        self.scales = np.asarray(scales, dtype=np.float64)
+        self.noises = np.asarray(noises, dtype=np.float64)
+        if self.p_init.shape != (num_states,) or self.transition.shape != (num_states, num_states) \
+                or self.scales.shape != (num_states,) or self.noises.shape != (num_states,):
+            raise ValueError('p_init, transition, scales and noises should be given for the {} states'.format(num_states))
+        if not np.isclose(self.p_init.sum(), 1.0) or not np.allclose(self.transition.sum(axis=1), 1.0) \
+                or (self.p_init < 0).any() or (self.transition < 0).any():
+            raise ValueError('p_init and the rows of transition should be probability distributions')
+        if (self.scales <= 0).any() or (self.noises < 0).any():
+            raise ValueError('scales should be positive and noises non-negative')
+
+        # the cumulative distributions, the last one is 1 against rounding
+        self.cum_init = np.cumsum(self.p_init)
+        self.cum_init[-1] = 1.0
+        self.cum_transition = np.cumsum(self.transition, axis=1)
+        self.cum_transition[:, -1] = 1.0
+
+    def sample_init(self, values):
+        return np.searchsorted(self.cum_init, values, side='right')
+
+    def sample_next(self, states, values):
+        return (values[:, None] >= self.cum_transition[states]).sum(axis=1)
+
+
+"""Class PerformanceTrajectories holds the states of the ranks per epoch
+    - states, factors: epochs x ranks, the state and the duration factor,
+      views of the sampled epochs in the buffers
+    - get_exe_dur(rank, clock, dur): the runtime of a task started at the
+      clock on the rank, in clock ticks
+    - get_exe_durs(ranks, clocks, durs): the same for tasks started at once,
+      as numpy arrays
+"""
+class PerformanceTrajectories:
+    def __init__(self, model, num_procs, epoch_ticks, generator):
+        self.model = model
+        self.num_procs = num_procs
+        self.epoch_ticks = epoch_ticks
+        self.generator = generator
+        self.num_epochs = 0
+        self.states_buffer = np.empty((PERF_BLOCK_EPOCHS, num_procs), dtype=np.int64)
+        self.factors_buffer = np.empty((PERF_BLOCK_EPOCHS, num_procs), dtype=np.float64)
+        self.states = self.states_buffer[:0]
+        self.factors = self.factors_buffer[:0]
+        self.extend()
+
+    def reserve(self, num_epochs):
+        # double the capacity, the sampled epochs are copied once per doubling
+        capacity = len(self.states_buffer)
+        if num_epochs <= capacity:
+            return
+        while capacity < num_epochs:
+            capacity *= 2
+        states_buffer = np.empty((capacity, self.num_procs), dtype=np.int64)
+        factors_buffer = np.empty((capacity, self.num_procs), dtype=np.float64)
+        states_buffer[:self.num_epochs] = self.states
+        factors_buffer[:self.num_epochs] = self.factors
+        self.states_buffer = states_buffer
+        self.factors_buffer = factors_buffer
+
+    def extend(self):
+        # a block of epochs, the draws do not depend on when it is sampled
+        values = self.generator.random((PERF_BLOCK_EPOCHS, self.num_procs))
+        noise_values = self.generator.standard_normal((PERF_BLOCK_EPOCHS, self.num_procs))
+        states = np.empty((PERF_BLOCK_EPOCHS, self.num_procs), dtype=np.int64)
+        if len(self.states) == 0:
+            cur_states = self.model.sample_init(values[0])
+        else:
+            cur_states = self.model.sample_next(self.states[-1], values[0])
+        states[0] = cur_states
+        for e in range(1, PERF_BLOCK_EPOCHS):
+            cur_states = self.model.sample_next(cur_states, values[e])
+            states[e] = cur_states
+        factors = self.model.scales[states] * np.exp(self.model.noises[states] * noise_values)
+        start = self.num_epochs
+        self.reserve(start + PERF_BLOCK_EPOCHS)
+        self.num_epochs += PERF_BLOCK_EPOCHS
+        self.states_buffer[start:self.num_epochs] = states
+        self.factors_buffer[start:self.num_epochs] = factors
+        self.states = self.states_buffer[:self.num_epochs]
+        self.factors = self.factors_buffer[:self.num_epochs]
+
+    def get_exe_dur(self, rank, clock, dur):
+        epoch = int(clock // self.epoch_ticks)
+        while epoch >= len(self.factors):
+            self.extend()
+        return max(1, round(dur * self.factors[epoch, rank]))
+
+    def get_exe_durs(self, ranks, clocks, durs):
+        epochs = np.asarray(clocks, dtype=np.int64) // self.epoch_ticks
+        while epochs.max() >= len(self.factors):
+            self.extend()
+        return np.maximum(1, np.round(durs * self.factors[epochs, ranks]))
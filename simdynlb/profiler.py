@@ -1,7 +1,9 @@
 import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
-import csv
+from array import array
+import json
+import sys
 import os
 
 from migrator import *
@@ -10,11 +12,46 @@ from migrator import *
 Profiling interfaces for tracking the task execution
     - plot gann charts
     - statistics about task/load execution
+    - traces of the queue status
+    - task profilers by level: none, counters, trace
 """
 
+# -----------------------------------------------------
+# Constant Definition
+# -----------------------------------------------------
+QUEUE_STATUS_TRACE_DTYPE = 'int32'
+QUEUE_STATUS_TRACE_VERSION = 1
+
+PROFILING_LEVELS = ['none', 'counters', 'trace']
+PROFILING_LEVEL = 'counters'
+TASK_TRACE_DTYPE = np.dtype([
+    ('rank', np.int32),
+    ('tid', np.int64),
+    ('sta_time', np.float64),
+    ('end_time', np.float64),
+    ('mig_time', np.float64),
+    ('local_node', np.int32),
+    ('remot_node', np.int32)
+])
+
 # -----------------------------------------------------
 # Util Functions
 # -----------------------------------------------------
+def set_profiling_level(level):
+    global PROFILING_LEVEL
+    if level not in PROFILING_LEVELS:
+        raise ValueError('unknown profiling level {}, should be one of {}'.format(level, PROFILING_LEVELS))
+    PROFILING_LEVEL = level
+
+def is_remote_task(rank, loc_node, rem_node):
+    return loc_node != rank and rem_node != -1 and rem_node != loc_node
+
+def get_profiling_filename(prefix, extension, cost_balancing=OVERHEAD_BALANCING_OPS,
+                            cost_migration_delay=OVERHEAD_DELAY):
+    O_balancing = int(cost_balancing)
+    O_delay = int(cost_migration_delay)
+    return "./" + prefix + "_OBalancing" + str(O_balancing) + "_ODelay" + str(O_delay) + extension
+
 def show_num_executed_tasks(arr_executed_tasks):
     num_procs = len(arr_executed_tasks)
     print('--------------------')
@@ -76,10 +113,9 @@ def plot_gann_chart(gannt_local_tasks, gannt_remot_tasks):
     # plt.show()
 
     # save to file
-    O_balancing = int(OVERHEAD_BALANCING_OPS)
-    O_delay = int(OVERHEAD_DELAY)
-    fig_filename = "./visualized_OBalancing" + str(O_balancing) + "_ODelay" + str(O_delay) + ".pdf"
+    fig_filename = get_profiling_filename("visualized", ".pdf")
     plt.savefig(os.path.join("./", fig_filename), bbox_inches='tight')
+    plt.close(fig)
 
 # -----------------------------------------------------
 # Visualize task exections
@@ -115,7 +151,7 @@ def visualize_task_execution(profiled_tasks_arr):
             gann_info = (sta_time, end_time-sta_time)
     
             # track the number of local and remote tasks
-            if loc_node != i and rem_node != -1 and rem_node != loc_node:
+            if is_remote_task(i, loc_node, rem_node):
                 num_remot_tasks += 1
                 gannt_values_remot_tasks[i].append(gann_info)
             else:
@@ -133,23 +169,160 @@ def visualize_task_execution(profiled_tasks_arr):
     plot_gann_chart(gannt_values_local_tasks, gannt_values_remot_tasks)
 
 
+# -----------------------------------------------------
+# Task profilers
+# -----------------------------------------------------
+"""The task profilers of the engines
+
+An engine gives each task it starts to add(rank, task), then calls finish()
+and profile_queues(arr_queue_status) at the end of the iteration:
+    - none:     nothing is kept
+    - counters: the number of local and remote tasks executed per rank
+    - trace:    an event log of the executed tasks, written to a .npy file
+                of TASK_TRACE_DTYPE, render_task_trace() plots it later,
+                and the queue status trace (profile_queue_status)
+The files are named by the balancing and migration costs of the context.
+"""
+class NoneProfiler:
+
+    def add(self, rank, task):
+        pass
+
+    def finish(self):
+        pass
+
+    def profile_queues(self, arr_queue_status):
+        pass
+
+
+class CounterProfiler:
+
+    def __init__(self, num_procs):
+        self.num_local_remote_tasks = [[0, 0] for i in range(num_procs)]
+
+    def add(self, rank, task):
+        if is_remote_task(rank, task.local_node, task.remot_node):
+            self.num_local_remote_tasks[rank][1] += 1
+        else:
+            self.num_local_remote_tasks[rank][0] += 1
+
+    def finish(self):
+        show_num_executed_tasks(self.num_local_remote_tasks)
+
+    def profile_queues(self, arr_queue_status):
+        pass
+
+
+class TraceProfiler(CounterProfiler):
+
+    def __init__(self, num_procs, cost_balancing, cost_migration_delay):
+        super().__init__(num_procs)
+        self.cost_balancing = cost_balancing
+        self.cost_migration_delay = cost_migration_delay
+        self.columns = {}
+        for name in TASK_TRACE_DTYPE.names:
+            if TASK_TRACE_DTYPE[name].kind == 'f':
+                self.columns[name] = array('d')
+            else:
+                self.columns[name] = array('q')
+
+    def add(self, rank, task):
+        super().add(rank, task)
+        columns = self.columns
+        columns['rank'].append(rank)
+        columns['tid'].append(task.tid)
+        columns['sta_time'].append(task.sta_time)
+        columns['end_time'].append(task.end_time)
+        columns['mig_time'].append(task.mig_time)
+        columns['local_node'].append(task.local_node)
+        columns['remot_node'].append(task.remot_node)
+
+    def get_trace(self):
+        trace = np.empty(len(self.columns['rank']), dtype=TASK_TRACE_DTYPE)
+        for name, values in self.columns.items():
+            trace[name] = values
+        return trace
+
+    def finish(self):
+        super().finish()
+        filename = get_profiling_filename("task_trace", ".npy", self.cost_balancing, self.cost_migration_delay)
+        print('\tWrite the task trace to: {}'.format(filename))
+        np.save(filename, self.get_trace())
+
+    def profile_queues(self, arr_queue_status):
+        profile_queue_status(arr_queue_status, self.cost_balancing, self.cost_migration_delay)
+
+
+def create_task_profiler(num_procs, cost_balancing=OVERHEAD_BALANCING_OPS, cost_migration_delay=OVERHEAD_DELAY):
+    """Create a task profiler of the configured profiling level."""
+    if PROFILING_LEVEL == 'trace':
+        return TraceProfiler(num_procs, cost_balancing, cost_migration_delay)
+    elif PROFILING_LEVEL == 'counters':
+        return CounterProfiler(num_procs)
+    return NoneProfiler()
+
+def render_task_trace(filename):
+    """Plot the gannt chart of a task trace written at the trace level."""
+    trace = np.load(filename, mmap_mode='r')
+    num_procs = int(trace['rank'].max()) + 1 if len(trace) != 0 else 0
+    gannt_values_local_tasks = [[] for i in range(num_procs)]
+    gannt_values_remot_tasks = [[] for i in range(num_procs)]
+    for rank, sta_time, end_time, loc_node, rem_node in zip(trace['rank'].tolist(), trace['sta_time'].tolist(),
+                                                              trace['end_time'].tolist(), trace['local_node'].tolist(),
+                                                              trace['remot_node'].tolist()):
+        gann_info = (sta_time, end_time-sta_time)
+        if is_remote_task(rank, loc_node, rem_node):
+            gannt_values_remot_tasks[rank].append(gann_info)
+        else:
+            gannt_values_local_tasks[rank].append(gann_info)
+    plot_gann_chart(gannt_values_local_tasks, gannt_values_remot_tasks)
+
+
 # -----------------------------------------------------
 # Profile the queue status
 # -----------------------------------------------------
-def profile_queue_status(arr_queue_status):
+def profile_queue_status(arr_queue_status, cost_balancing, cost_migration_delay):
+    """Write the queue status as a ranks x ticks .npy trace and its metadata
+    header as .json next to it, the trace can be loaded memory-mapped."""
     num_procs = len(arr_queue_status)
-    O_balancing = int(OVERHEAD_BALANCING_OPS)
-    O_delay = int(OVERHEAD_DELAY)
+    num_ticks = len(arr_queue_status[0])
+    O_balancing = int(cost_balancing)
+    O_delay = int(cost_migration_delay)
     
-    # write to file
-    filename = './profiled_queues_obalancing' + str(O_balancing) + '_odelay' + str(O_delay) + '.csv'
+    # write to file, rank by rank into the memory-mapped trace
+    filename = './profiled_queues_obalancing' + str(O_balancing) + '_odelay' + str(O_delay) + '.npy'
     print('\tWrite profiled queue data to: {}'.format(filename))
-    f = open(filename, 'w')
-    writer = csv.writer(f)
+    trace = np.lib.format.open_memmap(filename, mode='w+', dtype=QUEUE_STATUS_TRACE_DTYPE,
+                                        shape=(num_procs, num_ticks))
     for i in range(num_procs):
-        queue_stat = arr_queue_status[i]
-        writer.writerow(queue_stat)
-    f.close()
+        trace[i] = arr_queue_status[i]
+    trace.flush()
+    del trace
+
+    metadata = {
+        'format': 'queue_status',
+        'version': QUEUE_STATUS_TRACE_VERSION,
+        'num_procs': num_procs,
+        'num_ticks': num_ticks,
+        'dtype': QUEUE_STATUS_TRACE_DTYPE,
+        'balancing_ops_cost': O_balancing,
+        'migration_delay_cost': O_delay
+    }
+    with open(get_trace_metadata_file(filename), 'w') as f:
+        json.dump(metadata, f, indent=4)
+
+def get_trace_metadata_file(filename):
+    return os.path.splitext(filename)[0] + '.json'
+
+def read_queue_status_trace(filename):
+    """Load a queue status trace memory-mapped, together with its metadata."""
+    trace = np.load(filename, mmap_mode='r')
+    metadata = {}
+    metadata_file = get_trace_metadata_file(filename)
+    if os.path.exists(metadata_file):
+        with open(metadata_file) as f:
+            metadata = json.load(f)
+    return [trace, metadata]
 
 
 # -----------------------------------------------------
@@ -195,4 +368,15 @@ def statistic_info(arr_local_load, arr_remote_load, clockrate):
     print('min. load: {:7.1f}'.format(min_load))
     print('avg. load: {:7.1f}'.format(avg_load))
     print('R_imb:     {:7.1f}'.format(R_imb))
-    print('--------------------\n')
\ No newline at end of file
+    print('--------------------\n')
+
+
+# -----------------------------------------------------
+# Render a task trace to a gannt chart
+# -----------------------------------------------------
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python profiler.py <task_trace.npy>")
+        exit(1)
+    render_task_trace(sys.argv[1])
+    print('\tWrite the gannt chart to: {}'.format(get_profiling_filename("visualized", ".pdf")))
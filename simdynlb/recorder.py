@@ -0,0 +1,290 @@
+"""Recorders of the queue status with bounded memory.
+
+The queue length of each rank is recorded on every clock tick, keeping all
+values costs ticks x ranks Python ints. A recorder keeps them by a policy:
+    - change: only the ticks where the queue length of a rank changes
+              (run-length), memory scales with the number of queue changes
+    - stride: a sample every QUEUE_STATUS_STRIDE ticks
+    - ring:   a typed numpy buffer of QUEUE_STATUS_RING_TICKS ticks, full
+              buffers are spilled to .npy chunks in QUEUE_STATUS_SPILL_DIR
+
+All recorders give the same read API, recorder[rank] is the per-tick
+series of a rank as before with arr_queue_status[rank]. to_changes() gives
+the queue status of all ranks in run-length form, to be saved instead of
+the ranks x ticks array (see sweep.py).
+"""
+
+from array import array
+import numpy as np
+import tempfile
+import shutil
+import os
+
+# -----------------------------------------------------
+# Constant Definition
+# -----------------------------------------------------
+QUEUE_STATUS_POLICIES = ['change', 'stride', 'ring']
+QUEUE_STATUS_POLICY = 'change'
+QUEUE_STATUS_STRIDE = 100       # ticks between two samples
+QUEUE_STATUS_RING_TICKS = 65536 # ticks kept in memory before spilling
+QUEUE_STATUS_SPILL_DIR = None   # None: a new temporary folder per recorder
+
+# -----------------------------------------------------
+# Util Functions
+# -----------------------------------------------------
+def set_queue_status_policy(policy, stride=None, ring_ticks=None, spill_dir=None):
+    global QUEUE_STATUS_POLICY, QUEUE_STATUS_STRIDE, QUEUE_STATUS_RING_TICKS, QUEUE_STATUS_SPILL_DIR
+    if policy not in QUEUE_STATUS_POLICIES:
+        raise ValueError('unknown queue status policy {}, should be one of {}'.format(policy, QUEUE_STATUS_POLICIES))
+    QUEUE_STATUS_POLICY = policy
+    if stride is not None:
+        QUEUE_STATUS_STRIDE = stride
+    if ring_ticks is not None:
+        QUEUE_STATUS_RING_TICKS = ring_ticks
+    if spill_dir is not None:
+        QUEUE_STATUS_SPILL_DIR = spill_dir
+
+def create_queue_status_recorder(initial_lengths):
+    """Create a recorder of the configured policy, holding tick 0."""
+    if QUEUE_STATUS_POLICY == 'stride':
+        return StrideRecorder(initial_lengths, QUEUE_STATUS_STRIDE)
+    elif QUEUE_STATUS_POLICY == 'ring':
+        return RingRecorder(initial_lengths, QUEUE_STATUS_RING_TICKS, QUEUE_STATUS_SPILL_DIR)
+    return ChangeRecorder(initial_lengths)
+
+def get_queue_status_array(arr_queue_status):
+    """Get the queue status as a ranks x ticks array, from a recorder or lists."""
+    if isinstance(arr_queue_status, QueueStatusRecorder):
+        return arr_queue_status.to_array()
+    return np.asarray(arr_queue_status)
+
+def expand_queue_status_changes(ticks, values, offsets, num_ticks):
+    """Get the ranks x ticks array of a queue status in run-length form."""
+    num_procs = len(offsets) - 1
+    queue_status = np.empty((num_procs, num_ticks), dtype=values.dtype)
+    for r in range(num_procs):
+        rank_ticks = ticks[offsets[r]:offsets[r+1]]
+        run_lengths = np.diff(np.append(rank_ticks, num_ticks))
+        queue_status[r] = np.repeat(values[offsets[r]:offsets[r+1]], run_lengths)
+    return queue_status
+
+# -----------------------------------------------------
+# Recorders
+# -----------------------------------------------------
+"""The base class of recorders
+
+record(clock, lengths) gives the queue lengths of all ranks at a clock.
+The ticks skipped since the last record keep the last queue lengths, so
+an engine jumping over ticks records only the clocks it visits. The list
+of lengths is kept by the recorder, it should not be changed afterwards.
+record_changes(clock, changed_lengths) gives only the {rank: length} of the
+ranks changed since the last record, e.g., by the active set of the tick
+engine, the change recorder keeps them without a walk over all ranks.
+"""
+class QueueStatusRecorder:
+
+    def __init__(self, initial_lengths):
+        self.num_procs = len(initial_lengths)
+        self.num_ticks = 1
+        self.last = list(initial_lengths)
+
+    def record(self, clock, lengths):
+        num_skipped_ticks = clock - self.num_ticks
+        if num_skipped_ticks > 0:
+            self.hold(num_skipped_ticks)
+            self.num_ticks = clock
+        self.push(lengths)
+        self.num_ticks = clock + 1
+
+    def record_changes(self, clock, changed_lengths):
+        num_skipped_ticks = clock - self.num_ticks
+        if num_skipped_ticks > 0:
+            self.hold(num_skipped_ticks)
+            self.num_ticks = clock
+        self.push_changes(changed_lengths)
+        self.num_ticks = clock + 1
+
+    def hold(self, num_ticks):
+        pass
+
+    def push(self, lengths):
+        pass
+
+    def push_changes(self, changed_lengths):
+        lengths = list(self.last)
+        for r, length in changed_lengths.items():
+            lengths[r] = length
+        self.push(lengths)
+
+    def get_series(self, rank):
+        return np.zeros(self.num_ticks, dtype=np.int64)
+
+    def get_changes(self, rank):
+        """Get the ticks where the queue length changes and the new lengths."""
+        series = self.get_series(rank)
+        ticks = np.append(0, np.flatnonzero(np.diff(series)) + 1)
+        return [ticks, series[ticks]]
+
+    def to_array(self):
+        return np.stack([self.get_series(r) for r in range(self.num_procs)])
+
+    def to_changes(self):
+        """Get the changes of all ranks as [ticks, values, offsets], those of
+        rank r are at offsets[r]:offsets[r+1], one rank in memory at a time."""
+        arr_ticks = []
+        arr_values = []
+        offsets = np.zeros(self.num_procs + 1, dtype=np.int64)
+        for r in range(self.num_procs):
+            ticks, values = self.get_changes(r)
+            arr_ticks.append(ticks)
+            arr_values.append(values)
+            offsets[r+1] = offsets[r] + len(ticks)
+        return [np.concatenate(arr_ticks).astype(np.int64), np.concatenate(arr_values).astype(np.int64), offsets]
+
+    def close(self):
+        pass
+
+    def __len__(self):
+        return self.num_procs
+
+    def __getitem__(self, rank):
+        return self.get_series(rank)
+
+
+class ChangeRecorder(QueueStatusRecorder):
+
+    def __init__(self, initial_lengths):
+        super().__init__(initial_lengths)
+        self.change_ticks = [array('q', [0]) for r in range(self.num_procs)]
+        self.change_values = [array('q', [q]) for q in self.last]
+
+    def push(self, lengths):
+        last = self.last
+        if lengths == last:
+            return
+        tick = self.num_ticks
+        for r in range(self.num_procs):
+            if lengths[r] != last[r]:
+                self.change_ticks[r].append(tick)
+                self.change_values[r].append(lengths[r])
+        self.last = list(lengths)
+
+    def push_changes(self, changed_lengths):
+        last = self.last
+        tick = self.num_ticks
+        for r, length in changed_lengths.items():
+            if length != last[r]:
+                self.change_ticks[r].append(tick)
+                self.change_values[r].append(length)
+                last[r] = length
+
+    def get_changes(self, rank):
+        """Get the ticks where the queue length changes and the new lengths."""
+        return [np.frombuffer(self.change_ticks[rank], dtype=np.int64),
+                np.frombuffer(self.change_values[rank], dtype=np.int64)]
+
+    def get_series(self, rank):
+        ticks, values = self.get_changes(rank)
+        run_lengths = np.diff(np.append(ticks, self.num_ticks))
+        return np.repeat(values, run_lengths)
+
+
+class StrideRecorder(QueueStatusRecorder):
+
+    def __init__(self, initial_lengths, stride):
+        super().__init__(initial_lengths)
+        self.stride = stride
+        self.samples = [array('q', [q]) for q in self.last]
+
+    def hold(self, num_ticks):
+        # the skipped ticks that fall on a sample keep the last lengths
+        first = -(-self.num_ticks // self.stride)
+        end = -(-(self.num_ticks + num_ticks) // self.stride)
+        if end > first:
+            for r in range(self.num_procs):
+                self.samples[r].extend([self.last[r]] * (end - first))
+
+    def push(self, lengths):
+        if self.num_ticks % self.stride == 0:
+            for r in range(self.num_procs):
+                self.samples[r].append(lengths[r])
+        self.last = lengths
+
+    def push_changes(self, changed_lengths):
+        # only the ticks on a sample walk over the ranks
+        last = self.last
+        for r, length in changed_lengths.items():
+            last[r] = length
+        if self.num_ticks % self.stride == 0:
+            for r in range(self.num_procs):
+                self.samples[r].append(last[r])
+
+    def get_samples(self, rank):
+        """Get the sampled queue lengths, at ticks 0, stride, 2*stride, ..."""
+        return np.frombuffer(self.samples[rank], dtype=np.int64)
+
+    def get_series(self, rank):
+        # the sampled length holds until the next sample
+        return np.repeat(self.get_samples(rank), self.stride)[:self.num_ticks]
+
+
+class RingRecorder(QueueStatusRecorder):
+
+    def __init__(self, initial_lengths, ring_ticks, spill_dir=None):
+        super().__init__(initial_lengths)
+        self.buffer = np.empty((ring_ticks, self.num_procs), dtype=np.int32)
+        self.buffer[0] = self.last
+        self.pos = 1
+        self.spill_dir = spill_dir
+        self.own_spill_dir = False
+        self.chunk_files = []
+
+    def spill(self):
+        if self.spill_dir is None:
+            self.spill_dir = tempfile.mkdtemp(prefix='queue_status_')
+            self.own_spill_dir = True
+        else:
+            os.makedirs(self.spill_dir, exist_ok=True)
+        filename = os.path.join(self.spill_dir, 'queue_status_{}_{:05d}.npy'.format(id(self), len(self.chunk_files)))
+        np.save(filename, self.buffer[:self.pos])
+        self.chunk_files.append(filename)
+        self.pos = 0
+
+    def hold(self, num_ticks):
+        while num_ticks > 0:
+            if self.pos == len(self.buffer):
+                self.spill()
+            k = min(num_ticks, len(self.buffer) - self.pos)
+            self.buffer[self.pos:self.pos+k] = self.last
+            self.pos += k
+            num_ticks -= k
+
+    def push(self, lengths):
+        if self.pos == len(self.buffer):
+            self.spill()
+        self.buffer[self.pos] = lengths
+        self.pos += 1
+        self.last = lengths
+
+    def get_chunks(self):
+        # the spilled chunks are memory-mapped, not loaded
+        chunks = [np.load(f, mmap_mode='r') for f in self.chunk_files]
+        chunks.append(self.buffer[:self.pos])
+        return chunks
+
+    def get_series(self, rank):
+        return np.concatenate([chunk[:, rank] for chunk in self.get_chunks()])
+
+    def to_array(self):
+        return np.concatenate(self.get_chunks()).T
+
+    def close(self):
+        """Remove the spilled chunks from disk."""
+        for f in self.chunk_files:
+            if os.path.exists(f):
+                os.remove(f)
+        self.chunk_files = []
+        if self.own_spill_dir:
+            shutil.rmtree(self.spill_dir, ignore_errors=True)
+            self.spill_dir = None
+            self.own_spill_dir = False
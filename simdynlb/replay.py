@@ -0,0 +1,191 @@
+"""Trace-driven workloads: replay the recorded runtimes of tasks.
+
+A trace holds one row per task: the rank it ran on, its runtime in seconds
+and its data size in MB (optional, TASK_DATA_SIZE if not recorded), the
+tasks of a rank in their order on the rank. It is given by the trace_file
+value of the context, as:
+    - .npy: a structured array with the fields rank, dur (and data), read
+      memory-mapped, never loaded as a whole
+    - .csv: a header with the column names rank, dur (and data), read in
+      chunks of TRACE_CHUNK_ROWS rows
+The queues are fed from a copy of the trace grouped by rank, a memory-mapped
+<trace_file>.replay.npy written once in chunks by a counting sort over the
+ranks (two passes over the trace), and written again only if the trace is
+newer. A .npy trace already grouped by rank is replayed as it is.
+
+The tasks are generated from the slice of each rank as the queues drain
+(workload.py), so tens of millions of tasks are never held as Python
+objects. A recorded runtime is divided by the slowdown scale on a slowdown
+rank and rounded to clock ticks; the trace replaces num_tasks_per_rank. A
+task migrated to a slowdown rank keeps its recorded size, its runtime is
+scaled by the speed of the ranks (performance.py).
+
+  Typical usage example:
+  generator = TraceTaskGenerator('trace.csv', num_procs, sld_procs, sld_scales, clock_rate)
+  workload = create_generated_workload(generator, 'lazy')
+"""
+
+import numpy as np
+import itertools
+import os
+
+from workload import *
+
+# -----------------------------------------------------
+# Constant Definition
+# -----------------------------------------------------
+TRACE_DTYPE = np.dtype([
+    ('rank', np.int32),
+    ('dur', np.float64),
+    ('data', np.float32)
+])
+TRACE_CHUNK_ROWS = 1 << 20      # rows of a trace read at once
+TRACE_REQUIRED_FIELDS = ['rank', 'dur']
+REPLAY_FILE_EXT = '.replay.npy'
+
+# -----------------------------------------------------
+# Util Functions
+# -----------------------------------------------------
+def make_trace_chunk(columns, num_rows):
+    # a chunk of TRACE_DTYPE from the recorded columns
+    chunk = np.empty(num_rows, dtype=TRACE_DTYPE)
+    chunk['rank'] = columns['rank']
+    chunk['dur'] = columns['dur']
+    chunk['data'] = columns['data'] if 'data' in columns else TASK_DATA_SIZE
+    return chunk
+
+def check_trace_fields(filename, names):
+    for field in TRACE_REQUIRED_FIELDS:
+        if field not in names:
+            raise ValueError('trace {} should have the fields {}, got {}'.format(
+                                filename, TRACE_REQUIRED_FIELDS, list(names)))
+
+def read_npy_chunks(filename, chunk_rows=TRACE_CHUNK_ROWS):
+    """Iterate over the chunks of a .npy trace, memory-mapped."""
+    rows = np.load(filename, mmap_mode='r')
+    check_trace_fields(filename, rows.dtype.names or [])
+    for start in range(0, len(rows), chunk_rows):
+        chunk = rows[start:start + chunk_rows]
+        yield make_trace_chunk({name: chunk[name] for name in chunk.dtype.names}, len(chunk))
+
+def read_csv_chunks(filename, chunk_rows=TRACE_CHUNK_ROWS):
+    """Iterate over the chunks of a .csv trace, chunk_rows lines at once."""
+    with open(filename) as f:
+        names = [name.strip() for name in f.readline().split(',')]
+        check_trace_fields(filename, names)
+        while True:
+            lines = list(itertools.islice(f, chunk_rows))
+            if len(lines) == 0:
+                break
+            values = np.loadtxt(lines, delimiter=',', ndmin=2)
+            yield make_trace_chunk({name: values[:, i] for i, name in enumerate(names)}, len(values))
+
+def read_trace_chunks(filename, chunk_rows=TRACE_CHUNK_ROWS):
+    if filename.endswith('.npy'):
+        return read_npy_chunks(filename, chunk_rows)
+    if filename.endswith('.csv'):
+        return read_csv_chunks(filename, chunk_rows)
+    raise ValueError('unknown trace format {}, should be a .npy or a .csv file'.format(filename))
+
+def count_trace_tasks(filename, num_procs):
+    """Count the tasks per rank of a trace, and check if it is grouped by rank."""
+    counts = np.zeros(num_procs, dtype=np.int64)
+    grouped = True
+    last_rank = 0
+    for chunk in read_trace_chunks(filename):
+        ranks = chunk['rank']
+        if len(ranks) == 0:
+            continue
+        if ranks.min() < 0 or ranks.max() >= num_procs:
+            raise ValueError('trace {} has ranks out of 0..{}'.format(filename, num_procs - 1))
+        if grouped and (ranks[0] < last_rank or (np.diff(ranks) < 0).any()):
+            grouped = False
+        last_rank = ranks[-1]
+        counts += np.bincount(ranks, minlength=num_procs)
+    return counts, grouped
+
+def write_grouped_trace(filename, grouped_filename, counts):
+    """Write the rows of a trace grouped by rank, in their order per rank."""
+    offsets = np.concatenate([[0], np.cumsum(counts)])
+    rows = np.lib.format.open_memmap(grouped_filename + '.tmp.npy', mode='w+', dtype=TRACE_DTYPE,
+                                        shape=(int(offsets[-1]),))
+    next_rows = offsets[:-1].copy()
+    for chunk in read_trace_chunks(filename):
+        order = np.argsort(chunk['rank'], kind='stable')
+        ranks = chunk['rank'][order]
+        # the position of a row among the rows of its rank in the chunk
+        positions = np.arange(len(ranks)) - np.searchsorted(ranks, ranks, side='left')
+        rows[next_rows[ranks] + positions] = chunk[order]
+        next_rows += np.bincount(ranks, minlength=len(counts))
+    rows.flush()
+    del rows
+    os.replace(grouped_filename + '.tmp.npy', grouped_filename)
+
+def is_replay_file_current(filename, grouped_filename):
+    return os.path.exists(grouped_filename) and os.path.getmtime(grouped_filename) >= os.path.getmtime(filename)
+
+def open_trace(filename, num_procs):
+    """Open the rows of a trace grouped by rank, memory-mapped, and the
+    offsets of the rows of each rank."""
+    grouped_filename = filename + REPLAY_FILE_EXT
+    if is_replay_file_current(filename, grouped_filename):
+        counts, grouped = count_trace_tasks(grouped_filename, num_procs)
+        rows_filename = grouped_filename
+    else:
+        counts, grouped = count_trace_tasks(filename, num_procs)
+        rows_filename = filename
+        if not grouped or not filename.endswith('.npy') or np.load(filename, mmap_mode='r').dtype != TRACE_DTYPE:
+            write_grouped_trace(filename, grouped_filename, counts)
+            rows_filename = grouped_filename
+    offsets = np.concatenate([[0], np.cumsum(counts)])
+    return np.load(rows_filename, mmap_mode='r'), offsets, rows_filename
+
+# -----------------------------------------------------
+# Generators
+# -----------------------------------------------------
+"""Class TraceTaskGenerator gives the tasks of the ranks from a trace, with
+the functions of TaskGenerator
+    - rows: the trace grouped by rank, memory-mapped
+    - offsets: the first row of each rank, and the number of rows at the end
+    - tick_factors: the clock ticks per recorded second on each rank
+"""
+class TraceTaskGenerator(TaskGenerator):
+    def __init__(self, filename, num_procs, sld_procs, sld_scales, clock_rate, block_size=TASK_BLOCK_SIZE):
+        self.filename = filename
+        self.num_procs = num_procs
+        self.block_size = block_size
+        self.rows, self.offsets, self.rows_filename = open_trace(filename, num_procs)
+        for r in range(num_procs):
+            make_task_ids(r, 0, self.get_num_tasks(r)) # check the number of tasks
+
+        tick_factors = np.full(num_procs, float(clock_rate))
+        for i in range(len(sld_procs)):
+            tick_factors[sld_procs[i]] = 1.0 / sld_scales[i] * clock_rate
+        self.tick_factors = tick_factors
+
+    def __getstate__(self):
+        # a spawned process maps the trace again
+        state = dict(self.__dict__)
+        del state['rows']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.rows = np.load(self.rows_filename, mmap_mode='r')
+
+    def get_num_tasks(self, rank):
+        return int(self.offsets[rank+1] - self.offsets[rank])
+
+    def get_total_tasks(self):
+        return int(self.offsets[-1])
+
+    def get_rows(self, rank, start, end):
+        first = self.offsets[rank]
+        return self.rows[first + start:first + end]
+
+    def get_durs(self, rank, start, end):
+        durs = self.get_rows(rank, start, end)['dur'] * self.tick_factors[rank]
+        return np.maximum(1, np.round(durs))
+
+    def get_data(self, rank, start, end):
+        return np.asarray(self.get_rows(rank, start, end)['data'], dtype=np.float64)
@@ -0,0 +1,154 @@
+"""Random streams of the simulator, reproducible per iteration.
+
+The randomized costs (balancing, migration delay, runtime of a migrated
+task) are drawn from numpy Generators, one stream per (iteration, rank,
+cost type), all spawned from one root seed:
+    - a stream is seeded by SeedSequence(RANDOM_SEED, spawn_key=(iter, rank,
+      cost type)), so its values do not depend on the other streams, the
+      order of the ranks, or the process simulating the iteration (serial
+      or in a pool of processes)
+    - a stream draws COST_BLOCK_SIZE uniform values at once and refills the
+      block when it is used up, the streams are created on first use
+    - the handshakes of the balancers keep the python random, seeded once
+      per iteration from the root seed as well
+    - the draws for all ranks at once, e.g., the performance trajectories,
+      come from a Generator of the iteration (get_iteration_generator)
+    - the workload is the same in all iterations, its Generators are keyed
+      by e.g., (rank, block) apart from the streams of the iterations
+      (get_workload_generator)
+The engines start the streams of an iteration by start_random_streams(iter)
+when they create the balancing context.
+"""
+
+import numpy as np
+import random
+import math
+
+# -----------------------------------------------------
+# Constant Definition
+# -----------------------------------------------------
+RANDOM_SEED = 0       # the root seed of all streams
+COST_BLOCK_SIZE = 64  # values drawn at once per stream
+COST_TYPES = {'balancing': 0, 'delay': 1, 'runtime': 2}
+ITERATION_STREAMS = {'performance': 0}
+WORKLOAD_ENTROPY = 1  # the second entropy word of the workload streams
+RANDOM_STREAMS = None # the streams of the current iteration
+
+# -----------------------------------------------------
+# Util Functions
+# -----------------------------------------------------
+def set_random_seed(seed):
+    global RANDOM_SEED
+    seed = int(seed)
+    if seed < 0:
+        raise ValueError('random seed should be non-negative, got {}'.format(seed))
+    RANDOM_SEED = seed
+
+def get_handshake_seed(iter):
+    seed_seq = np.random.SeedSequence(RANDOM_SEED, spawn_key=(iter,))
+    return int(seed_seq.generate_state(1, dtype=np.uint64)[0])
+
+def start_random_streams(iter):
+    """Start the cost streams and the handshake random of an iteration, a
+    simulated iteration gets the same values every time."""
+    global RANDOM_STREAMS
+    RANDOM_STREAMS = RandomStreams(RANDOM_SEED, iter)
+    random.seed(get_handshake_seed(iter))
+
+def get_iteration_generator(iter, stream_type):
+    """Get a Generator of the iteration for a stream type in ITERATION_STREAMS."""
+    seed_seq = np.random.SeedSequence(RANDOM_SEED, spawn_key=(iter, ITERATION_STREAMS[stream_type]))
+    return np.random.Generator(np.random.PCG64(seed_seq))
+
+def get_workload_generator(seed, key=()):
+    """Get a Generator of the workload, independent of the iteration."""
+    seed_seq = np.random.SeedSequence([seed, WORKLOAD_ENTROPY], spawn_key=key)
+    return np.random.Generator(np.random.PCG64(seed_seq))
+
+def get_cost_stream(iter, rank, cost_type):
+    global RANDOM_STREAMS
+    if RANDOM_STREAMS is None or RANDOM_STREAMS.iter != iter or RANDOM_STREAMS.seed != RANDOM_SEED:
+        # e.g., costs drawn outside of an engine
+        RANDOM_STREAMS = RandomStreams(RANDOM_SEED, iter)
+    return RANDOM_STREAMS.get_stream(rank, cost_type)
+
+def draw_cost(iter, rank, cost_type, low, high):
+    """Draw an integer cost in [low, high] from the stream of the rank, the
+    bounds are rounded inwards, a range without an integer gives its middle
+    rounded."""
+    int_low = math.ceil(low)
+    int_high = math.floor(high)
+    if int_high < int_low:
+        return round((low + high) / 2)
+    return get_cost_stream(iter, rank, cost_type).integer(int_low, int_high)
+
+def draw_costs(iter, rank, cost_type, lows, highs):
+    """Draw the costs of draw_cost for arrays of bounds at once, with the
+    values of the stream in the same order as draw_cost one by one."""
+    lows = np.asarray(lows, dtype=np.float64)
+    highs = np.asarray(highs, dtype=np.float64)
+    int_lows = np.ceil(lows)
+    int_highs = np.floor(highs)
+    costs = np.round((lows + highs) / 2)
+    drawn = int_highs >= int_lows
+    num_drawn = int(np.count_nonzero(drawn))
+    if num_drawn != 0:
+        values = get_cost_stream(iter, rank, cost_type).uniforms(num_drawn)
+        costs[drawn] = int_lows[drawn] + np.floor(values * (int_highs[drawn] - int_lows[drawn] + 1))
+    return costs
+
+"""Class CostStream gives the values of a stream from pre-drawn blocks
+    - uniform(): a value in [0, 1)
+    - uniforms(num): the next num values as numpy array
+    - integer(low, high): an integer in [low, high], as random.randint
+"""
+class CostStream:
+    def __init__(self, seed_seq):
+        self.generator = np.random.Generator(np.random.PCG64(seed_seq))
+        self.block = []
+        self.pos = 0
+
+    def refill(self):
+        self.block = self.generator.random(COST_BLOCK_SIZE).tolist()
+        self.pos = 0
+
+    def uniform(self):
+        if self.pos == len(self.block):
+            self.refill()
+        value = self.block[self.pos]
+        self.pos += 1
+        return value
+
+    def uniforms(self, num):
+        values = []
+        while len(values) < num:
+            if self.pos == len(self.block):
+                self.refill()
+            end = min(len(self.block), self.pos + num - len(values))
+            values += self.block[self.pos:end]
+            self.pos = end
+        return np.array(values, dtype=np.float64)
+
+    def integer(self, low, high):
+        return low + int(self.uniform() * (high - low + 1))
+
+
+"""Class RandomStreams keeps the cost streams of an iteration
+    - get_stream(rank, cost_type): the stream of a rank and a cost type in
+      COST_TYPES, created on first use
+"""
+class RandomStreams:
+    def __init__(self, seed, iter):
+        self.seed = seed
+        self.iter = iter
+        self.streams = {}
+
+    def get_stream(self, rank, cost_type):
+        key = (rank, cost_type)
+        stream = self.streams.get(key)
+        if stream is None:
+            seed_seq = np.random.SeedSequence(self.seed, spawn_key=(self.iter, rank, COST_TYPES[cost_type]))
+            stream = CostStream(seed_seq)
+            self.streams[key] = stream
+        return stream
+
@@ -5,24 +5,30 @@ In case of imbalance at runtime with the constrain of communication overhead, th
 helps to estimate the bounds of performane efficiency.
 
   Typical usage example (temporaily):
-  $ python simulator.py <config_input.txt>
+  $ python simulator.py <context_input.json> [--engine tick|event|soa] [--jobs N]
+                          [--queue-status change|stride|ring] [--profiling none|counters|trace]
+                          [--log-level none|info|debug|trace] [--log-format jsonl|binary]
+  $ python profiler.py <task_trace.npy> (plot the gannt chart of a trace)
+  $ python logger.py <simulation_log.jsonl> (show the records of a log)
 """
 
-from queue import Queue
-from time import sleep, perf_counter
-from threading import Thread
-
 from task import *
 from balancer import *
 from migrator import *
 from profiler import *
-
-import re
-import os
-import sys
-import copy
-import numpy as np
-import pandas as pd
+from event_engine import *
+from soa_engine import *
+from parallel import *
+from recorder import *
+from strategies import *
+from network import *
+from logger import *
+from config import *
+from workload import *
+from replay import *
+from active_set import *
+
+import argparse
 
 # -----------------------------------------------------
 # Constant Definition
@@ -32,14 +38,16 @@ CLOCK_RATE = 1E3 # count as miliseconds
 # -----------------------------------------------------
 # Init simulation
 # -----------------------------------------------------
-def init_simulation(cf):
-
-    # extract setup information
-    clock_rate = cf.iloc[1,0]
-    num_processes = int(cf.iloc[6,0])
-    num_slowdown_ranks = int(cf.iloc[7,0])
-    num_tasks_per_rank = int(cf.iloc[8,0])
-    slowdown = cf.iloc[9,0]
+def init_simulation(scenario):
+
+    # extract setup information, a dict of the context is checked first
+    if not isinstance(scenario, Scenario):
+        scenario = Scenario(scenario)
+    clock_rate = scenario.clock_rate
+    num_processes = scenario.num_process
+    num_slowdown_ranks = scenario.num_slowdown_rank
+    num_tasks_per_rank = scenario.num_tasks_per_rank
+    slowdown = scenario.slowdown_scale
     
     # local task queues on each rank
     local_queues = []
@@ -51,34 +59,44 @@ def init_simulation(cf):
         slowdown_ranks.append(p)
         slowdown_scales.append(slowdown)
 
-    # init the local task queues
-    for r in range(num_processes):
-        arr_local_tasks = []
-        for t in range(num_tasks_per_rank):
-            tid = (r << 16) + t
-            dur = 1.0
-            if r in slowdown_ranks:
-                dur = dur/slowdown_scales[r]
-            dur = dur * clock_rate
-            data = 1.0 # MB
-            node = r
-            task = Task(tid, dur, data, node)
-            arr_local_tasks.append(task)
-
-        # add the local queue of tasks per rank
-        local_queues.append(arr_local_tasks)
+    # init the local task queues, the tasks are rows of a task table or
+    # generated in blocks as the queues drain, e.g., "task_distribution":
+    # "lognormal" and "workload_generation": "lazy", or replayed from the
+    # recorded tasks of "trace_file": "trace.csv"
+    if scenario.trace_file is not None:
+        generator = TraceTaskGenerator(scenario.trace_file, num_processes, slowdown_ranks, slowdown_scales,
+                                        clock_rate, scenario.task_block_size)
+        local_queues = create_generated_workload(generator, scenario.workload_generation)
+    else:
+        distribution = get_task_distribution(scenario.task_distribution, scenario)
+        local_queues = create_workload(num_processes, num_tasks_per_rank, slowdown_ranks, slowdown_scales, clock_rate,
+                                        distribution, scenario.workload_generation, scenario.task_block_size)
+
+    # compile the speed of the ranks for the runtime of migrated tasks, the
+    # optional multipliers e.g., "runtime_multiplier_file": "mult.npy"
+    multipliers = None
+    multiplier_file = scenario.runtime_multiplier_file
+    if multiplier_file is not None:
+        multipliers = read_runtime_multipliers(multiplier_file)
+    set_rank_speed_model(RankSpeedModel(num_processes, slowdown_ranks, slowdown_scales, clock_rate, multipliers))
 
     return [local_queues, slowdown_ranks, slowdown_scales]
 
-# -----------------------------------------------------
-# Update load array
-# -----------------------------------------------------
-def update_total_load(rank, local_load_arr, remot_load_arr, cur_task):
-    orig_node = cur_task.local_node
-    if orig_node == rank:
-        local_load_arr[rank] += 1
-    else:
-        remot_load_arr[rank] += 1
+def apply_scenario(scenario):
+    """Set the models of the simulator by the optional values of a scenario,
+    the values of a previous scenario are not kept."""
+    # the balancing strategies, e.g., "work_stealing" or "react_offloading"
+    set_balancing_strategies(scenario.balancing_strategy)
+    # the network of the messages, e.g., "network_latency": 2 (ticks)
+    set_network_model_from_context(scenario)
+    # the ranks on nodes and switches, e.g., "ranks_per_node": 4
+    set_topology_from_context(scenario)
+    # the fluctuation of the rank speed, e.g., "perf_model": "normal_throttled_noisy"
+    set_performance_model_from_context(scenario)
+    # the root seed of the random streams, e.g., "random_seed": 7
+    set_random_seed(scenario.random_seed)
+    # the max tasks migrated per handshake, e.g., "migration_batch_size": 8
+    set_migration_batch_size(scenario.migration_batch_size, scenario.migration_batch_policy)
 
 # -----------------------------------------------------
 # Simulation engine
@@ -86,8 +104,8 @@ def update_total_load(rank, local_load_arr, remot_load_arr, cur_task):
 def simulate(local_queues, slowdown_procs, slowdown_scales, iter, clock_rate,
                 cost_balancing, cost_migration_delay, noise):
 
-    # make a copy of local_queues to keep it for next iterations
-    copy_local_queues = copy.deepcopy(local_queues)
+    # restore the initial local_queues, they are kept for next iterations
+    copy_local_queues = restore_local_queues(local_queues)
     
     # for clocking and tracking task execution
     clock = 0
@@ -95,200 +113,223 @@ def simulate(local_queues, slowdown_procs, slowdown_scales, iter, clock_rate,
     arr_local_load = []
     arr_remot_load = []
 
-    # arrays for work stealing
-    arr_steal_request_msg = []
-    arr_steal_accept_msg  = []
-
-    # arrays for react task offloading
+    # the being-executed task of each process
     arr_being_exe_tasks = []
-    arr_victim_offloader = []
-    arr_num_tasks_before_execution = []
-    arr_tmp_buffer_migrated_tasks  = []
-
-    # arrays for profiling tasks executed
-    arr_profiled_tasks = []
-    arr_queue_status = []
 
     # check and init the queues for the first time
     num_procs = len(copy_local_queues)
-    num_tasks_being_executed = 0
-    sum_queues_length = 0
     for i in range(num_procs):
-        arr_num_tasks_before_execution.append(len(copy_local_queues[i]))
-        sum_queues_length += len(copy_local_queues[i]) # get num total tasks
-        remote_queues.append([])
+        remote_queues.append(TaskQueue())
         arr_local_load.append(0.0)
         arr_remot_load.append(0.0)
-        
-        # for work stealing
-        arr_steal_request_msg.append([])
-        arr_steal_accept_msg.append([])
-
-        # for react task offloading
         arr_being_exe_tasks.append(None)
-        arr_victim_offloader.append([])
-        arr_tmp_buffer_migrated_tasks.append([])
-        
-        # profiled tasks arr for each process
-        arr_profiled_tasks.append([])
-        arr_queue_status.append([len(copy_local_queues[i])])
+
+    # the ranks with an event at a clock and the counters of remaining and
+    # running tasks, kept by the queues on change (active_set.py)
+    active_set = ActiveSet(copy_local_queues, remote_queues, arr_being_exe_tasks)
+
+    # the balancing strategies selected by the config, with their hooks
+    ctx = BalancingContext(copy_local_queues, remote_queues, arr_being_exe_tasks, slowdown_procs, slowdown_scales,
+                            iter, clock_rate, cost_balancing, cost_migration_delay, noise)
+    strategies = create_balancing_strategies(ctx)
+    tick_hooks = get_strategy_hooks(strategies, 'on_tick')
+
+    # the fluctuation of the rank speed, if any
+    performance = ctx.performance
+
+    # profile tasks executed by the profiling level
+    task_profiler = create_task_profiler(num_procs, cost_balancing, cost_migration_delay)
+
+    # record the queue status of all processes from the first clock
+    arr_queue_status = create_queue_status_recorder([len(q) for q in copy_local_queues])
 
     # --------------------------------------------------------
     # Main loop
     # --------------------------------------------------------
-    while(sum_queues_length != 0 or num_tasks_being_executed != 0):
+    while not active_set.is_done():
         # --------------------------------------------------------
         # increase clock in milisecond
         # --------------------------------------------------------
         clock += 1
+        active_set.start_clock(clock)
 
         # --------------------------------------------------------
-        # balancing strategies
+        # balancing strategies, e.g., work stealing, react offloading
         # --------------------------------------------------------
-        # 1. work-stealing
-        queue_status_res = check_queue_status(clock, num_procs, copy_local_queues)
-        
-        exchange_steal_request(clock, queue_status_res, arr_steal_request_msg, arr_steal_accept_msg)
-
-        recv_steal_accept(clock, queue_status_res, arr_steal_request_msg, arr_steal_accept_msg)
-
-        # steal_tasks(clock, copy_local_queues, queue_status_res, arr_steal_request_msg, arr_steal_accept_msg,
-        #             iter, cost_migration_delay, slowdown_procs, slowdown_scales, clock_rate, noise)
-
-        # 2. reactive task offloading
-        # Rimb = check_imbalance_status(clock, copy_local_queues, arr_being_exe_tasks)
-
-        # react_task_offloading(clock, num_procs, Rimb, copy_local_queues,
-        #                         arr_num_tasks_before_execution, arr_victim_offloader)
-
-        # --------------------------------------------------------
-        # offloading tasks
-        # --------------------------------------------------------
-        # select_tasks_to_offload(clock, copy_local_queues, arr_victim_offloader, 
-        #                         iter, cost_balancing, cost_migration_delay, noise)
-        
-        # offload_tasks(clock, copy_local_queues, remote_queues, arr_tmp_buffer_migrated_tasks,
-        #                 slowdown_procs, slowdown_scales, iter, clock_rate, noise)
+        for on_tick in tick_hooks:
+            on_tick(clock)
 
         # --------------------------------------------------------
         # executing tasks and updating load
         # --------------------------------------------------------
-        sum_remain_tasks = 0
-        sum_being_exe_task = 0.0
-
-        # pop task from the queues and execute them
-        for i in range(num_procs):
+        # only the ranks with an event at this clock, in rank order
+        i = active_set.next_due_rank()
+        while i != -1:
             # --------------------------------------------------------
             # check the being-executed tasks
             # --------------------------------------------------------
-            if arr_being_exe_tasks[i] != None:
-                cur_task = arr_being_exe_tasks[i]
-                end_time = cur_task.get_end_time()
-                if clock == end_time:
-                    update_total_load(i, arr_local_load, arr_remot_load, cur_task)
+            cur_task = arr_being_exe_tasks[i]
+            if cur_task != None:
+                if cur_task.get_end_time() <= clock:
+                    # the load of all executed ticks of the task
+                    add_task_load(i, arr_local_load, arr_remot_load, cur_task)
                     arr_being_exe_tasks[i] = None
-                    # print('   P[{}]: end_task={:d}, end_time={:f}'.format(i, cur_task.tid, end_time))
-                else:
-                    update_total_load(i, arr_local_load, arr_remot_load, cur_task)
-                    # print('   P[{}]: cur_task={:d}, end_time={:f}'.format(i, cur_task.tid, end_time))
+                    active_set.end_task(i)
 
             # --------------------------------------------------------
             # if no tasks being executed, then pop a new one
             # --------------------------------------------------------
             else:
+                task = None
+
                 #--------------------------------
                 # Prior 1: check remote queue
                 #--------------------------------
                 if len(remote_queues[i]) != 0:
-                    rtask = remote_queues[i].pop(0)
+                    task = remote_queues[i].popleft()
                     stime = clock
-                    etime = rtask.get_dur() + stime
-                    rtask.set_time(stime, etime)
-                    # denote remote-task being executed for Process i
-                    arr_being_exe_tasks[i] = rtask
-                    # profile tasks
-                    arr_profiled_tasks[i].append(rtask)
-                    
+
                 #--------------------------------
                 # Prior 2: check local queue
                 #--------------------------------
                 elif len(copy_local_queues[i]) != 0:
-                    task = copy_local_queues[i].pop(0) # pop tasks from the front
+                    task = copy_local_queues[i].popleft() # pop tasks from the front
                     stime = clock-1
-                    etime = task.get_dur() + stime
+
+                if task is not None:
+                    exe_dur = task.get_dur()
+                    if performance is not None:
+                        exe_dur = performance.get_exe_dur(i, stime, exe_dur)
+                    etime = exe_dur + stime
                     task.set_time(stime, etime)
                     # denote task being executed for Process i
                     arr_being_exe_tasks[i] = task
-                    # update the load value for Process i
-                    update_total_load(i, arr_local_load, arr_remot_load, task)
+                    active_set.start_task(i, task)
                     # print('   P[{}]: new_task={:d}, end_time={:f}'.format(i, task.tid, etime))
 
                     # profile tasks
-                    arr_profiled_tasks[i].append(task)
+                    task_profiler.add(i, task)
 
-            # count remaining tasks
-            sum_remain_tasks += len(copy_local_queues[i]) + len(remote_queues[i])
-            if arr_being_exe_tasks[i] != None:
-                sum_being_exe_task += 1
-                
-            # record the queue status at each clock
-            arr_queue_status[i].append(len(copy_local_queues[i]) + len(remote_queues[i]))
+            i = active_set.next_due_rank()
 
-        # --------------------------------------------------------
-        # updating the queue status for main loop
-        # --------------------------------------------------------
-        sum_queues_length = sum_remain_tasks
-        num_tasks_being_executed = sum_being_exe_task
-        # print("[Tcomm] clock[{}]: (main_loop) sum_queues_length={}, num_tasks_being_executed={}".format(clock, queues_status, num_tasks_being_executed))
+        # record the queue status of the changed ranks at this clock
+        arr_queue_status.record_changes(clock, active_set.pop_changed_lengths())
+        # print("[Tcomm] clock[{}]: (main_loop) sum_queues_length={}, num_tasks_being_executed={}".format(clock, active_set.num_remain_tasks, active_set.num_running_tasks))
 
-    # visualize task execution
-    visualize_task_execution(arr_profiled_tasks)
+    # show/write the profiled tasks, a trace is plotted later by profiler.py
+    task_profiler.finish()
 
-    # profile queue status
-    # profile_queue_status(arr_queue_status)
+    # write the queue status trace at the trace level
+    task_profiler.profile_queues(arr_queue_status)
 
     # return simulated results
-    return [arr_local_load, arr_remot_load]
+    return [arr_local_load, arr_remot_load, arr_queue_status]
 
 # -----------------------------------------------------
-# Main function
+# Engines to simulate an iteration, same signature and results
 # -----------------------------------------------------
-if __name__ == "__main__":
-
-    # read input configuration
-    if len(sys.argv) < 2:
-        print('Usage: python estimate_upp... <context_input>')
-        exit(1)
-    filename = sys.argv[1]
-    ctx_configs = pd.read_json(filename)
+ENGINES = {
+    'tick': simulate,
+    'event': simulate_event_driven,
+    'soa': simulate_soa
+}
 
+# -----------------------------------------------------
+# Simulate a scenario
+# -----------------------------------------------------
+def run_scenario(scenario, simulate_engine, num_jobs):
+    """Simulate the iterations of a scenario and show their statistics."""
     print('-------------------------------------------')
     print('Simulation context: ')
     print('-------------------------------------------')
-    print(ctx_configs)
+    print(scenario)
 
     print('\n-------------------------------------------')
     print('Init the simulation: ')
     print('-------------------------------------------')
-    init_res = init_simulation(ctx_configs)
+    apply_scenario(scenario)
+    print('Balancing strategies: {}'.format(', '.join(SELECTED_STRATEGIES)))
+    init_res = init_simulation(scenario)
     local_task_queues = init_res[0]
     slowdown_processes = init_res[1]
     slowdown_scales = init_res[2]
 
-    num_iterations = int(ctx_configs.iloc[5,0])
-    clock_rate = ctx_configs.iloc[1,0]
-    balancing_cost = ctx_configs.iloc[0,0]
-    migration_cost = ctx_configs.iloc[3,0]
-    fluctuation_noise = ctx_configs.iloc[4,0]
+    num_iterations = scenario.num_iterations
+    clock_rate = scenario.clock_rate
+    balancing_cost = scenario.balancing_ops_cost
+    migration_cost = scenario.migration_delay_cost
+    fluctuation_noise = scenario.noise
+
+    # simulate the iterations in a pool of processes, the results come in order
+    pool = None
+    if num_jobs > 1:
+        pool = start_pool(num_jobs, {
+            'engine': simulate_engine,
+            'local_queues': local_task_queues,
+            'slowdown_procs': slowdown_processes,
+            'slowdown_scales': slowdown_scales,
+            'clock_rate': clock_rate,
+            'cost_balancing': balancing_cost,
+            'cost_migration_delay': migration_cost,
+            'noise': fluctuation_noise
+        })
+        par_results = simulate_iterations_in_parallel(pool, num_iterations)
 
     # simulate the context
     for i in range(num_iterations):
         print('\n-------------------------------------------')
         print('ITERATION: {}'.format(i))
         print('-------------------------------------------')
-        simu_res = simulate(local_task_queues, slowdown_processes, slowdown_scales, i, clock_rate,
-                            balancing_cost, migration_cost, fluctuation_noise)
+        if pool is None:
+            simu_res = simulate_engine(local_task_queues, slowdown_processes, slowdown_scales, i, clock_rate,
+                                        balancing_cost, migration_cost, fluctuation_noise)
+        else:
+            simu_res, output = next(par_results)
+            print(output, end='')
 
         # show statistic info
         statistic_info(simu_res[0], simu_res[1], clock_rate)
-    
+
+        # remove the spilled queue status if any
+        simu_res[2].close()
+
+    if pool is not None:
+        pool.close()
+        pool.join()
+
+# -----------------------------------------------------
+# Main function
+# -----------------------------------------------------
+if __name__ == "__main__":
+
+    # read input configuration
+    parser = argparse.ArgumentParser(description='Simulate dynamic load balancing in task-parallel applications.')
+    parser.add_argument('context_input', help='the json file of the simulation context or scenarios')
+    parser.add_argument('--engine', choices=list(ENGINES.keys()), default='tick',
+                        help='tick: advance the clock by 1 ms, event: jump to the next event, '
+                             'soa: jump to the next event with the rank state in numpy arrays')
+    parser.add_argument('--jobs', type=int, default=1,
+                        help='number of processes to simulate the iterations in parallel')
+    parser.add_argument('--queue-status', choices=QUEUE_STATUS_POLICIES, default=QUEUE_STATUS_POLICY,
+                        help='change: record the queue changes, stride: sample every --queue-status-stride ticks, '
+                             'ring: numpy buffer spilled to disk')
+    parser.add_argument('--queue-status-stride', type=int, default=QUEUE_STATUS_STRIDE)
+    parser.add_argument('--profiling', choices=PROFILING_LEVELS, default=PROFILING_LEVEL,
+                        help='none: no task profiling, counters: number of executed tasks per rank, '
+                             'trace: also write the executed tasks to a .npy event log')
+    parser.add_argument('--log-level', choices=list(LOG_LEVELS.keys()), default='none',
+                        help='info: the migrations, debug: also the steal messages, '
+                             'trace: also the pending accepts at every tick')
+    parser.add_argument('--log-components', default=None,
+                        help='comma-separated components to log, of ' + ', '.join(LOG_COMPONENTS))
+    parser.add_argument('--log-format', choices=LOG_FORMATS, default='jsonl')
+    parser.add_argument('--log-file', default=None, help='the log file, ./simulation_log.<jsonl|bin> by default')
+    args = parser.parse_args()
+    set_queue_status_policy(args.queue_status, stride=args.queue_status_stride)
+    set_profiling_level(args.profiling)
+    set_logging(args.log_level, args.log_components, args.log_format, args.log_file)
+
+    # one or many scenarios, e.g., a scenario and its sweep axes (config.py)
+    scenarios = load_scenarios(args.context_input)
+    for scenario in scenarios:
+        run_scenario(scenario, ENGINES[args.engine], args.jobs)
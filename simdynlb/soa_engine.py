@@ -0,0 +1,233 @@
+"""A struct-of-arrays engine of the simulator for dynamic load balancing.
+
+The rank state is held in NumPy arrays instead of one Python list per
+attribute and rank:
+    - end_tick: the clock tick at which the being-executed task ends, the
+      first tick reaching its end time (NO_TASK_END if the rank is free)
+    - sta_time, end_time, exe_local: the start and end time of the
+      being-executed task, and whether it is a local one or a remote one
+    - local_qlen, remot_qlen: queue lengths (the queue heads to pop), kept
+      by the queues on change (QueueLengths), never counted per tick
+    - local_load, remot_load: the load counters
+
+As the event engine, the loop jumps to the next clock where something can
+happen: the first task end, the ranks freed at the previous clock, or a
+balancing trigger (is_active / next_event_times of the strategies). At such
+a clock, the "who finishes now / who pops next / update load" step runs as
+masks over all ranks, and the start, runtime and end of the popped tasks
+are computed as arrays. A clock without a task end and without a free rank
+given tasks only runs the balancing strategies. The popping ranks are only
+visited to take the task objects from their queues, as the balancing
+strategies work on them. The per-tick semantics of simulator.simulate()
+are kept.
+"""
+
+import math
+
+import numpy as np
+
+from task import *
+from balancer import *
+from migrator import *
+from profiler import *
+from recorder import *
+from strategies import *
+
+# -----------------------------------------------------
+# Constant Definition
+# -----------------------------------------------------
+NO_TASK_END = np.iinfo(np.int64).max
+
+# -----------------------------------------------------
+# Util Functions
+# -----------------------------------------------------
+def get_queue_lengths(queues):
+    return np.fromiter(map(len, queues), dtype=np.int64, count=len(queues))
+
+def get_next_balancing_time(strategies, clock):
+    """Get the next clock at which the strategies run, NO_TASK_END if none."""
+    if any(strategy.is_active(clock) for strategy in strategies):
+        return clock + 1
+    next_time = NO_TASK_END
+    for strategy in strategies:
+        for time in strategy.next_event_times():
+            # events happen at the first clock tick reaching their time
+            time = math.ceil(time)
+            if clock < time < next_time:
+                next_time = time
+    return next_time
+
+# -----------------------------------------------------
+# Queue lengths
+# -----------------------------------------------------
+"""Class QueueLengths keeps the queue lengths of the ranks in arrays
+    - local_qlen, remot_qlen: the lengths of the local and remote queues,
+      updated by the queues on change (length observers)
+    - changed_lengths: {rank: queue length} of the ranks changed since the
+      last record of the queue status
+    - woken: a free rank got tasks since the last step, it pops at this
+      clock
+"""
+class QueueLengths:
+    def __init__(self, local_queues, remote_queues, end_tick):
+        self.local_qlen = get_queue_lengths(local_queues)
+        self.remot_qlen = get_queue_lengths(remote_queues)
+        self.end_tick = end_tick
+        self.changed_lengths = {}
+        self.woken = False
+        for i in range(len(local_queues)):
+            local_queues[i].observe_length(i, self.update_local_length)
+            remote_queues[i].observe_length(i, self.update_remote_length)
+
+    def update_local_length(self, rank, length):
+        if length > self.local_qlen[rank] and self.end_tick[rank] == NO_TASK_END:
+            self.woken = True
+        self.local_qlen[rank] = length
+        self.changed_lengths[rank] = length + int(self.remot_qlen[rank])
+
+    def update_remote_length(self, rank, length):
+        if length > self.remot_qlen[rank] and self.end_tick[rank] == NO_TASK_END:
+            self.woken = True
+        self.remot_qlen[rank] = length
+        self.changed_lengths[rank] = length + int(self.local_qlen[rank])
+
+    def pop_changed_lengths(self):
+        changed_lengths = self.changed_lengths
+        self.changed_lengths = {}
+        return changed_lengths
+
+    def has_tasks(self):
+        return self.local_qlen.any() or self.remot_qlen.any()
+
+# -----------------------------------------------------
+# Simulation engine
+# -----------------------------------------------------
+def simulate_soa(local_queues, slowdown_procs, slowdown_scales, iter, clock_rate,
+                    cost_balancing, cost_migration_delay, noise):
+
+    # restore the initial local_queues, they are kept for next iterations
+    copy_local_queues = restore_local_queues(local_queues)
+    num_procs = len(copy_local_queues)
+
+    # the rank state
+    clock = 0
+    end_tick = np.full(num_procs, NO_TASK_END, dtype=np.int64)
+    sta_time = np.zeros(num_procs)
+    end_time = np.zeros(num_procs)
+    exe_local = np.zeros(num_procs, dtype=bool)
+    local_load = np.zeros(num_procs)
+    remot_load = np.zeros(num_procs)
+
+    # queues and tasks, still used by the balancing strategies
+    remote_queues = [TaskQueue() for i in range(num_procs)]
+    arr_being_exe_tasks = [None] * num_procs
+    lengths = QueueLengths(copy_local_queues, remote_queues, end_tick)
+    local_qlen = lengths.local_qlen
+    remot_qlen = lengths.remot_qlen
+
+    # the balancing strategies selected by the config, with their hooks
+    ctx = BalancingContext(copy_local_queues, remote_queues, arr_being_exe_tasks, slowdown_procs, slowdown_scales,
+                            iter, clock_rate, cost_balancing, cost_migration_delay, noise)
+    strategies = create_balancing_strategies(ctx)
+    tick_hooks = get_strategy_hooks(strategies, 'on_tick')
+
+    # the fluctuation of the rank speed, if any
+    performance = ctx.performance
+
+    # arrays for profiling tasks executed, the recorder keeps the queue
+    # status over the skipped ticks, only the changed ranks are given
+    task_profiler = create_task_profiler(num_procs, cost_balancing, cost_migration_delay)
+    arr_queue_status = create_queue_status_recorder(local_qlen.tolist())
+
+    # --------------------------------------------------------
+    # Main loop
+    # --------------------------------------------------------
+    num_running = 0
+    next_end = NO_TASK_END
+    next_clock = 1
+    pops_due = True # every rank pops or goes idle at the first clock
+    while next_clock != NO_TASK_END:
+        clock = next_clock
+
+        # --------------------------------------------------------
+        # balancing strategies
+        # --------------------------------------------------------
+        for on_tick in tick_hooks:
+            on_tick(clock)
+
+        # --------------------------------------------------------
+        # executing tasks and updating load
+        # --------------------------------------------------------
+        # who pops next, the ranks free before this clock with tasks
+        popper_ranks = None
+        if pops_due or lengths.woken:
+            popper_ranks = np.flatnonzero((end_tick == NO_TASK_END) & ((local_qlen + remot_qlen) != 0))
+            lengths.woken = False
+
+        # who finishes now, the load of all executed ticks of the tasks
+        finished_ranks = None
+        if next_end <= clock:
+            finished_ranks = np.flatnonzero(end_tick <= clock)
+            loads = end_time[finished_ranks] - sta_time[finished_ranks]
+            local = exe_local[finished_ranks]
+            local_load[finished_ranks[local]] += loads[local]
+            remot_load[finished_ranks[~local]] += loads[~local]
+            end_tick[finished_ranks] = NO_TASK_END
+            for i in finished_ranks.tolist():
+                arr_being_exe_tasks[i] = None
+            num_running -= len(finished_ranks)
+
+        # prior 1 is the remote queue and prior 2 the local queue
+        if popper_ranks is not None and len(popper_ranks) != 0:
+            from_remote = remot_qlen[popper_ranks] != 0
+            tasks = [remote_queues[i].popleft() if remote else copy_local_queues[i].popleft()
+                        for i, remote in zip(popper_ranks.tolist(), from_remote.tolist())]
+
+            # the start, runtime and end of the popped tasks at once
+            stime = clock - (~from_remote).astype(np.int64)
+            exe_dur = np.fromiter((task.get_dur() for task in tasks), dtype=np.float64, count=len(tasks))
+            if performance is not None:
+                exe_dur = performance.get_exe_durs(popper_ranks, stime, exe_dur)
+            etime = exe_dur + stime
+            sta_time[popper_ranks] = stime
+            end_time[popper_ranks] = etime
+            # the task ends at the first clock tick reaching its end time
+            end_tick[popper_ranks] = np.ceil(etime)
+            exe_local[popper_ranks] = np.fromiter((task.local_node for task in tasks), dtype=np.int64,
+                                                    count=len(tasks)) == popper_ranks
+            num_running += len(popper_ranks)
+
+            for i, task, s_i, e_i in zip(popper_ranks.tolist(), tasks, stime.tolist(), etime.tolist()):
+                task.set_time(s_i, e_i)
+                arr_being_exe_tasks[i] = task
+                task_profiler.add(i, task)
+
+        # record the queue status of the changed ranks at this clock
+        arr_queue_status.record_changes(clock, lengths.pop_changed_lengths())
+
+        # --------------------------------------------------------
+        # jump to the next clock with an event
+        # --------------------------------------------------------
+        if finished_ranks is not None or popper_ranks is not None:
+            if num_running == 0 and not lengths.has_tasks():
+                break
+            next_end = NO_TASK_END
+            if num_running != 0:
+                next_end = max(int(end_tick.min()), clock + 1)
+
+        # the freed ranks with tasks pop them at the next clock
+        pops_due = finished_ranks is not None and \
+                    ((local_qlen[finished_ranks] + remot_qlen[finished_ranks]) != 0).any()
+        if pops_due:
+            next_clock = clock + 1
+        else:
+            next_clock = min(next_end, get_next_balancing_time(strategies, clock))
+
+    # show/write the profiled tasks, a trace is plotted later by profiler.py
+    task_profiler.finish()
+
+    # write the queue status trace at the trace level
+    task_profiler.profile_queues(arr_queue_status)
+
+    # return simulated results
+    return [list(local_load), list(remot_load), arr_queue_status]
@@ -0,0 +1,233 @@
+"""Balancing strategies of the simulator, selected by name from the config.
+
+A strategy holds its own state (messages, offloader-victim pairs, tasks on
+the network, ...) and is driven by the engines through hooks:
+    - on_tick(clock): the balancing step, at the beginning of every clock
+      tick (tick engines) or of every visited clock (event engine)
+    - is_active(clock) / next_event_times(): for the event engine, whether
+      on_tick must run at the next clock, or else at which future clocks
+
+The engines only call the hooks a strategy overrides, so a strategy that is
+not selected or has nothing to do at a hook costs nothing per tick.
+New strategies are added to BALANCING_STRATEGIES. Without a balancing_strategy
+in the config nothing is balanced, as in the simulator before the registry.
+"""
+
+from collections import deque
+
+from task import *
+from balancer import *
+from migrator import *
+from network import *
+from rng import *
+from performance import *
+
+# -----------------------------------------------------
+# Constant Definition
+# -----------------------------------------------------
+DEFAULT_BALANCING_STRATEGY = 'none'
+SELECTED_STRATEGIES = [DEFAULT_BALANCING_STRATEGY]
+
+# -----------------------------------------------------
+# Util Functions
+# -----------------------------------------------------
+def parse_balancing_strategies(names):
+    """The strategy names of a name or comma-separated names, checked by the
+    registry."""
+    if isinstance(names, str):
+        names = [n.strip() for n in names.split(',') if n.strip() != '']
+    for name in names:
+        if name not in BALANCING_STRATEGIES:
+            raise ValueError('unknown balancing strategy {}, should be one of {}'.format(
+                                name, list(BALANCING_STRATEGIES.keys())))
+    return names
+
+def set_balancing_strategies(names):
+    """Select the strategies by a name or comma-separated names, e.g., from
+    the balancing_strategy value in the config."""
+    SELECTED_STRATEGIES[:] = parse_balancing_strategies(names)
+
+def create_balancing_strategies(ctx):
+    return [BALANCING_STRATEGIES[name](ctx) for name in SELECTED_STRATEGIES]
+
+def get_strategy_hooks(strategies, hook):
+    # the hooks overridden by the strategies, the others are not called at all
+    return [getattr(s, hook) for s in strategies
+                if getattr(type(s), hook) is not getattr(BalancingStrategy, hook)]
+
+"""Class BalancingContext holds the simulation state shared with strategies
+    - local_queues, remote_queues: the task queues of the ranks
+    - arr_being_exe_tasks: the task being executed per rank (None if free)
+    - the costs and slowdown setting of the iteration
+    - topology: the placement of the ranks on nodes and switches, None if
+      all ranks are apart at the same cost
+    - network: the messages in flight between ranks, delivered by
+      network.deliver(clock) from the strategies
+    - performance: the trajectories of the rank speed of the iteration,
+      None if the speed is constant
+The random streams of the iteration are started with the context.
+"""
+class BalancingContext:
+    def __init__(self, local_queues, remote_queues, arr_being_exe_tasks, slowdown_procs, slowdown_scales,
+                    iter, clock_rate, cost_balancing, cost_migration_delay, noise):
+        self.local_queues = local_queues
+        self.remote_queues = remote_queues
+        self.arr_being_exe_tasks = arr_being_exe_tasks
+        self.num_procs = len(local_queues)
+        self.slowdown_procs = slowdown_procs
+        self.slowdown_scales = slowdown_scales
+        self.iter = iter
+        self.clock_rate = clock_rate
+        self.cost_balancing = cost_balancing
+        self.cost_migration_delay = cost_migration_delay
+        self.noise = noise
+        self.topology = create_topology(self.num_procs)
+        self.network = create_network(self.num_procs, self.topology)
+        start_random_streams(iter)
+        self.performance = create_performance_trajectories(self.num_procs, iter, clock_rate)
+
+# -----------------------------------------------------
+# Strategies
+# -----------------------------------------------------
+class BalancingStrategy:
+    def __init__(self, ctx):
+        self.ctx = ctx
+
+    def on_tick(self, clock):
+        pass
+
+    def is_active(self, clock):
+        return False
+
+    def next_event_times(self):
+        return []
+
+
+class NoBalancing(BalancingStrategy):
+    pass
+
+
+"""Work stealing: idle ranks send steal requests, busy ranks accept them,
+then the idle rank steals a task marked at the rear of the busy queue.
+The idle/busy ranks and the pending requests are kept in a steal index
+updated by the local queues on change, the protocol only visits the ranks
+in it. The messages go over the network of the context.
+"""
+class WorkStealing(BalancingStrategy):
+    def __init__(self, ctx):
+        super().__init__(ctx)
+        self.arr_steal_request_msg = [[] for i in range(ctx.num_procs)]
+        self.arr_steal_accept_msg = [[] for i in range(ctx.num_procs)]
+        self.steal_index = StealIndex([len(q) for q in ctx.local_queues], ctx.network, self.get_topology())
+        for i in range(ctx.num_procs):
+            ctx.local_queues[i].observe_length(i, self.steal_index.update)
+
+    def on_tick(self, clock):
+        ctx = self.ctx
+        ctx.network.deliver(clock)
+        self.steal_index.sync()
+
+        exchange_steal_request(clock, self.steal_index, self.arr_steal_request_msg, self.arr_steal_accept_msg)
+
+        recv_steal_accept(clock, self.steal_index, self.arr_steal_request_msg, self.arr_steal_accept_msg)
+
+        steal_tasks(clock, ctx.local_queues, self.steal_index, self.arr_steal_request_msg, self.arr_steal_accept_msg,
+                    ctx.iter, ctx.cost_migration_delay, ctx.slowdown_procs, ctx.slowdown_scales,
+                    ctx.clock_rate, ctx.noise)
+
+    def get_topology(self):
+        # random pairs of idle and busy ranks, whatever their placement
+        return None
+
+    def is_active(self, clock):
+        # the protocol polls while there are idle ranks and busy ranks or
+        # pending accept messages
+        steal_index = self.steal_index
+        steal_index.sync()
+        if len(steal_index.idle_ranks) == 0:
+            return False
+        return len(steal_index.busy_ranks) != 0 or len(steal_index.accepting_ranks) != 0
+
+    def next_event_times(self):
+        times = self.ctx.network.arrival_times()
+        for i in self.steal_index.marked_ranks:
+            for task in self.ctx.local_queues[i].marked_tasks():
+                times.append(task.arr_time)
+        return times
+
+
+"""Hierarchical work stealing: as work stealing, the idle ranks are paired
+with busy ranks on their node first, then on their switch, then anywhere,
+by the topology of the context (topology.py). Without a topology, the pairs
+are random as in work stealing.
+"""
+class HierarchicalWorkStealing(WorkStealing):
+    def get_topology(self):
+        return self.ctx.topology
+
+
+"""Reactive task offloading: when the queues are imbalanced, offloaders
+select tasks for their victims and send them over the network, one by one
+or in batches (MIGRATION_BATCH_SIZE). The queue lengths are kept in a load
+index updated by the local queues on change, the offloaders, the ranks with
+marked tasks and the victims with tasks on the way in an offload index.
+"""
+class ReactOffloading(BalancingStrategy):
+    def __init__(self, ctx):
+        super().__init__(ctx)
+        self.arr_victim_offloader = [deque() for i in range(ctx.num_procs)]
+        self.arr_num_tasks_before_execution = [len(q) for q in ctx.local_queues]
+        self.arr_tmp_buffer_migrated_tasks = [TaskQueue() for i in range(ctx.num_procs)]
+        self.load_index = LoadIndex(self.arr_num_tasks_before_execution)
+        self.offload_index = OffloadIndex()
+        for i in range(ctx.num_procs):
+            ctx.local_queues[i].observe_length(i, self.load_index.update)
+            self.arr_tmp_buffer_migrated_tasks[i].observe_length(i, self.offload_index.update)
+
+    def on_tick(self, clock):
+        ctx = self.ctx
+        Rimb = check_imbalance_status(clock, self.load_index)
+
+        react_task_offloading(clock, ctx.num_procs, Rimb, self.load_index,
+                                self.arr_num_tasks_before_execution, self.arr_victim_offloader, self.offload_index)
+
+        select_tasks_to_offload(clock, ctx.local_queues, self.arr_victim_offloader, self.offload_index,
+                                ctx.iter, ctx.cost_balancing, ctx.cost_migration_delay, ctx.noise, ctx.clock_rate)
+
+        offload_tasks(clock, ctx.local_queues, ctx.remote_queues, self.arr_tmp_buffer_migrated_tasks, self.offload_index,
+                        ctx.slowdown_procs, ctx.slowdown_scales, ctx.iter, ctx.clock_rate, ctx.noise, ctx.network)
+
+        # the batches of migrated tasks arrived at this clock
+        ctx.network.deliver(clock)
+
+    def is_active(self, clock):
+        # new pairs come while the queues are imbalanced, the selected pairs
+        # and the tasks on the network are processed at the next ticks
+        offload_index = self.offload_index
+        if len(offload_index.offloader_ranks) != 0 or len(offload_index.buffered_ranks) != 0:
+            return True
+        if self.load_index.get_max_length() <= MIN_TASKS_IN_QUEUE_FOR_OFFLOAD:
+            return False
+        return self.load_index.get_rimb()[1] >= MIN_REL_LOAD_IMBALANCE
+
+    def next_event_times(self):
+        times = self.ctx.network.arrival_times()
+        for i in self.offload_index.buffered_ranks:
+            for task in self.arr_tmp_buffer_migrated_tasks[i]:
+                times.append(task.arr_time)
+        for i in self.offload_index.marked_ranks:
+            for task in self.ctx.local_queues[i].marked_tasks():
+                times.append(task.mig_time)
+                times.append(task.arr_time)
+        return times
+
+
+# -----------------------------------------------------
+# Registry of the strategies
+# -----------------------------------------------------
+BALANCING_STRATEGIES = {
+    'none': NoBalancing,
+    'work_stealing': WorkStealing,
+    'hierarchical_work_stealing': HierarchicalWorkStealing,
+    'react_offloading': ReactOffloading
+}
@@ -0,0 +1,244 @@
+"""Parameter sweeps of the simulator over grids of context values.
+
+A sweep takes a simulation context and a grid over some of its values,
+e.g., balancing_ops_cost x migration_delay_cost x noise x slowdown_scale
+x num_process, then simulates every point of the grid. The grid is made by
+config.make_sweep_points as the scenarios of a file with sweep axes: any
+scenario value is an axis, the points are the product of the axes in order.
+    - the points run in parallel on a pool of processes
+    - each point is saved to <out_folder>/points/<point>.npz with the queue
+      status of its iterations in run-length form (recorder.to_changes()),
+      the points whose results already exist on disk are skipped; the name
+      of a point holds a hash of its whole context, so a point of another
+      context is not taken for it
+    - the loads of all points are consolidated into one columnar result
+      set <out_folder>/sweep_results.npz, one row per (point, iteration,
+      rank), the queue status is read from the point files on demand
+The axes can also be given by the "sweep" values of the context file (see
+config.py), the --grid arguments replace the axes of the file. SWEEP_AXES
+are columns of every result set, the other swept axes are added to them.
+
+  Typical usage example:
+  $ python sweep.py <context_input.json> --grid balancing_ops_cost=1,2,5,10,20
+                    --grid migration_delay_cost=10 --out ./sweep_output --jobs 4
+"""
+
+from simulator import *
+
+import io
+import json
+import hashlib
+import contextlib
+
+# -----------------------------------------------------
+# Constant Definition
+# -----------------------------------------------------
+SWEEP_AXES = ['balancing_ops_cost', 'migration_delay_cost', 'noise', 'slowdown_scale', 'num_process']
+AXIS_LABELS = {
+    'balancing_ops_cost': 'ob',
+    'migration_delay_cost': 'od',
+    'noise': 'n',
+    'slowdown_scale': 's',
+    'num_process': 'p'
+}
+RESULT_FILE = 'sweep_results.npz'
+
+# -----------------------------------------------------
+# Util Functions
+# -----------------------------------------------------
+def parse_value(token):
+    # a number, or a string value, e.g., of balancing_strategy
+    try:
+        value = float(token)
+    except ValueError:
+        return token
+    if value.is_integer() and '.' not in token:
+        return int(value)
+    return value
+
+def parse_grid(grid_args):
+    """Parse ['axis=v1,v2,...', ...] into {axis: [v1, v2, ...]}."""
+    grid = {}
+    for arg in grid_args:
+        axis, values = arg.split('=')
+        grid[axis] = [parse_value(v) for v in values.split(',')]
+    return grid
+
+def get_result_axes(points):
+    # the columns of SWEEP_AXES, then the other swept axes in order
+    axes = list(SWEEP_AXES)
+    for point in points:
+        axes += [a for a in point if a not in axes]
+    return axes
+
+def get_point_info(context_info, point):
+    # the values of the point replace the ones of the context
+    point_info = dict(context_info)
+    point_info.update(point)
+    return point_info
+
+def get_point_name(context_info, point):
+    # the name holds all sweep axes to be readable, and a hash of the whole
+    # context, so points of different contexts do not clash
+    tokens = []
+    for axis in SWEEP_AXES:
+        value = point.get(axis, context_info[axis])
+        tokens.append(AXIS_LABELS[axis] + str(value))
+    other_axes = {a: v for a, v in point.items() if a not in SWEEP_AXES}
+    if len(other_axes) != 0:
+        tokens.append(get_sweep_point_name(other_axes))
+    point_info = json.dumps(get_point_info(context_info, point), sort_keys=True, default=str)
+    tokens.append(hashlib.sha1(point_info.encode()).hexdigest()[:12])
+    return '_'.join(tokens)
+
+def get_point_file(out_folder, name):
+    return os.path.join(out_folder, 'points', name + '.npz')
+
+# -----------------------------------------------------
+# Simulate a point of the grid
+# -----------------------------------------------------
+def simulate_point(args):
+    context_info, point, engine, out_folder = args
+    point_info = get_point_info(context_info, point)
+    scenario = Scenario(point_info)
+    # the models of the point, e.g., a swept balancing_strategy
+    apply_scenario(scenario)
+
+    init_res = init_simulation(scenario)
+    num_iterations = scenario.num_iterations
+    arr_local_load = []
+    arr_remot_load = []
+    arr_queue_status = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(num_iterations):
+            simu_res = ENGINES[engine](init_res[0], init_res[1], init_res[2], i, point_info['clock_rate'],
+                                        point_info['balancing_ops_cost'], point_info['migration_delay_cost'],
+                                        point_info['noise'])
+            arr_local_load.append(simu_res[0])
+            arr_remot_load.append(simu_res[1])
+            # the recorder output, not the ranks x ticks array
+            key = 'queue_status_i' + str(i)
+            ticks, values, offsets = simu_res[2].to_changes()
+            arr_queue_status[key + '_ticks'] = ticks
+            arr_queue_status[key + '_values'] = values.astype(np.int32)
+            arr_queue_status[key + '_offsets'] = offsets
+            arr_queue_status[key + '_num_ticks'] = np.int64(simu_res[2].num_ticks)
+            simu_res[2].close()
+
+    # write to a temporary file first, a killed sweep leaves no broken point
+    name = get_point_name(context_info, point)
+    filename = get_point_file(out_folder, name)
+    tmp_filename = filename + '.tmp.npz'
+    np.savez(tmp_filename, local_load=np.array(arr_local_load, dtype=np.float64),
+                remote_load=np.array(arr_remot_load, dtype=np.float64), **arr_queue_status)
+    os.replace(tmp_filename, filename)
+    flush_log()
+    return name
+
+def run_sweep(context_info, grid, engine, out_folder, num_jobs):
+    """Simulate the missing points of the grid, then consolidate all points."""
+    os.makedirs(os.path.join(out_folder, 'points'), exist_ok=True)
+    points = make_sweep_points(grid)
+    todo = []
+    for point in points:
+        name = get_point_name(context_info, point)
+        if os.path.exists(get_point_file(out_folder, name)):
+            print('\tSkip {} (already exists)'.format(name))
+        else:
+            todo.append((context_info, point, engine, out_folder))
+
+    print('\tSimulate {} of {} points with {} processes'.format(len(todo), len(points), num_jobs))
+    if num_jobs > 1 and len(todo) > 1:
+        with get_mp_context().Pool(num_jobs) as pool:
+            for name in pool.imap_unordered(simulate_point, todo):
+                print('\tDone {}'.format(name))
+    else:
+        for args in todo:
+            print('\tDone {}'.format(simulate_point(args)))
+
+    return collect_results(context_info, points, out_folder)
+
+# -----------------------------------------------------
+# Consolidated result set
+# -----------------------------------------------------
+def collect_results(context_info, points, out_folder):
+    columns = {'point': [], 'iter': [], 'rank': [], 'local_load': [], 'remote_load': []}
+    result_axes = get_result_axes(points)
+    for axis in result_axes:
+        columns[axis] = []
+
+    # only the loads are read, the queue status stays in the point files
+    for point in points:
+        name = get_point_name(context_info, point)
+        with np.load(get_point_file(out_folder, name)) as point_res:
+            local_load = point_res['local_load']
+            remote_load = point_res['remote_load']
+            num_iterations, num_procs = local_load.shape
+            for i in range(num_iterations):
+                columns['point'] += [name] * num_procs
+                columns['iter'] += [i] * num_procs
+                columns['rank'] += list(range(num_procs))
+                columns['local_load'] += list(local_load[i])
+                columns['remote_load'] += list(remote_load[i])
+                for axis in result_axes:
+                    columns[axis] += [point.get(axis, context_info[axis])] * num_procs
+
+    result = {}
+    for key, values in columns.items():
+        result[key] = np.array(values)
+    result['total_load'] = result['local_load'] + result['remote_load']
+    filename = os.path.join(out_folder, RESULT_FILE)
+    np.savez(filename, **result)
+    print('\tWrite the sweep results to: {}'.format(filename))
+    return filename
+
+def read_sweep_results(filename):
+    """Read the columns of a result set, e.g., res['total_load'][res['point'] == p]."""
+    with np.load(filename) as res:
+        columns = {}
+        for key in res.files:
+            columns[key] = res[key]
+    return columns
+
+def read_sweep_queue_status(filename, point, iter=0):
+    """Read the queue status (ranks x ticks) of a point in a result set,
+    from the point file next to it."""
+    point_file = get_point_file(os.path.dirname(filename), point)
+    key = 'queue_status_i' + str(iter)
+    with np.load(point_file) as res:
+        return expand_queue_status_changes(res[key + '_ticks'], res[key + '_values'],
+                                            res[key + '_offsets'], int(res[key + '_num_ticks']))
+
+# -----------------------------------------------------
+# Main function
+# -----------------------------------------------------
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Sweep the simulator over grids of context values.')
+    parser.add_argument('context_input', help='the json file of the simulation context, with sweep axes or not')
+    parser.add_argument('--grid', action='append', default=[],
+                        help='axis=v1,v2,... with axis a value of the context, e.g., ' + ', '.join(SWEEP_AXES))
+    parser.add_argument('--out', default='./sweep_output', help='the folder of the results')
+    parser.add_argument('--engine', choices=list(ENGINES.keys()), default='event')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(),
+                        help='number of processes to simulate the points in parallel')
+    parser.add_argument('--queue-status', choices=QUEUE_STATUS_POLICIES, default=QUEUE_STATUS_POLICY)
+    parser.add_argument('--profiling', choices=PROFILING_LEVELS, default='none')
+    args = parser.parse_args()
+    set_queue_status_policy(args.queue_status)
+    set_profiling_level(args.profiling)
+
+    # the sweep axes of the file, then the ones of the arguments
+    config = read_config_file(args.context_input)
+    scenario = Scenario(config['context_info'])
+    context_info = scenario.to_dict()
+    grid = dict(config.get('sweep', {}))
+    grid.update(parse_grid(args.grid))
+    apply_scenario(scenario)
+
+    print('-------------------------------------------')
+    print('Sweep: ')
+    print('-------------------------------------------')
+    for axis, values in grid.items():
+        print('   + {}: {}'.format(axis, values))
+    run_sweep(context_info, grid, args.engine, args.out, args.jobs)
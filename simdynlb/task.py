@@ -1,27 +1,20 @@
+from collections import deque
+import numpy as np
+import copy
+
+# -----------------------------------------------------
+# Constant Definition
+# -----------------------------------------------------
+TASK_ID_RANK_SHIFT = 32 # tid = (rank << 32) + the index of the task on its rank
+
 """
-Class represent Task with its code entry, data, and childs (if yes).
-    - tid: unique id of each task
-    - dur: duration or wallclock execution time of a task
-    - data: data size or arguments of a task
-    - sta_time: to be executed
-    - end_time: to be termintated
-    - mig_time: to be migrated
-    - local_node: the original node
-    - remot_node: the remote node
+The functions of a task, shared by Task and TaskView. It has no attributes
+of its own (empty __slots__), so the tasks and the views on a TaskTable
+are allocated without a __dict__.
 """
-class Task:
-    def __init__(self, tid, dur, data, node):
-        self.tid = tid
-        self.dur = dur
-        self.data = data
-        # other info that can be configured while queueing
-        self.sta_time = 0.0
-        self.end_time = 0.0
-        self.mig_time = 0.0
-        self.arr_time = 0.0
-        self.local_node = node
-        self.remot_node = -1
-            
+class TaskBase:
+    __slots__ = ()
+
     def set_time(self, s_time, e_time):
         self.sta_time = s_time
         self.end_time = e_time
@@ -44,4 +37,459 @@ class Task:
     def print_task_info(self):
         print('Task {}: dur({}), data({}), start_end_time({}-{})'.format(self.tid,
                 self.dur, self.data, self.sta_time, self.end_time))
-        
\ No newline at end of file
+
+
+"""
+Class represent Task with its code entry, data, and childs (if yes).
+    - tid: unique id of each task
+    - dur: duration or wallclock execution time of a task
+    - data: data size or arguments of a task
+    - sta_time: to be executed
+    - end_time: to be termintated
+    - mig_time: to be migrated
+    - local_node: the original node
+    - remot_node: the remote node
+"""
+class Task(TaskBase):
+    __slots__ = ('tid', 'dur', 'data', 'sta_time', 'end_time', 'mig_time', 'arr_time', 'local_node', 'remot_node')
+
+    def __init__(self, tid, dur, data, node):
+        self.tid = tid
+        self.dur = dur
+        self.data = data
+        # other info that can be configured while queueing
+        self.sta_time = 0.0
+        self.end_time = 0.0
+        self.mig_time = 0.0
+        self.arr_time = 0.0
+        self.local_node = node
+        self.remot_node = -1
+
+
+"""
+Class represent the columns of many tasks in a NumPy structured array,
+one row per task with the same attributes as Task.
+    - the tasks are accessed by a TaskView, e.g., table[idx].tid
+    - reset() brings the mutable fields (times, remote node, duration)
+      back to the state saved by save_initial_state()
+"""
+TASK_DTYPE = np.dtype([
+    ('tid', np.int64),
+    ('dur', np.float64),
+    ('data', np.float32),
+    ('sta_time', np.float64),
+    ('end_time', np.float64),
+    ('mig_time', np.float64),
+    ('arr_time', np.float64),
+    ('local_node', np.int32),
+    ('remot_node', np.int32)
+])
+
+class TaskTable:
+    def __init__(self, num_tasks):
+        self.rows = np.zeros(num_tasks, dtype=TASK_DTYPE)
+        self.rows['remot_node'] = -1
+        self.initial_dur = self.rows['dur'].copy()
+        self.bind_columns()
+
+    def bind_columns(self):
+        # one view per column, e.g., self.dur[idx]
+        for name in TASK_DTYPE.names:
+            setattr(self, name, self.rows[name])
+
+    def __getstate__(self):
+        return {'rows': self.rows, 'initial_dur': self.initial_dur}
+
+    def __setstate__(self, state):
+        self.rows = state['rows']
+        self.initial_dur = state['initial_dur']
+        self.bind_columns()
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, idx):
+        return TaskView(self, idx)
+
+    def set_tasks(self, start, tids, durs, data, nodes):
+        end = start + len(tids)
+        self.tid[start:end] = tids
+        self.dur[start:end] = durs
+        self.data[start:end] = data
+        self.local_node[start:end] = nodes
+
+    def save_initial_state(self):
+        self.initial_dur = self.dur.copy()
+
+    def reset(self):
+        self.dur[:] = self.initial_dur
+        self.sta_time[:] = 0.0
+        self.end_time[:] = 0.0
+        self.mig_time[:] = 0.0
+        self.arr_time[:] = 0.0
+        self.remot_node[:] = -1
+
+"""
+Class represent a lightweight view on a row of a TaskTable, it has the
+same attributes and functions as Task.
+"""
+class TaskView(TaskBase):
+    __slots__ = ('table', 'idx')
+
+    def __init__(self, table, idx):
+        self.table = table
+        self.idx = idx
+
+    @property
+    def tid(self):
+        return self.table.tid[self.idx]
+
+    @property
+    def dur(self):
+        return self.table.dur[self.idx]
+
+    @dur.setter
+    def dur(self, value):
+        self.table.dur[self.idx] = value
+
+    @property
+    def data(self):
+        return self.table.data[self.idx]
+
+    @property
+    def sta_time(self):
+        return self.table.sta_time[self.idx]
+
+    @sta_time.setter
+    def sta_time(self, value):
+        self.table.sta_time[self.idx] = value
+
+    @property
+    def end_time(self):
+        return self.table.end_time[self.idx]
+
+    @end_time.setter
+    def end_time(self, value):
+        self.table.end_time[self.idx] = value
+
+    @property
+    def mig_time(self):
+        return self.table.mig_time[self.idx]
+
+    @mig_time.setter
+    def mig_time(self, value):
+        self.table.mig_time[self.idx] = value
+
+    @property
+    def arr_time(self):
+        return self.table.arr_time[self.idx]
+
+    @arr_time.setter
+    def arr_time(self, value):
+        self.table.arr_time[self.idx] = value
+
+    @property
+    def local_node(self):
+        return self.table.local_node[self.idx]
+
+    @property
+    def remot_node(self):
+        return self.table.remot_node[self.idx]
+
+    @remot_node.setter
+    def remot_node(self, value):
+        self.table.remot_node[self.idx] = value
+
+
+"""
+Cursor to the last task not yet marked for migration (remot_node == -1)
+in a queue of tasks, kept as the number of marked tasks at the rear of
+the queue, so pops at the front do not touch it.
+"""
+class MigrationCursor:
+    def get_cursor(self):
+        # index of the last unmarked task, -1 if there is no one
+        return len(self) - 1 - min(self.num_marked_rear, len(self))
+
+    def is_marked(self, idx):
+        return self[idx].remot_node != -1
+
+    def rewind_cursor(self):
+        # move the cursor back to the last unmarked task
+        cursor = self.get_cursor()
+        while cursor >= 0 and self.is_marked(cursor):
+            cursor -= 1
+        self.num_marked_rear = len(self) - 1 - cursor
+
+    def cursor_on_append(self, marked):
+        if marked:
+            self.num_marked_rear += 1
+        else:
+            self.num_marked_rear = 0
+
+    def cursor_on_appendleft(self, marked, num_marked_rear):
+        # num_marked_rear is the one before the append
+        if marked and num_marked_rear == len(self) - 1:
+            num_marked_rear += 1
+        self.num_marked_rear = num_marked_rear
+
+    def cursor_on_pop(self, marked):
+        if not marked and self.num_marked_rear == 0:
+            self.rewind_cursor()
+        elif self.num_marked_rear > 0:
+            self.num_marked_rear -= 1
+
+    def peek_migratable(self, min_index=0):
+        # the last unmarked task, if it is not in front of min_index
+        cursor = self.get_cursor()
+        if cursor < min_index:
+            return None
+        return self[cursor]
+
+    def mark_migratable(self, rnode, min_index=0):
+        # mark the last unmarked task for migrating to rnode
+        task = self.peek_migratable(min_index)
+        if task is not None:
+            task.set_remote_node(rnode)
+            self.rewind_cursor()
+        return task
+
+    def marked_tasks(self):
+        # the tasks marked for migration, from the rear of the queue
+        for idx in range(len(self)-1, self.get_cursor(), -1):
+            yield self[idx]
+
+
+"""
+Observers of the length of a queue of tasks, e.g., the load index of a
+balancing strategy, called as observer(rank, length) after each change.
+Queues without observers only check an empty tuple.
+"""
+class LengthObservers:
+    length_observers = ()
+
+    def observe_length(self, rank, observer):
+        if len(self.length_observers) == 0:
+            self.length_observers = []
+        self.observed_rank = rank
+        self.length_observers.append(observer)
+
+    def notify_length(self):
+        length = len(self)
+        for observer in self.length_observers:
+            observer(self.observed_rank, length)
+
+
+"""
+Class represent a queue of tasks on a rank (local, remote or in-flight tasks).
+    - pops and appends at both ends in O(1), len() in O(1) (from deque)
+    - a cursor to the last task not yet marked for migration (MigrationCursor)
+    - observers of the queue length (LengthObservers)
+"""
+class TaskQueue(MigrationCursor, LengthObservers, deque):
+    def __init__(self, tasks=()):
+        super().__init__(tasks)
+        self.num_marked_rear = 0
+        self.rewind_cursor()
+
+    def __reduce__(self):
+        return (self.__class__, (list(self),))
+
+    def append(self, task):
+        super().append(task)
+        self.cursor_on_append(task.remot_node != -1)
+        if self.length_observers:
+            self.notify_length()
+
+    def appendleft(self, task):
+        num_marked_rear = min(self.num_marked_rear, len(self))
+        super().appendleft(task)
+        self.cursor_on_appendleft(task.remot_node != -1, num_marked_rear)
+        if self.length_observers:
+            self.notify_length()
+
+    def popleft(self):
+        task = super().popleft()
+        if self.length_observers:
+            self.notify_length()
+        return task
+
+    def pop(self):
+        task = super().pop()
+        self.cursor_on_pop(task.remot_node != -1)
+        if self.length_observers:
+            self.notify_length()
+        return task
+
+    def extend(self, tasks):
+        for task in tasks:
+            self.append(task)
+
+    def extendleft(self, tasks):
+        for task in tasks:
+            self.appendleft(task)
+
+    def __iadd__(self, tasks):
+        self.extend(tasks)
+        return self
+
+    # the other changes of the deque may move any task, the cursor is
+    # counted again from the rear and the observers are notified
+
+    def on_change(self):
+        self.num_marked_rear = 0
+        self.rewind_cursor()
+        if self.length_observers:
+            self.notify_length()
+
+    def insert(self, idx, task):
+        super().insert(idx, task)
+        self.on_change()
+
+    def remove(self, task):
+        super().remove(task)
+        self.on_change()
+
+    def clear(self):
+        super().clear()
+        self.on_change()
+
+    def rotate(self, n=1):
+        super().rotate(n)
+        self.on_change()
+
+    def __setitem__(self, idx, task):
+        super().__setitem__(idx, task)
+        self.on_change()
+
+    def __delitem__(self, idx):
+        super().__delitem__(idx)
+        self.on_change()
+
+    def __imul__(self, n):
+        super().__imul__(n)
+        self.on_change()
+        return self
+
+
+"""
+Class represent a queue of tasks in a TaskTable, it keeps only the row
+indices in a ring buffer (8 bytes per task) and gives TaskViews.
+    - same functions as TaskQueue
+"""
+class TableTaskQueue(MigrationCursor, LengthObservers):
+    def __init__(self, table, ids=()):
+        ids = np.asarray(ids, dtype=np.int64)
+        self.table = table
+        self.ids = np.empty(max(len(ids), 16), dtype=np.int64)
+        self.ids[:len(ids)] = ids
+        self.head = 0
+        self.size = len(ids)
+        self.num_marked_rear = 0
+        self.rewind_cursor()
+
+    def __len__(self):
+        return self.size
+
+    def get_id(self, idx):
+        if idx < 0:
+            idx += self.size
+        if idx < 0 or idx >= self.size:
+            raise IndexError('TableTaskQueue index out of range')
+        return int(self.ids[(self.head + idx) % len(self.ids)])
+
+    def __getitem__(self, idx):
+        return TaskView(self.table, self.get_id(idx))
+
+    def __iter__(self):
+        for idx in range(self.size):
+            yield self[idx]
+
+    def is_marked(self, idx):
+        return self.table.remot_node[self.get_id(idx)] != -1
+
+    def grow(self):
+        # double the ring buffer, the queue starts at 0 again
+        capacity = len(self.ids)
+        ids = np.empty(capacity * 2, dtype=np.int64)
+        ids[:capacity] = np.roll(self.ids, -self.head)
+        self.ids = ids
+        self.head = 0
+
+    def append(self, task):
+        assert(task.table is self.table)
+        if self.size == len(self.ids):
+            self.grow()
+        self.ids[(self.head + self.size) % len(self.ids)] = task.idx
+        self.size += 1
+        self.cursor_on_append(task.remot_node != -1)
+        if self.length_observers:
+            self.notify_length()
+
+    def appendleft(self, task):
+        assert(task.table is self.table)
+        if self.size == len(self.ids):
+            self.grow()
+        num_marked_rear = min(self.num_marked_rear, self.size)
+        self.head = (self.head - 1) % len(self.ids)
+        self.ids[self.head] = task.idx
+        self.size += 1
+        self.cursor_on_appendleft(task.remot_node != -1, num_marked_rear)
+        if self.length_observers:
+            self.notify_length()
+
+    def popleft(self):
+        task = self[0]
+        self.head = (self.head + 1) % len(self.ids)
+        self.size -= 1
+        if self.length_observers:
+            self.notify_length()
+        return task
+
+    def pop(self):
+        task = self[-1]
+        self.size -= 1
+        self.cursor_on_pop(task.remot_node != -1)
+        if self.length_observers:
+            self.notify_length()
+        return task
+
+
+"""
+Class represent the initial workload of a simulation: a TaskTable and the
+row indices of the local queue on each rank.
+    - restore() resets the mutable fields of the tasks in the table and
+      gives fresh local queues, so an iteration starts from the same state
+      without a deepcopy of all tasks
+"""
+class Workload:
+    def __init__(self, table, queue_ids):
+        self.table = table
+        self.queue_ids = queue_ids
+        table.save_initial_state()
+
+    def __len__(self):
+        return len(self.queue_ids)
+
+    def restore(self):
+        self.table.reset()
+        local_queues = []
+        for ids in self.queue_ids:
+            local_queues.append(TableTaskQueue(self.table, ids))
+        return local_queues
+
+# -----------------------------------------------------
+# Util Functions
+# -----------------------------------------------------
+def make_task_ids(rank, start, end):
+    """The 64-bit ids of the tasks start..end-1 of a rank."""
+    if end > (1 << TASK_ID_RANK_SHIFT):
+        raise ValueError('at most {} tasks per rank, got {}'.format(1 << TASK_ID_RANK_SHIFT, end))
+    return (rank << TASK_ID_RANK_SHIFT) + np.arange(start, end, dtype=np.int64)
+
+def restore_local_queues(local_queues):
+    # a workload is reset in place or generated again (workload.py), other
+    # queues of tasks are copied
+    if hasattr(local_queues, 'restore'):
+        return local_queues.restore()
+    return copy.deepcopy(local_queues)
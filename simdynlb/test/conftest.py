@@ -0,0 +1,55 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# the modules of the simulator are imported flat, as by simulator.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# the plot scripts of the experiments are not tests
+collect_ignore_glob = ['queue_length_decrease/*', 'test_simple_example/*']
+
+# a small context: 2 slowdown ranks of 8, tasks of a second at 100 ticks
+BASE_CONTEXT = {
+    'balancing_ops_cost': 2, 'clock_rate': 100, 'migration_delay_cost': 2, 'noise': 1,
+    'num_iterations': 1, 'num_process': 8, 'num_slowdown_rank': 2, 'num_tasks_per_rank': 20,
+    'slowdown_scale': 0.5
+}
+
+@pytest.fixture
+def run_engines():
+    """Simulate an iteration of the base context with the given values on
+    every engine, as {engine: [local_load, remote_load, queue_status array]}."""
+    from simulator import Scenario, ENGINES, apply_scenario, init_simulation, \
+                            set_profiling_level, get_queue_status_array
+
+    def run(engines=None, iter=0, **values):
+        context_info = dict(BASE_CONTEXT)
+        context_info.update(values)
+        scenario = Scenario(context_info)
+        apply_scenario(scenario)
+        set_profiling_level('none')
+        local_queues, slowdown_procs, slowdown_scales = init_simulation(scenario)[:3]
+        results = {}
+        for engine in (engines or ENGINES.keys()):
+            local_load, remote_load, recorder = ENGINES[engine](local_queues, slowdown_procs, slowdown_scales, iter,
+                                                    scenario.clock_rate, scenario.balancing_ops_cost,
+                                                    scenario.migration_delay_cost, scenario.noise)
+            results[engine] = [[float(x) for x in local_load], [float(x) for x in remote_load],
+                                get_queue_status_array(recorder)]
+            recorder.close()
+        return results
+    return run
+
+def assert_same_results(results):
+    """The engines give the same loads and queue status as the tick engine."""
+    ref_local, ref_remote, ref_queue_status = results['tick']
+    for engine, (local_load, remote_load, queue_status) in results.items():
+        assert local_load == ref_local, engine
+        assert remote_load == ref_remote, engine
+        assert np.array_equal(queue_status, ref_queue_status), engine
+
+@pytest.fixture
+def same_results():
+    return assert_same_results
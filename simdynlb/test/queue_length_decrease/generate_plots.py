@@ -12,6 +12,10 @@ import os
 import csv
 import re
 
+# the recorder of the simulator expands the queue changes of a sweep point
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from recorder import expand_queue_status_changes
+
 # ---------------------------------------------------------
 # Constants
 # ---------------------------------------------------------
@@ -24,15 +28,54 @@ def k_milliseconds(x, pos):
     return "{:d}k".format(int(x/1000))
 
 """Read the queue status results
+
+A .npy trace is loaded memory-mapped, the rows are the ranks. Old results
+in .csv have a row per rank as well.
 """
 def read_queue_status_results(file):
+    if file.endswith('.npy'):
+        return np.load(file, mmap_mode='r')
     df = pd.read_csv(file, header=None)
-    num_procs = df.shape[0]
-    queue_status_arr = []
-    for i in range(num_procs):
-        row_data = df.iloc[i].to_numpy()
-        queue_status_arr.append(row_data)
-    return queue_status_arr
+    return df.to_numpy()
+
+"""Read the queue status of a sweep point (sweep.py)
+
+The point file next to the result set holds the queue changes of each rank
+(run-length), they are expanded to a row per rank.
+"""
+def read_sweep_point_queue_status(file, point, iter=0):
+    key = 'queue_status_i' + str(iter)
+    with np.load(os.path.join(os.path.dirname(file), 'points', point + '.npz')) as res:
+        ticks, values, offsets = res[key + '_ticks'], res[key + '_values'], res[key + '_offsets']
+        num_ticks = int(res[key + '_num_ticks'])
+    return expand_queue_status_changes(ticks, values, offsets, num_ticks)
+
+"""Read the queue status results from a sweep result set (sweep.py)
+
+The points of the sweep with the other overhead fixed at token are taken,
+ordered by the compared overhead, the queue status is of the first iteration.
+"""
+def read_sweep_results(file, mode, token=None):
+    res = np.load(file)
+    if mode == "delay":
+        compare_axis, fixed_axis = 'migration_delay_cost', 'balancing_ops_cost'
+    elif mode == "balancing":
+        compare_axis, fixed_axis = 'balancing_ops_cost', 'migration_delay_cost'
+    else:
+        raise ValueError('unknown compare mode {}, should be delay or balancing'.format(mode))
+    if token is None:
+        token = res[fixed_axis][0]
+
+    # one row per (point, iter, rank), a point is selected by its first row
+    selected = (res[fixed_axis] == token) & (res['iter'] == 0) & (res['rank'] == 0)
+    points = res['point'][selected]
+    compared_values = res[compare_axis][selected]
+
+    dataset = []
+    for idx in np.argsort(compared_values, kind='stable'):
+        print("Reading: {}".format(points[idx]))
+        dataset.append(read_sweep_point_queue_status(file, str(points[idx])))
+    return [dataset, token]
 
 """Plot the chart
 """
@@ -179,14 +222,28 @@ if __name__ == "__main__":
     if len(sys.argv) < 3:
         print("Error: should enter the comparison mode!")
         print("Usage: python generate_plots.py <input_folder> <compare_mode>")
+        print("   or: python generate_plots.py <sweep_results.npz> <compare_mode> [fixed_overhead]")
         print("\t + compare_mode 0: \"delay\" (default)")
         print("\t + compare_mode 1: \"balancing\" overhead")
         exit(1)
     mode = sys.argv[2]
     input_folder = sys.argv[1]
+
+    # a consolidated sweep result set holds all cases in one file
+    if input_folder.endswith('.npz'):
+        fixed_token = None
+        if len(sys.argv) > 3:
+            fixed_token = float(sys.argv[3])
+            if fixed_token.is_integer():
+                fixed_token = int(fixed_token)
+        dataset, token = read_sweep_results(input_folder, mode, fixed_token)
+        plot_queue_status(dataset, mode, token)
+        exit(0)
+
     folder_tokens = input_folder.split('_')
 
-    input_files = os.listdir(input_folder)
+    # the traces, skipping their .json metadata
+    input_files = [f for f in os.listdir(input_folder) if f.endswith('.npy') or f.endswith('.csv')]
     dataset = []
     for i in range(len(input_files)):
         dataset.append([])
@@ -11,15 +11,15 @@ import csv
 import re
 
 """Read the queue status results
+
+A .npy trace is loaded memory-mapped, the rows are the ranks. Old results
+in .csv have a row per rank as well.
 """
 def read_queue_status_results(file):
+    if file.endswith('.npy'):
+        return np.load(file, mmap_mode='r')
     df = pd.read_csv(file, header=None)
-    num_procs = df.shape[0]
-    queue_status_arr = []
-    for i in range(num_procs):
-        row_data = df.iloc[i].to_numpy()
-        queue_status_arr.append(row_data)
-    return queue_status_arr
+    return df.to_numpy()
 
 """Plot the chart
 """
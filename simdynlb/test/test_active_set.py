@@ -0,0 +1,99 @@
+import pytest
+
+from simulator import *
+
+def make_active_set(queue_lengths):
+    local_queues = [TaskQueue([Task(r * 100 + i, 10.0, 1.0, r) for i in range(n)])
+                    for r, n in enumerate(queue_lengths)]
+    remote_queues = [TaskQueue() for n in queue_lengths]
+    arr_being_exe_tasks = [None] * len(queue_lengths)
+    active_set = ActiveSet(local_queues, remote_queues, arr_being_exe_tasks)
+    return active_set, local_queues, remote_queues, arr_being_exe_tasks
+
+def get_due_ranks(active_set, clock):
+    active_set.start_clock(clock)
+    ranks = []
+    rank = active_set.next_due_rank()
+    while rank != -1:
+        ranks.append(rank)
+        rank = active_set.next_due_rank()
+    return ranks
+
+def start_task(active_set, local_queues, arr_being_exe_tasks, rank, clock, dur=10.0):
+    task = local_queues[rank].popleft()
+    task.set_time(clock, clock + dur)
+    arr_being_exe_tasks[rank] = task
+    active_set.start_task(rank, task)
+    return task
+
+def test_every_rank_is_visited_at_the_first_clock():
+    active_set, local_queues, remote_queues, arr_being_exe_tasks = make_active_set([2, 0, 1])
+    assert active_set.num_remain_tasks == 3
+    assert get_due_ranks(active_set, 0) == [0, 1, 2]
+    assert get_due_ranks(active_set, 1) == []
+
+def test_running_rank_is_visited_at_the_end_of_its_task():
+    active_set, local_queues, remote_queues, arr_being_exe_tasks = make_active_set([2, 0])
+    get_due_ranks(active_set, 0)
+    # the end of a task is at the first clock reaching it
+    start_task(active_set, local_queues, arr_being_exe_tasks, 0, 0, dur=9.5)
+    assert active_set.num_remain_tasks == 1 and active_set.num_running_tasks == 1
+    for clock in range(1, 10):
+        assert get_due_ranks(active_set, clock) == []
+    assert get_due_ranks(active_set, 10) == [0]
+
+def test_task_end_before_the_clock_is_due():
+    # a task ended at a clock not visited is due at the next visited one
+    active_set, local_queues, remote_queues, arr_being_exe_tasks = make_active_set([1])
+    get_due_ranks(active_set, 0)
+    start_task(active_set, local_queues, arr_being_exe_tasks, 0, 0)
+    assert get_due_ranks(active_set, 25) == [0]
+    active_set.end_task(0)
+    arr_being_exe_tasks[0] = None
+    assert get_due_ranks(active_set, 26) == [0]
+    assert active_set.is_done()
+
+def test_free_rank_is_woken_up_by_a_new_task():
+    active_set, local_queues, remote_queues, arr_being_exe_tasks = make_active_set([3, 0, 0])
+    get_due_ranks(active_set, 0)
+    active_set.start_clock(1)
+    task = local_queues[0].pop()
+    # a rank after the visited one is visited at this clock
+    active_set.cur_rank = 0
+    remote_queues[2].append(task)
+    assert active_set.next_due_rank() == 2
+    # a rank before it at the next clock
+    remote_queues[0].append(remote_queues[2].pop())
+    assert active_set.next_due_rank() == -1
+    assert get_due_ranks(active_set, 2) == [0]
+
+def test_running_rank_is_not_woken_up():
+    active_set, local_queues, remote_queues, arr_being_exe_tasks = make_active_set([2, 0])
+    get_due_ranks(active_set, 0)
+    start_task(active_set, local_queues, arr_being_exe_tasks, 0, 0)
+    remote_queues[0].append(Task(7, 10.0, 1.0, 1))
+    assert get_due_ranks(active_set, 1) == []
+
+def test_changed_lengths_are_kept_until_recorded():
+    active_set, local_queues, remote_queues, arr_being_exe_tasks = make_active_set([2, 1])
+    local_queues[0].popleft()
+    remote_queues[0].append(local_queues[1].pop())
+    assert active_set.pop_changed_lengths() == {0: 2, 1: 0}
+    assert active_set.pop_changed_lengths() == {}
+    assert active_set.num_remain_tasks == 2
+
+@pytest.mark.parametrize('strategy', ['none', 'work_stealing', 'react_offloading'])
+def test_tick_engine_on_many_ranks_with_stragglers(run_engines, same_results, strategy):
+    # most ranks are idle early, the few slowdown ranks run long
+    same_results(run_engines(balancing_strategy=strategy, num_process=64, num_slowdown_rank=3,
+                                num_tasks_per_rank=4, slowdown_scale=0.25, task_distribution='lognormal'))
+
+def test_queue_length_tracker_keeps_the_remaining_tasks():
+    local_queues = [TaskQueue([Task(r * 10 + i, 10.0, 1.0, r) for i in range(2)]) for r in range(3)]
+    remote_queues = [TaskQueue() for r in range(3)]
+    queue_lengths = QueueLengthTracker(local_queues, remote_queues)
+    remote_queues[2].append(local_queues[0].pop())
+    local_queues[1].popleft()
+    assert queue_lengths.num_remain_tasks == 5
+    assert queue_lengths.pop_changed_lengths() == {0: 1, 1: 1, 2: 3}
+    assert queue_lengths.pop_changed_lengths() == {}
@@ -0,0 +1,81 @@
+import random
+
+import pytest
+
+from simulator import *
+
+def get_rimb(lengths):
+    # the imbalance ratios of check_imbalance_status, by a scan of all ranks
+    lmin, lmax, lavg = min(lengths), max(lengths), sum(lengths) / len(lengths)
+    if lavg == 0 or lmax == 0:
+        return [0.0, 0.0]
+    return [(lmax - lavg) / lavg, (lmax - lmin) / lmax]
+
+def test_load_index_follows_the_queue_lengths():
+    generator = random.Random(11)
+    lengths = [generator.randint(0, 6) for r in range(12)]
+    load_index = LoadIndex(lengths)
+    for step in range(500):
+        rank = generator.randrange(len(lengths))
+        lengths[rank] = max(0, lengths[rank] + generator.choice([-3, -1, 1, 2]))
+        load_index.update(rank, lengths[rank])
+        assert load_index.get_rimb() == pytest.approx(get_rimb(lengths))
+        assert (load_index.get_min_length(), load_index.get_max_length()) == (min(lengths), max(lengths))
+        assert check_imbalance_status(0, load_index) == pytest.approx(get_rimb(lengths)[1])
+    # ties are ordered by rank
+    assert list(load_index.iter_ascending()) == sorted(range(len(lengths)), key=lambda r: (lengths[r], r))
+    assert list(load_index.iter_descending()) == sorted(range(len(lengths)), key=lambda r: (-lengths[r], -r))
+
+def test_empty_queues_are_balanced():
+    load_index = LoadIndex([0, 0, 0])
+    assert load_index.get_rimb() == [0.0, 0.0]
+    load_index.update(1, 4)
+    assert load_index.get_rimb() == pytest.approx([2.0, 1.0])
+
+def test_rank_set_samples_distinct_ranks():
+    random.seed(5)
+    rank_set = RankSet([4, 1, 7, 3])
+    rank_set.discard(1)
+    rank_set.discard(9)
+    rank_set.add(4)
+    assert sorted(rank_set) == [3, 4, 7] and 7 in rank_set and 1 not in rank_set
+    for k in range(4):
+        ranks = rank_set.sample(k)
+        assert len(set(ranks)) == k and set(ranks) <= {3, 4, 7}
+    # the positions are kept by the sampling
+    rank_set.discard(rank_set.sample(1)[0])
+    assert len(rank_set) == 2 and all(rank_set.ranks[rank_set.pos[r]] == r for r in rank_set)
+
+def test_steal_index_follows_the_local_queues():
+    generator = random.Random(3)
+    queues = [TaskQueue([Task(r * 10 + i, 1.0, 1.0, r) for i in range(generator.randint(0, 5))]) for r in range(8)]
+    steal_index = StealIndex([len(q) for q in queues], create_network(8))
+    for r in range(8):
+        queues[r].observe_length(r, steal_index.update)
+    for step in range(200):
+        rank = generator.randrange(8)
+        if len(queues[rank]) != 0 and generator.random() < 0.6:
+            queues[rank].popleft()
+        else:
+            queues[rank].append(Task(100 + step, 1.0, 1.0, rank))
+        if generator.random() < 0.3:
+            steal_index.sync()
+            assert set(steal_index.idle_ranks) == {r for r in range(8) if len(queues[r]) == 0}
+            assert set(steal_index.busy_ranks) == {r for r in range(8) if len(queues[r]) > MIN_TASKS_IN_QUEUE_FOR_STEAL}
+            assert steal_index.unrequested_ranks == set(steal_index.idle_ranks)
+
+def test_busy_ranks_accept_at_most_one_request_each():
+    random.seed(2)
+    network = create_network(5)
+    steal_index = StealIndex([0, 0, 0, 5, 5], network)
+    arr_request_msg = [[] for r in range(5)]
+    arr_accept_msg = [[] for r in range(5)]
+    exchange_steal_request(0, steal_index, arr_request_msg, arr_accept_msg)
+    assert steal_index.requesting_ranks == {0, 1, 2} and len(steal_index.unrequested_ranks) == 0
+    clock = min(network.arrival_times())
+    network.deliver(clock)
+    exchange_steal_request(clock, steal_index, arr_request_msg, arr_accept_msg)
+    assert [len(msgs) for msgs in arr_accept_msg] == [0, 0, 0, 1, 1]
+    assert steal_index.accepting_ranks == {3, 4} and len(steal_index.waiting_ranks) == 1
+    accepted = {arr_accept_msg[r][0].receiver for r in (3, 4)}
+    assert accepted | set(steal_index.waiting_ranks) == {0, 1, 2}
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from simulator import *
+
+@pytest.fixture
+def batch_size():
+    # the batch setting is a module global, set back to a single task
+    yield set_migration_batch_size
+    set_migration_batch_size(1, 'diff')
+
+def make_queue(num_tasks, data=1.0):
+    return TaskQueue([Task(tid, 100.0, data, 0) for tid in range(num_tasks)])
+
+def test_batch_size_by_policy(batch_size):
+    batch_size(8, 'diff')
+    assert [get_batch_size(diff) for diff in [0, 3, 10, 100]] == [1, 1, 5, 8]
+    batch_size(8, 'cap')
+    assert [get_batch_size(diff) for diff in [0, 3, 10, 100]] == [8, 8, 8, 8]
+    with pytest.raises(ValueError):
+        batch_size(0)
+    with pytest.raises(ValueError):
+        batch_size(2, 'all')
+
+def test_batch_is_marked_from_the_rear():
+    queue = make_queue(10)
+    tasks = mark_tasks_to_migrate(queue, 1, 4)
+    assert [task.tid for task in tasks] == [9, 8, 7, 6]
+    assert queue.get_cursor() == 5
+    # the first tasks of a queue are not migrated
+    tasks = mark_tasks_to_migrate(queue, 2, 10)
+    assert [task.tid for task in tasks] == list(range(5, MIN_TASK_INDEX_FOR_MIGRATION-1, -1))
+
+def test_batch_is_one_transfer():
+    # a flat network without a migration cost model
+    set_network_model_from_context({})
+    set_migration_cost_model(None)
+    set_topology(None)
+    tasks = mark_tasks_to_migrate(make_queue(10, data=2.0), 1, 4)
+    arrive_time = set_batch_time(tasks, 0, 50, 0, 10, 0, 100)
+    # the flat cost once for the batch, without noise
+    assert arrive_time == 60
+    assert all(task.mig_time == 50 and task.arr_time == 60 for task in tasks)
+
+@pytest.mark.parametrize('policy', MIGRATION_BATCH_POLICIES)
+@pytest.mark.parametrize('strategy', ['work_stealing', 'hierarchical_work_stealing', 'react_offloading'])
+def test_engines_give_the_same_loads_with_batches(run_engines, same_results, strategy, policy):
+    same_results(run_engines(balancing_strategy=strategy, migration_batch_size=4, migration_batch_policy=policy,
+                                ranks_per_node=2))
+
+@pytest.mark.parametrize('batch_size, max_arrival', [(1, 1), (4, 4)])
+def test_batch_arrives_as_a_whole(run_engines, batch_size, max_arrival):
+    # a stolen batch grows the queue of the thief by its size at once
+    queue_status = run_engines(engines=['tick'], balancing_strategy='work_stealing', migration_batch_size=batch_size,
+                                migration_batch_policy='cap')['tick'][2]
+    assert np.diff(queue_status, axis=1).max() == max_arrival
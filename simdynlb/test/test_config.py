@@ -0,0 +1,56 @@
+import pytest
+
+from conftest import BASE_CONTEXT
+from simulator import *
+
+def make_scenario(**values):
+    context_info = dict(BASE_CONTEXT)
+    context_info.update(values)
+    return Scenario(context_info)
+
+def test_missing_values_get_their_defaults():
+    scenario = make_scenario()
+    assert scenario.balancing_strategy == 'none'
+    assert scenario.migration_batch_policy == 'diff'
+    assert scenario.get('network_bandwidth', 10) == 10
+    without_tasks = dict(BASE_CONTEXT)
+    del without_tasks['num_tasks_per_rank']
+    with pytest.raises(ValueError, match='missing scenario value num_tasks_per_rank'):
+        Scenario(without_tasks)
+
+@pytest.mark.parametrize('values', [
+    {'num_process': 8.5}, {'num_process': True}, {'clock_rate': 0}, {'noise': -1},
+    {'num_slowdown_rank': 9}, {'num_proces': 8}, {'migration_batch_size': 0}
+])
+def test_wrong_values_are_errors(values):
+    with pytest.raises(ValueError):
+        make_scenario(**values)
+
+def test_integer_floats_are_integers():
+    assert make_scenario(num_process=8.0).num_process == 8
+
+def test_strategy_names_are_checked_at_parse_time():
+    assert make_scenario(balancing_strategy='work_stealing, react_offloading').balancing_strategy == \
+            'work_stealing, react_offloading'
+    with pytest.raises(ValueError, match='unknown balancing strategy work_staling'):
+        make_scenario(balancing_strategy='work_staling')
+    with pytest.raises(ValueError, match='unknown balancing strategy reac_offloading'):
+        make_scenario(balancing_strategy='work_stealing,reac_offloading')
+
+def test_batch_policy_is_checked_at_parse_time():
+    assert make_scenario(migration_batch_policy='cap').migration_batch_policy == 'cap'
+    with pytest.raises(ValueError, match='unknown migration_batch_policy half'):
+        make_scenario(migration_batch_policy='half')
+
+def test_sweep_scenarios_are_the_product_of_the_axes():
+    scenarios = parse_scenarios({'context_info': BASE_CONTEXT, 'sweep': {'noise': [0, 1], 'num_process': [4, 8, 16]}})
+    assert [(s.noise, s.num_process) for s in scenarios] == [(n, p) for n in [0, 1] for p in [4, 8, 16]]
+    assert scenarios[1].name == 'noise0_num_process8'
+    with pytest.raises(ValueError):
+        parse_scenarios({'context_info': BASE_CONTEXT, 'sweep': {'nosie': [0, 1]}})
+    with pytest.raises(ValueError):
+        parse_scenarios({'context_info': BASE_CONTEXT, 'sweep': {'migration_batch_policy': ['diff', 'half']}})
+
+def test_scenarios_share_the_defaults():
+    scenarios = parse_scenarios({'defaults': BASE_CONTEXT, 'scenarios': [{'name': 'a', 'noise': 0}, {}]})
+    assert [(s.name, s.noise) for s in scenarios] == [('a', 0), ('scenario1', 1)]
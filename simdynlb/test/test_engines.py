@@ -0,0 +1,20 @@
+import pytest
+
+from simulator import *
+
+@pytest.mark.parametrize('strategy', list(BALANCING_STRATEGIES.keys()))
+def test_engines_give_the_same_loads(run_engines, same_results, strategy):
+    results = run_engines(balancing_strategy=strategy, ranks_per_node=2)
+    same_results(results)
+    # the balancing migrates tasks, except without a strategy
+    assert (sum(results['tick'][1]) > 0) == (strategy != 'none')
+
+@pytest.mark.parametrize('clock_rate, slowdown_scale', [(1000, 0.2), (50, 0.5), (100, 0.25)])
+def test_engines_give_the_same_loads_for_clock_rates(run_engines, same_results, clock_rate, slowdown_scale):
+    same_results(run_engines(balancing_strategy='work_stealing,react_offloading', clock_rate=clock_rate,
+                                slowdown_scale=slowdown_scale))
+
+@pytest.mark.parametrize('iter', [1, 2])
+def test_engines_give_the_same_loads_for_iterations(run_engines, same_results, iter):
+    # the costs are drawn from the streams of the iteration
+    same_results(run_engines(iter=iter, balancing_strategy='react_offloading', num_iterations=3))
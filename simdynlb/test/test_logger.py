@@ -0,0 +1,54 @@
+import pytest
+
+from simulator import *
+
+STRATEGY = 'work_stealing,react_offloading'
+
+@pytest.fixture
+def log_settings():
+    yield set_logging
+    set_logging('none')
+
+def test_logging_is_disabled_by_default(tmp_path, monkeypatch, run_engines):
+    monkeypatch.chdir(tmp_path)
+    assert not any(logger.trace or logger.debug or logger.info for logger in LOGGERS.values())
+    run_engines(engines=['tick'], balancing_strategy=STRATEGY)
+    flush_log()
+    assert list(tmp_path.iterdir()) == []
+
+@pytest.mark.parametrize('fmt', LOG_FORMATS)
+def test_logged_records_do_not_change_the_results(tmp_path, log_settings, run_engines, same_results, fmt):
+    results = run_engines(engines=['tick'], balancing_strategy=STRATEGY)
+    filename = str(tmp_path / ('log' + LOG_FILE_EXTS[fmt]))
+    log_settings('debug', fmt=fmt, filename=filename)
+    logged = run_engines(engines=['tick'], balancing_strategy=STRATEGY)
+    same_results({'tick': results['tick'], 'logged': logged['tick']})
+    flush_log()
+    records = read_log(filename)
+    events = {record['event'] for record in records}
+    assert {'send_request', 'confirm_accept', 'select_offload', 'offload_tasks'} <= events
+    assert all(record['level'] in ('debug', 'info') for record in records)
+    assert all(format_record(record).startswith('[') for record in records)
+
+def test_formats_give_the_same_records(tmp_path, log_settings, run_engines):
+    records = {}
+    for fmt in LOG_FORMATS:
+        filename = str(tmp_path / ('log' + LOG_FILE_EXTS[fmt]))
+        log_settings('trace', fmt=fmt, filename=filename)
+        run_engines(engines=['tick'], balancing_strategy=STRATEGY)
+        log_settings('none')
+        records[fmt] = read_log(filename)
+    assert len(records['jsonl']) != 0 and records['binary'] == records['jsonl']
+
+def test_components_are_logged_apart(tmp_path, log_settings, run_engines):
+    filename = str(tmp_path / 'log.jsonl')
+    log_settings('debug', components='migrator', filename=filename)
+    assert MIGRATOR_LOG.debug and not BALANCER_LOG.info
+    run_engines(engines=['tick'], balancing_strategy=STRATEGY)
+    flush_log()
+    assert {record['component'] for record in read_log(filename)} == {'migrator'}
+
+@pytest.mark.parametrize('args', [('all',), ('info', 'network'), ('info', None, 'csv')])
+def test_unknown_logging_settings_are_errors(log_settings, args):
+    with pytest.raises(ValueError):
+        log_settings(*args)
@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+
+from simulator import *
+import network as network_module
+
+def test_transfer_time_by_latency_bandwidth_and_topology():
+    latency_matrix = np.array([[0.0, 3.0], [0.5, 0.0]])
+    network = Network(2, bandwidth=4.0, latency_matrix=latency_matrix)
+    assert network.get_transfer_time(0, 1) == 3
+    assert network.get_transfer_time(1, 0) == 1    # one tick at least
+    assert network.get_transfer_time(0, 1, size=6.0) == 5
+    assert network.get_transfer_time(-1, 1) == 2   # any receiver, the flat latency
+
+    topology = Topology(4, 2, cost_scales={'intra_node': 0.5, 'intra_switch': 2.0, 'inter_switch': 2.0})
+    network = Network(3, topology=topology)
+    assert network.get_transfer_time(0, 1) == 2
+    assert network.get_transfer_time(0, 2) == 6
+
+def test_messages_arrive_by_arrival_time_then_sending_order():
+    network = Network(2, latency_matrix=np.array([[0, 4, 1], [4, 0, 1], [1, 1, 0]]))
+    delivered = []
+    on_delivery = lambda clock, msg: delivered.append((clock, msg.info))
+    network.send(0, Message(0, 1, 'a'), on_delivery=on_delivery)   # at 4
+    network.send(1, Message(0, 2, 'b'), on_delivery=on_delivery)   # at 2
+    network.send(1, Message(2, 1, 'c'), on_delivery=on_delivery)   # at 2
+    network.send(2, Message(1, 0, 'd'), on_delivery=on_delivery, recv_time=3)
+    assert sorted(network.arrival_times()) == [2, 2, 3, 4]
+    assert network.next_arrival_time() == 2
+
+    for clock in range(6):
+        network.deliver(clock)
+    assert delivered == [(2, 'b'), (2, 'c'), (3, 'd'), (4, 'a')]
+    assert len(network) == 0 and network.next_arrival_time() is None
+
+def test_late_delivery_gets_the_arrived_messages():
+    # a strategy ticking less often gets the messages arrived since
+    network = Network(1)
+    delivered = []
+    for sender in range(3):
+        network.send(sender, Message(sender, -1, sender), on_delivery=lambda clock, msg: delivered.append(msg.info))
+    network.deliver(2)
+    assert delivered == [0, 1]
+    network.deliver(10)
+    assert delivered == [0, 1, 2]
+
+@pytest.mark.parametrize('strategy', ['work_stealing', 'react_offloading'])
+def test_engines_give_the_same_loads_on_a_network(tmp_path, run_engines, same_results, strategy):
+    latency_file = str(tmp_path / 'latency.csv')
+    latency_matrix = np.arange(64, dtype=np.float64).reshape(8, 8) % 5 + 1
+    np.savetxt(latency_file, latency_matrix, delimiter=',')
+    results = run_engines(balancing_strategy=strategy, network_latency_file=latency_file, network_bandwidth=0.5)
+    same_results(results)
+    # the slower network changes the time of the migrations
+    flat_queue_status = run_engines(engines=['tick'], balancing_strategy=strategy)['tick'][2]
+    assert not np.array_equal(results['tick'][2], flat_queue_status)
+
+def test_engines_give_the_same_loads_with_a_migration_cost_model(run_engines, same_results):
+    same_results(run_engines(balancing_strategy='work_stealing,react_offloading', migration_cost_system='sng'))
+
+def write_latency_bw_table(filename):
+    with open(filename, 'w') as f:
+        f.write('system,size(bytes),latency(us),bw(MB/s)\n')
+        f.write('b,1048576,10,100\n')
+        f.write('a,2097152,30,200\n')
+        f.write('a,1048576,10,100\n')
+
+def test_latency_bw_table_interpolates_between_the_sizes(tmp_path):
+    filename = str(tmp_path / 'latency_bw.csv')
+    write_latency_bw_table(filename)
+    table = read_latency_bw_table(filename, 'a')
+    assert table.sizes.tolist() == [1048576, 2097152]
+    assert table.get_delay(1.0) == pytest.approx(10E-6 + 1.0 / 100)
+    assert table.get_delay(1.5) == pytest.approx(20E-6 + 1.5 / 150)
+    # out of the measured sizes, the closest one
+    assert table.get_delay(np.array([0.5, 4.0])) == pytest.approx([10E-6 + 0.5 / 100, 30E-6 + 4.0 / 200])
+
+def test_migration_delay_by_the_cost_model(tmp_path, monkeypatch):
+    monkeypatch.setattr(network_module, 'MIGRATION_COST_TABLE', None)
+    assert get_migration_delay(1.0, 1000) is None
+    filename = str(tmp_path / 'latency_bw.csv')
+    write_latency_bw_table(filename)
+    set_migration_cost_model('a', filename)
+    assert get_migration_delay(1.0, 1000) == 11
+    assert get_migration_delay(0.0, 1000) == 1   # one tick at least
+    set_migration_cost_model(None)
+    assert network_module.MIGRATION_COST_TABLE is None
+
+def test_missing_latency_bw_data_is_an_error(tmp_path):
+    filename = str(tmp_path / 'latency_bw.csv')
+    with pytest.raises(ValueError, match='not found'):
+        read_latency_bw_table(filename, 'a')
+    write_latency_bw_table(filename)
+    with pytest.raises(ValueError, match=r"should be one of \['a', 'b'\]"):
+        read_latency_bw_table(filename, 'c')
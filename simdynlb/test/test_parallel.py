@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from conftest import BASE_CONTEXT
+from simulator import *
+
+pytestmark = pytest.mark.skipif('fork' not in mp.get_all_start_methods(), reason='needs the fork start method')
+
+NUM_ITERATIONS = 3
+
+def get_results(simu_res):
+    local_load, remote_load, recorder = simu_res
+    return [list(local_load), list(remote_load), get_queue_status_array(recorder)]
+
+@pytest.mark.parametrize('strategy', ['work_stealing', 'react_offloading'])
+def test_parallel_iterations_give_the_serial_results(strategy):
+    scenario = Scenario(dict(BASE_CONTEXT, balancing_strategy=strategy))
+    apply_scenario(scenario)
+    local_queues, slowdown_procs, slowdown_scales = init_simulation(scenario)[:3]
+    costs = [scenario.clock_rate, scenario.balancing_ops_cost, scenario.migration_delay_cost, scenario.noise]
+    serial = [get_results(simulate(local_queues, slowdown_procs, slowdown_scales, i, *costs))
+              for i in range(NUM_ITERATIONS)]
+
+    pool = start_pool(2, {
+        'engine': simulate, 'local_queues': local_queues,
+        'slowdown_procs': slowdown_procs, 'slowdown_scales': slowdown_scales,
+        'clock_rate': costs[0], 'cost_balancing': costs[1], 'cost_migration_delay': costs[2], 'noise': costs[3]
+    })
+    try:
+        parallel = [get_results(simu_res) for simu_res, output in simulate_iterations_in_parallel(pool, NUM_ITERATIONS)]
+    finally:
+        pool.close()
+        pool.join()
+
+    for (local_load, remote_load, queue_status), (ref_local, ref_remote, ref_queue_status) in zip(parallel, serial):
+        assert local_load == ref_local and remote_load == ref_remote
+        assert np.array_equal(queue_status, ref_queue_status)
+    # the offloading costs differ per iteration, the results come in order
+    if strategy == 'react_offloading':
+        assert serial[0][1] != serial[1][1]
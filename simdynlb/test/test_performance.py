@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+
+from simulator import *
+
+@pytest.fixture
+def perf_model():
+    yield set_performance_model
+    set_performance_model(None, DEFAULT_PERF_EPOCH)
+
+def test_markov_model_is_checked():
+    with pytest.raises(ValueError):
+        MarkovModel(['a', 'b'], [0.5, 0.6], [[1, 0], [0, 1]], [1, 1])
+    with pytest.raises(ValueError):
+        MarkovModel(['a', 'b'], [0.5, 0.5], [[1, 0], [0, 1]], [1, 0])
+    with pytest.raises(ValueError):
+        MarkovModel(['a', 'b'], [1.0], [[1, 0], [0, 1]], [1, 1])
+
+def test_markov_model_samples_by_the_cumulative_distributions():
+    model = MarkovModel(['a', 'b', 'c'], [0.2, 0.3, 0.5], [[0, 1, 0], [0, 0, 1], [1, 0, 0]], [1, 2, 3])
+    assert model.sample_init(np.array([0.0, 0.25, 0.6, 0.999])).tolist() == [0, 1, 2, 2]
+    assert model.sample_next(np.array([0, 1, 2]), np.array([0.5, 0.5, 0.5])).tolist() == [1, 2, 0]
+
+def test_trajectories_do_not_depend_on_the_access_order(perf_model):
+    perf_model('normal_throttled_noisy', 0.5)
+    clocks = np.arange(0, 50 * PERF_BLOCK_EPOCHS * 10, 37)
+    ranks = clocks % 16
+    durs = np.full(len(clocks), 100.0)
+    # sampled block by block in order, or at once for the last clock
+    in_order = create_performance_trajectories(16, 3, 100)
+    exe_durs = [in_order.get_exe_dur(int(r), int(c), 100.0) for r, c in zip(ranks, clocks)]
+    at_once = create_performance_trajectories(16, 3, 100)
+    assert at_once.get_exe_durs(ranks, clocks, durs).tolist() == exe_durs
+    assert np.array_equal(in_order.factors, at_once.factors)
+    # another iteration is another trajectory
+    other = create_performance_trajectories(16, 4, 100)
+    assert other.get_exe_durs(ranks, clocks, durs).tolist() != exe_durs
+
+def test_constant_speed_without_a_model(perf_model):
+    perf_model(None)
+    assert create_performance_trajectories(16, 0, 100) is None
+
+@pytest.mark.parametrize('strategy', ['none', 'work_stealing', 'react_offloading'])
+def test_engines_give_the_same_loads_with_a_performance_model(run_engines, same_results, strategy):
+    results = run_engines(balancing_strategy=strategy, perf_model='normal_throttled_noisy', perf_epoch=0.5)
+    same_results(results)
+    constant = run_engines(engines=['tick'], balancing_strategy=strategy)
+    assert results['tick'][0] != constant['tick'][0]
+
+def test_speed_model_is_matched_by_value():
+    model = RankSpeedModel(8, [0, 1], [0.5, 0.25], 100)
+    assert model.is_model_of([0, 1], [0.5, 0.25], 100)
+    assert not model.is_model_of([0, 1], [0.5, 0.5], 100)
+    assert not model.is_model_of([0, 1], [0.5, 0.25], 1000)
+
+SLD_PROCS = [1, 4, 2]
+SLD_SCALES = [0.5, 0.25, 0.8]
+
+@pytest.fixture
+def speed_model():
+    yield set_rank_speed_model
+    set_rank_speed_model(None)
+
+def test_speed_model_gives_the_runtimes_of_the_scan(speed_model):
+    model = RankSpeedModel(6, SLD_PROCS, SLD_SCALES, 100)
+    pairs = [(o, t) for o in range(6) for t in range(6)]
+    old_durs = [100.0 + 37 * o for o, t in pairs]
+    speed_model(None)
+    start_random_streams(0)
+    by_scan = [estimate_new_task_runtime(d, SLD_PROCS, SLD_SCALES, o, t, 0, 100) for d, (o, t) in zip(old_durs, pairs)]
+    speed_model(model)
+    start_random_streams(0)
+    by_model = [estimate_new_task_runtime(d, SLD_PROCS, SLD_SCALES, o, t, 0, 100) for d, (o, t) in zip(old_durs, pairs)]
+    assert by_model == by_scan
+    # from a normal rank to a slowdown one, the runtime scales by the speed
+    assert by_model[pairs.index((0, 4))] == 100 / 0.25
+
+def test_speed_model_gives_the_runtimes_of_a_batch_at_once(speed_model):
+    model = RankSpeedModel(6, SLD_PROCS, SLD_SCALES, 100)
+    origins = [0, 1, 2, 3, 4, 5, 2, 1]
+    old_durs = [100.0, 180.0, 95.0, 100.0, 420.0, 100.0, 130.0, 200.0]
+    for target in range(6):
+        start_random_streams(3)
+        one_by_one = [model.get_runtime(d, o, target, 3) for d, o in zip(old_durs, origins)]
+        start_random_streams(3)
+        assert model.get_runtimes(old_durs, origins, target, 3).tolist() == one_by_one
+
+def test_runtime_multipliers_replace_the_speeds():
+    multipliers = np.full((3, 3), 1.0)
+    multipliers[0, 2] = 2.5
+    model = RankSpeedModel(3, [2], [0.5], 100, multipliers)
+    assert model.get_runtime(100.0, 0, 2, 0) == 250
+    assert model.get_runtime(100.0, 2, 2, 0) == 100.0
+    assert model.get_runtimes([100.0, 40.0], [0, 1], 2, 0).tolist() == [250.0, 40.0]
+    with pytest.raises(ValueError):
+        RankSpeedModel(3, [2], [0.5], 100, np.ones((2, 3)))
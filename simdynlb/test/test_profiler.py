@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from conftest import BASE_CONTEXT
+from simulator import *
+import profiler as profiler_module
+
+def test_queue_status_trace_round_trip(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    recorder = ChangeRecorder([2, 0, 1])
+    recorder.record(3, [1, 4, 1])
+    recorder.record_changes(9, {0: 0, 2: 7})
+    profile_queue_status(recorder, 2.0, 10.0)
+
+    trace, metadata = read_queue_status_trace('./profiled_queues_obalancing2_odelay10.npy')
+    assert isinstance(trace, np.memmap) and trace.dtype == np.dtype(QUEUE_STATUS_TRACE_DTYPE)
+    assert np.array_equal(trace, recorder.to_array())
+    assert metadata == {
+        'format': 'queue_status', 'version': QUEUE_STATUS_TRACE_VERSION, 'num_procs': 3, 'num_ticks': 10,
+        'dtype': QUEUE_STATUS_TRACE_DTYPE, 'balancing_ops_cost': 2, 'migration_delay_cost': 10
+    }
+
+def test_queue_status_trace_without_metadata(tmp_path):
+    filename = str(tmp_path / 'queues.npy')
+    np.save(filename, np.arange(6, dtype=np.int32).reshape(2, 3))
+    trace, metadata = read_queue_status_trace(filename)
+    assert trace.tolist() == [[0, 1, 2], [3, 4, 5]] and metadata == {}
+
+@pytest.fixture
+def profiling_level(monkeypatch):
+    # the level is a module global, set back after a test
+    monkeypatch.setattr(profiler_module, 'PROFILING_LEVEL', profiler_module.PROFILING_LEVEL)
+    return set_profiling_level
+
+def run_simulation(strategy='react_offloading'):
+    scenario = Scenario(dict(BASE_CONTEXT, balancing_strategy=strategy))
+    apply_scenario(scenario)
+    local_queues, slowdown_procs, slowdown_scales = init_simulation(scenario)[:3]
+    return simulate(local_queues, slowdown_procs, slowdown_scales, 0, scenario.clock_rate,
+                    scenario.balancing_ops_cost, scenario.migration_delay_cost, scenario.noise)
+
+def test_profilers_by_level(profiling_level):
+    profiling_level('none')
+    assert isinstance(create_task_profiler(4), NoneProfiler)
+    profiling_level('counters')
+    assert type(create_task_profiler(4)) is CounterProfiler
+    profiling_level('trace')
+    assert isinstance(create_task_profiler(4), TraceProfiler)
+    with pytest.raises(ValueError):
+        profiling_level('all')
+
+def test_no_profiling_writes_nothing(tmp_path, monkeypatch, capsys, profiling_level):
+    monkeypatch.chdir(tmp_path)
+    profiling_level('none')
+    run_simulation()
+    assert capsys.readouterr().out == '' and list(tmp_path.iterdir()) == []
+
+def test_counters_count_the_local_and_remote_tasks():
+    profiler = CounterProfiler(2)
+    local_task = Task(0, 1.0, 1.0, 0)
+    remote_task = Task(1, 1.0, 1.0, 0)
+    remote_task.set_remote_node(1)
+    profiler.add(0, local_task)
+    profiler.add(1, remote_task)
+    profiler.add(0, local_task)
+    assert profiler.num_local_remote_tasks == [[2, 0], [0, 1]]
+
+def test_trace_level_writes_the_executed_tasks(tmp_path, monkeypatch, profiling_level):
+    monkeypatch.chdir(tmp_path)
+    profiling_level('trace')
+    local_load, remote_load, recorder = run_simulation()
+    trace = np.load('task_trace_OBalancing2_ODelay2.npy')
+    assert trace.dtype == TASK_TRACE_DTYPE
+    num_tasks = BASE_CONTEXT['num_process'] * BASE_CONTEXT['num_tasks_per_rank']
+    assert len(trace) == num_tasks and len(set(trace['tid'].tolist())) == num_tasks
+    # the executed tasks give the loads of the ranks
+    remote = trace['local_node'] != trace['rank']
+    durs = trace['end_time'] - trace['sta_time']
+    for r in range(BASE_CONTEXT['num_process']):
+        assert durs[(trace['rank'] == r) & ~remote].sum() == pytest.approx(local_load[r])
+        assert durs[(trace['rank'] == r) & remote].sum() == pytest.approx(remote_load[r])
+    assert remote.any()
+    queue_status, metadata = read_queue_status_trace('profiled_queues_obalancing2_odelay2.npy')
+    assert np.array_equal(queue_status, get_queue_status_array(recorder))
@@ -0,0 +1,141 @@
+import random
+
+import pytest
+
+from simulator import *
+
+NUM_TASKS = 30
+
+def make_queue(kind):
+    # the local queue of rank 0, small blocks let the lazy queue generate
+    # its tasks at both ends
+    workload = create_workload(2, NUM_TASKS, [0], [0.5], 100, generation='lazy' if kind == 'lazy' else 'eager',
+                                block_size=4)
+    queue = workload.restore()[0]
+    if kind == 'objects':
+        queue = TaskQueue([Task(t.tid, t.dur, t.data, t.local_node) for t in queue])
+    return queue
+
+def get_cursor(tids, marked):
+    # the index of the last unmarked task, -1 if there is no one
+    for idx in range(len(tids)-1, -1, -1):
+        if tids[idx] not in marked:
+            return idx
+    return -1
+
+@pytest.mark.parametrize('kind', ['objects', 'table', 'lazy'])
+def test_queue_operations_match_a_list(kind):
+    queue = make_queue(kind)
+    lengths = []
+    queue.observe_length(0, lambda rank, length: lengths.append(length))
+    tids = [queue[idx].tid for idx in range(len(queue))]
+    marked = set()
+    popped = []
+
+    generator = random.Random(3)
+    for step in range(400):
+        op = generator.choice(['popleft', 'pop', 'append', 'appendleft', 'mark'])
+        if op in ('popleft', 'pop') and len(tids) != 0:
+            task = queue.popleft() if op == 'popleft' else queue.pop()
+            assert task.tid == (tids.pop(0) if op == 'popleft' else tids.pop())
+            popped.append(task)
+        elif op in ('append', 'appendleft') and len(popped) != 0:
+            task = popped.pop(generator.randrange(len(popped)))
+            if op == 'append':
+                queue.append(task)
+                tids.append(task.tid)
+            else:
+                queue.appendleft(task)
+                tids.insert(0, task.tid)
+        elif op == 'mark':
+            task = queue.mark_migratable(1)
+            cursor = get_cursor(tids, marked)
+            if cursor < 0:
+                assert task is None
+            else:
+                assert task.tid == tids[cursor] and task.remot_node == 1
+                marked.add(task.tid)
+        else:
+            continue
+        assert len(queue) == len(tids)
+        assert queue.get_cursor() == get_cursor(tids, marked)
+        assert len(lengths) == 0 or lengths[-1] == len(tids)
+
+    assert [task.tid for task in queue] == tids
+    # the marked tasks behind the cursor, from the rear
+    assert [task.tid for task in queue.marked_tasks()] == tids[get_cursor(tids, marked)+1:][::-1]
+
+def test_deque_changes_keep_the_cursor_and_the_observers():
+    queue = make_queue('objects')
+    lengths = []
+    queue.observe_length(0, lambda rank, length: lengths.append(length))
+    tids = [task.tid for task in queue]
+    marked = set()
+    popped = [queue.pop() for i in range(6)]
+    del tids[-6:]
+
+    generator = random.Random(5)
+    for step in range(300):
+        op = generator.choice(['extend', 'extendleft', 'iadd', 'insert', 'remove', 'rotate',
+                               'setitem', 'delitem', 'mark', 'clear'])
+        if op in ('extend', 'extendleft', 'iadd') and len(popped) != 0:
+            tasks = [popped.pop() for i in range(generator.randint(1, len(popped)))]
+            if op == 'extend':
+                queue.extend(tasks)
+                tids.extend(task.tid for task in tasks)
+            elif op == 'iadd':
+                queue += tasks
+                tids += [task.tid for task in tasks]
+            else:
+                queue.extendleft(tasks)
+                tids[:0] = [task.tid for task in reversed(tasks)]
+        elif op in ('insert', 'setitem') and len(popped) != 0:
+            task = popped.pop()
+            idx = generator.randrange(len(tids) + 1)
+            if op == 'insert':
+                queue.insert(idx, task)
+                tids.insert(idx, task.tid)
+            elif idx < len(tids):
+                popped.append(queue[idx])
+                queue[idx] = task
+                tids[idx] = task.tid
+            else:
+                popped.append(task)
+                continue
+        elif op in ('remove', 'delitem') and len(tids) != 0:
+            idx = generator.randrange(len(tids))
+            popped.append(queue[idx])
+            if op == 'remove':
+                queue.remove(queue[idx])
+            else:
+                del queue[idx]
+            del tids[idx]
+        elif op == 'rotate' and len(tids) != 0:
+            n = generator.randint(-len(tids), len(tids))
+            queue.rotate(n)
+            n %= len(tids)
+            tids[:] = tids[-n:] + tids[:-n] if n else tids
+        elif op == 'mark':
+            task = queue.mark_migratable(1)
+            if task is not None:
+                marked.add(task.tid)
+        elif op == 'clear' and generator.random() < 0.1:
+            popped.extend(queue)
+            queue.clear()
+            tids.clear()
+        else:
+            continue
+        assert [task.tid for task in queue] == tids
+        assert queue.get_cursor() == get_cursor(tids, marked)
+        assert len(lengths) == 0 or lengths[-1] == len(tids)
+
+def test_lazy_queues_give_the_tasks_of_the_eager_ones():
+    distribution = get_task_distribution('lognormal')
+    eager = create_workload(4, NUM_TASKS, [0], [0.5], 100, distribution, 'eager').restore()
+    lazy = create_workload(4, NUM_TASKS, [0], [0.5], 100, distribution, 'lazy', block_size=4).restore()
+    for eager_queue, lazy_queue in zip(eager, lazy):
+        assert len(eager_queue) == len(lazy_queue)
+        while len(eager_queue) != 0:
+            eager_task, lazy_task = eager_queue.popleft(), lazy_queue.popleft()
+            assert (eager_task.tid, eager_task.dur) == (lazy_task.tid, lazy_task.dur)
+        assert len(lazy_queue) == 0
@@ -0,0 +1,96 @@
+import os
+import random
+
+import numpy as np
+import pytest
+
+from simulator import *
+import recorder as recorder_module
+
+NUM_PROCS = 5
+INITIAL_LENGTHS = [3, 0, 5, 1, 2]
+
+@pytest.fixture
+def ring_dir(tmp_path):
+    return str(tmp_path / 'spill')
+
+@pytest.fixture
+def queue_status_policy(monkeypatch):
+    # the settings of the policy are module globals, set back after a test
+    for name in ['QUEUE_STATUS_POLICY', 'QUEUE_STATUS_STRIDE', 'QUEUE_STATUS_RING_TICKS', 'QUEUE_STATUS_SPILL_DIR']:
+        monkeypatch.setattr(recorder_module, name, getattr(recorder_module, name))
+    return set_queue_status_policy
+
+def record_random_lengths(recorder, num_clocks=300, seed=7):
+    """Record random changes at random clocks by record and record_changes,
+    the reference is a ranks x ticks array where a skipped tick keeps the
+    last lengths."""
+    generator = random.Random(seed)
+    lengths = list(INITIAL_LENGTHS)
+    ref = [list(lengths)]
+    clock = 0
+    while clock < num_clocks:
+        next_clock = clock + generator.choice([1, 1, 2, 7, 40])
+        ref += [list(lengths)] * (next_clock - clock - 1)
+        clock = next_clock
+        changed_lengths = {}
+        for r in generator.sample(range(NUM_PROCS), generator.randint(0, 3)):
+            changed_lengths[r] = max(0, lengths[r] + generator.randint(-2, 2))
+        lengths = list(lengths)
+        for r, length in changed_lengths.items():
+            lengths[r] = length
+        if generator.random() < 0.5:
+            recorder.record(clock, list(lengths))
+        else:
+            recorder.record_changes(clock, changed_lengths)
+        ref.append(list(lengths))
+    return np.array(ref).T
+
+@pytest.mark.parametrize('seed', [1, 2, 3])
+def test_change_and_ring_recorders_keep_every_tick(ring_dir, seed):
+    change = ChangeRecorder(INITIAL_LENGTHS)
+    ref = record_random_lengths(change, seed=seed)
+    ring = RingRecorder(INITIAL_LENGTHS, 16, ring_dir)
+    record_random_lengths(ring, seed=seed)
+    assert np.array_equal(change.to_array(), ref)
+    assert np.array_equal(ring.to_array(), ref)
+    assert [ring[r].tolist() for r in range(NUM_PROCS)] == ref.tolist()
+    # the spilled chunks are removed on close
+    assert len(os.listdir(ring_dir)) != 0
+    ring.close()
+    assert len(os.listdir(ring_dir)) == 0
+
+def test_stride_recorder_holds_the_samples():
+    stride = StrideRecorder(INITIAL_LENGTHS, 10)
+    ref = record_random_lengths(stride)
+    series = stride.to_array()
+    assert series.shape == ref.shape
+    ticks = np.arange(ref.shape[1])
+    assert np.array_equal(series, ref[:, ticks // 10 * 10])
+    assert np.array_equal(stride.get_samples(2), ref[2, ::10])
+
+@pytest.mark.parametrize('policy', QUEUE_STATUS_POLICIES)
+def test_changes_give_back_the_series(queue_status_policy, ring_dir, policy):
+    queue_status_policy(policy, stride=4, ring_ticks=16, spill_dir=ring_dir)
+    recorder = create_queue_status_recorder(INITIAL_LENGTHS)
+    record_random_lengths(recorder)
+    ticks, values, offsets = recorder.to_changes()
+    assert offsets[-1] == len(ticks) == len(values)
+    assert np.array_equal(expand_queue_status_changes(ticks, values, offsets, recorder.num_ticks),
+                          get_queue_status_array(recorder))
+    recorder.close()
+
+def test_unknown_policy_is_an_error(queue_status_policy):
+    with pytest.raises(ValueError):
+        queue_status_policy('all')
+
+@pytest.mark.parametrize('policy', ['stride', 'ring'])
+def test_engines_give_the_same_series_by_policy(run_engines, queue_status_policy, ring_dir, policy):
+    results = run_engines(balancing_strategy='react_offloading')
+    queue_status_policy(policy, stride=4, ring_ticks=64, spill_dir=ring_dir)
+    by_policy = run_engines(balancing_strategy='react_offloading')
+    for engine, (local_load, remote_load, queue_status) in by_policy.items():
+        ref = results[engine][2]
+        if policy == 'stride':
+            ref = ref[:, np.arange(ref.shape[1]) // 4 * 4]
+        assert np.array_equal(queue_status, ref), engine
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from simulator import *
+
+NUM_PROCS = 8
+# the slowdown ranks 0, 1 get few tasks, so tasks migrate to them as well
+NUM_TASKS = [2, 2, 40, 40, 10, 10, 10, 10]
+CLOCK_RATE = 100
+SLOWDOWN_SCALE = 0.5
+
+def write_trace(filename):
+    # small runtimes, 5..50 ticks on a normal rank, far below the 1/scale
+    # seconds of the tasks of the constant distribution
+    generator = np.random.default_rng(7)
+    ranks = np.repeat(np.arange(NUM_PROCS), NUM_TASKS)
+    durs = generator.uniform(0.05, 0.5, len(ranks))
+    with open(filename, 'w') as f:
+        f.write('rank,dur\n')
+        for rank, dur in zip(ranks, durs):
+            f.write('{},{}\n'.format(rank, dur))
+    return ranks, durs
+
+def make_scenario(trace_file, strategy):
+    return Scenario({
+        'balancing_ops_cost': 1, 'clock_rate': CLOCK_RATE, 'migration_delay_cost': 2, 'noise': 0,
+        'num_iterations': 1, 'num_process': NUM_PROCS, 'num_slowdown_rank': 2,
+        'slowdown_scale': SLOWDOWN_SCALE, 'balancing_strategy': strategy, 'trace_file': trace_file
+    })
+
+@pytest.mark.parametrize('engine', list(ENGINES.keys()))
+@pytest.mark.parametrize('strategy', ['react_offloading', 'work_stealing'])
+def test_replay_total_load_within_bounds(tmp_path, engine, strategy):
+    trace_file = str(tmp_path / 'trace.csv')
+    ranks, durs = write_trace(trace_file)
+    scenario = make_scenario(trace_file, strategy)
+    apply_scenario(scenario)
+    local_queues, slowdown_procs, slowdown_scales = init_simulation(scenario)[:3]
+    local_load, remote_load = ENGINES[engine](local_queues, slowdown_procs, slowdown_scales, 0, CLOCK_RATE,
+                                                scenario.balancing_ops_cost, scenario.migration_delay_cost,
+                                                scenario.noise)[:2]
+
+    # a task of a normal rank runs its runtime, or 1/scale of it migrated to
+    # a slowdown rank; a task of a slowdown rank runs its slowed runtime, or
+    # 1/4..3/4 of it migrated to a normal rank
+    slow = np.isin(ranks, slowdown_procs)
+    home_durs = np.maximum(1, np.round(durs * CLOCK_RATE / np.where(slow, SLOWDOWN_SCALE, 1.0)))
+    low = home_durs[~slow].sum() + home_durs[slow].sum() / 4 - len(durs)
+    high = home_durs[~slow].sum() / SLOWDOWN_SCALE + home_durs[slow].sum() + len(durs)
+
+    assert sum(remote_load) > 0
+    assert low <= sum(local_load) + sum(remote_load) <= high
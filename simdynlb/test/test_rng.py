@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from conftest import BASE_CONTEXT
+from simulator import *
+import rng as rng_module
+
+@pytest.fixture
+def random_seed(monkeypatch):
+    # the root seed and the streams are module globals, set back after a test
+    monkeypatch.setattr(rng_module, 'RANDOM_SEED', rng_module.RANDOM_SEED)
+    monkeypatch.setattr(rng_module, 'RANDOM_STREAMS', None)
+    return set_random_seed
+
+def draw_rank_costs(iter, ranks, num_draws=100):
+    return {r: [draw_cost(iter, r, 'delay', 0, 50) for i in range(num_draws)] for r in ranks}
+
+def test_streams_do_not_depend_on_the_order_of_the_ranks(random_seed):
+    random_seed(3)
+    start_random_streams(0)
+    in_order = draw_rank_costs(0, [0, 1, 2])
+    start_random_streams(0)
+    reversed_order = draw_rank_costs(0, [2, 1, 0])
+    start_random_streams(0)
+    alone = draw_rank_costs(0, [1])
+    assert in_order == reversed_order and alone[1] == in_order[1]
+
+def test_streams_differ_by_seed_iteration_rank_and_cost_type(random_seed):
+    random_seed(3)
+    start_random_streams(0)
+    costs = draw_rank_costs(0, [0, 1])
+    assert costs[0] != costs[1]
+    assert [draw_cost(0, 0, 'balancing', 0, 50) for i in range(100)] != costs[0]
+    assert draw_rank_costs(1, [0])[0] != costs[0]
+    random_seed(4)
+    assert draw_rank_costs(0, [0])[0] != costs[0]
+
+def test_costs_drawn_at_once_are_the_ones_drawn_one_by_one(random_seed):
+    lows = np.array([0.0, 2.5, 3.0, 1.2] * 40)
+    highs = np.array([4.0, 2.7, 9.0, 1.9] * 40)
+    start_random_streams(0)
+    one_by_one = [draw_cost(0, 5, 'runtime', low, high) for low, high in zip(lows, highs)]
+    # a range without an integer is not drawn, its middle rounded
+    assert one_by_one[1] == 3 and one_by_one[3] == 2
+    start_random_streams(0)
+    assert draw_costs(0, 5, 'runtime', lows, highs).tolist() == one_by_one
+
+def test_stream_blocks_give_the_generator_values():
+    seed_seq = np.random.SeedSequence(0, spawn_key=(0, 0, 0))
+    values = np.random.Generator(np.random.PCG64(seed_seq)).random(COST_BLOCK_SIZE * 3)
+    stream = CostStream(seed_seq)
+    drawn = [stream.uniform() for i in range(10)] + stream.uniforms(COST_BLOCK_SIZE * 2).tolist()
+    drawn += [stream.uniform() for i in range(COST_BLOCK_SIZE - 10)]
+    assert drawn == values.tolist()
+
+def test_results_do_not_depend_on_the_jobs(tmp_path, monkeypatch, capsys, random_seed):
+    if 'fork' not in mp.get_all_start_methods():
+        pytest.skip('needs the fork start method')
+    monkeypatch.chdir(tmp_path)
+    scenario = Scenario(dict(BASE_CONTEXT, num_iterations=3, random_seed=9,
+                             balancing_strategy='work_stealing,react_offloading'))
+    outputs = []
+    for num_jobs in (1, 2, 3):
+        run_scenario(scenario, simulate, num_jobs)
+        outputs.append(capsys.readouterr().out)
+    assert outputs[0] == outputs[1] == outputs[2]
+    # another seed draws other costs, the results after the context differ
+    run_scenario(Scenario(dict(scenario.to_dict(), random_seed=10)), simulate, 1)
+    other_output = capsys.readouterr().out
+    assert other_output.split('ITERATION: 0')[1] != outputs[0].split('ITERATION: 0')[1]
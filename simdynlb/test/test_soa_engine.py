@@ -0,0 +1,37 @@
+import pytest
+
+from simulator import *
+
+def test_task_ends_at_the_first_tick_reaching_its_end(run_engines, same_results):
+    # a constant task of a rank at slowdown 0.3 takes 333.33 ticks
+    results = run_engines(slowdown_scale=0.3, num_tasks_per_rank=3)
+    same_results(results)
+    local_load = results['soa'][0]
+    assert local_load[0] == pytest.approx(3 * 100 / 0.3)
+    assert local_load[0] != round(local_load[0])
+    # each task ends at tick 334, 668 and 1002, the next one starts there
+    assert results['soa'][2].shape[1] == 1003
+
+@pytest.mark.parametrize('strategy', ['work_stealing', 'react_offloading'])
+@pytest.mark.parametrize('distribution', ['uniform', 'lognormal'])
+def test_engines_give_the_same_loads_with_non_integer_runtimes(run_engines, same_results, strategy, distribution):
+    same_results(run_engines(balancing_strategy=strategy, task_distribution=distribution, slowdown_scale=0.3))
+
+def test_queue_lengths_follow_the_queues():
+    local_queues = [TaskQueue([Task(r * 10 + i, 10.0, 1.0, r) for i in range(2)]) for r in range(3)]
+    remote_queues = [TaskQueue() for r in range(3)]
+    end_tick = np.full(3, NO_TASK_END, dtype=np.int64)
+    end_tick[1] = 5
+    lengths = QueueLengths(local_queues, remote_queues, end_tick)
+
+    local_queues[0].popleft()
+    assert lengths.local_qlen.tolist() == [1, 2, 2] and not lengths.woken
+    # a running rank given a task is not woken, a free one is
+    remote_queues[1].append(local_queues[2].pop())
+    assert not lengths.woken
+    remote_queues[2].append(local_queues[0].pop())
+    assert lengths.woken
+    assert lengths.remot_qlen.tolist() == [0, 1, 1]
+    assert lengths.pop_changed_lengths() == {0: 0, 1: 3, 2: 2}
+    assert lengths.pop_changed_lengths() == {}
+    assert lengths.has_tasks()
@@ -0,0 +1,61 @@
+import pytest
+
+from conftest import BASE_CONTEXT
+from simulator import *
+
+"""A strategy moving the last task of rank 0 to rank 7 at clock 10."""
+class MoveOneTask(BalancingStrategy):
+    def __init__(self, ctx):
+        super().__init__(ctx)
+        self.moved = False
+
+    def on_tick(self, clock):
+        if clock >= 10 and not self.moved:
+            self.ctx.remote_queues[7].append(self.ctx.local_queues[0].pop())
+            self.moved = True
+
+    def next_event_times(self):
+        return [] if self.moved else [10]
+
+def test_nothing_is_balanced_by_default(run_engines, same_results):
+    apply_scenario(Scenario(BASE_CONTEXT))
+    assert SELECTED_STRATEGIES == ['none']
+    results = run_engines()
+    same_results(results)
+    assert results['tick'][1] == [0.0] * BASE_CONTEXT['num_process']
+
+def test_strategies_are_selected_by_name():
+    try:
+        set_balancing_strategies(' work_stealing, react_offloading ')
+        assert SELECTED_STRATEGIES == ['work_stealing', 'react_offloading']
+        with pytest.raises(ValueError, match='unknown balancing strategy stealing'):
+            set_balancing_strategies('stealing')
+        assert SELECTED_STRATEGIES == ['work_stealing', 'react_offloading']
+    finally:
+        set_balancing_strategies(DEFAULT_BALANCING_STRATEGY)
+
+def test_only_the_overridden_hooks_are_called():
+    ctx = BalancingContext([TaskQueue() for i in range(2)], [TaskQueue() for i in range(2)], [None] * 2,
+                           [], [], 0, 100, 2, 2, 0)
+    assert get_strategy_hooks([NoBalancing(ctx)], 'on_tick') == []
+    strategies = [NoBalancing(ctx), MoveOneTask(ctx), ReactOffloading(ctx)]
+    assert [hook.__self__ for hook in get_strategy_hooks(strategies, 'on_tick')] == strategies[1:]
+    assert [hook.__self__ for hook in get_strategy_hooks(strategies, 'is_active')] == strategies[2:]
+
+def test_registered_strategy_runs_on_every_engine(monkeypatch, run_engines, same_results):
+    monkeypatch.setitem(BALANCING_STRATEGIES, 'move_one_task', MoveOneTask)
+    results = run_engines(balancing_strategy='move_one_task')
+    same_results(results)
+    # the moved task of the slowdown rank 0 keeps its runtime
+    remote_load = results['tick'][1]
+    assert remote_load[7] == 100 / 0.5 and sum(remote_load) == remote_load[7]
+
+def test_offload_index_follows_the_buffers():
+    offload_index = OffloadIndex()
+    buffers = [TaskQueue() for i in range(3)]
+    for i in range(3):
+        buffers[i].observe_length(i, offload_index.update)
+    buffers[2].append(Task(0, 1.0, 1.0, 0))
+    buffers[1].append(Task(1, 1.0, 1.0, 0))
+    buffers[2].popleft()
+    assert offload_index.buffered_ranks == {1}
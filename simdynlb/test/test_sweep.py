@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from conftest import BASE_CONTEXT
+from sweep import *
+
+CONTEXT = dict(BASE_CONTEXT, num_process=4, num_slowdown_rank=1, num_tasks_per_rank=5,
+               balancing_strategy='react_offloading')
+GRID = {'balancing_ops_cost': [1, 2], 'noise': [0, 1]}
+
+def test_grid_values_are_parsed():
+    assert parse_grid(['noise=0,1.5', 'balancing_strategy=none,work_stealing']) == \
+            {'noise': [0, 1.5], 'balancing_strategy': ['none', 'work_stealing']}
+
+def test_point_names_hold_the_axes_and_the_context():
+    name = get_point_name(CONTEXT, {'noise': 0, 'migration_batch_size': 4})
+    assert name.startswith('ob2_od2_n0_s0.5_p4_migration_batch_size4_')
+    assert name != get_point_name(dict(CONTEXT, clock_rate=1000), {'noise': 0, 'migration_batch_size': 4})
+
+def test_sweep_gives_the_loads_and_queue_status_of_each_point(tmp_path, capsys):
+    filename = run_sweep(CONTEXT, GRID, 'event', str(tmp_path), 1)
+    res = read_sweep_results(filename)
+    assert len(res['point']) == 4 * 4
+    assert res['balancing_ops_cost'].tolist() == [1] * 8 + [2] * 8
+    assert res['noise'].tolist() == ([0] * 4 + [1] * 4) * 2
+    assert np.array_equal(res['total_load'], res['local_load'] + res['remote_load'])
+
+    # a point gives the results of its scenario
+    point = {'balancing_ops_cost': 2, 'noise': 1}
+    scenario = Scenario(get_point_info(CONTEXT, point))
+    apply_scenario(scenario)
+    local_load, remote_load, recorder = ENGINES['event'](*init_simulation(scenario)[:3], 0, scenario.clock_rate,
+                                                          2, scenario.migration_delay_cost, 1)
+    name = get_point_name(CONTEXT, point)
+    rows = res['point'] == name
+    assert res['local_load'][rows].tolist() == list(local_load)
+    assert res['remote_load'][rows].tolist() == list(remote_load)
+    assert np.array_equal(read_sweep_queue_status(filename, name), get_queue_status_array(recorder))
+
+    # the points on disk are not simulated again
+    capsys.readouterr()
+    run_sweep(CONTEXT, GRID, 'event', str(tmp_path), 1)
+    assert 'Simulate 0 of 4 points' in capsys.readouterr().out
@@ -0,0 +1,84 @@
+import pickle
+
+import numpy as np
+import pytest
+
+from conftest import BASE_CONTEXT
+from simulator import *
+
+def make_table():
+    table = TaskTable(4)
+    table.set_tasks(0, make_task_ids(1, 0, 4), [1.0, 2.0, 3.0, 4.0], [0.5] * 4, [1] * 4)
+    return table
+
+def test_task_views_read_and_write_the_rows():
+    table = make_table()
+    view = table[2]
+    task = Task(int(view.tid), 3.0, 0.5, 1)
+    assert (view.tid, view.dur, view.data, view.local_node, view.remot_node) == \
+            (task.tid, task.dur, task.data, task.local_node, task.remot_node)
+    assert view.tid == (1 << TASK_ID_RANK_SHIFT) + 2
+    for t in (view, task):
+        t.set_time(10.0, 13.0)
+        t.set_remote_node(3)
+        t.set_mig_time(8.0)
+        t.set_arr_time(9.0)
+    assert table.rows[2]['sta_time'] == 10.0 and table.rows[2]['end_time'] == 13.0
+    assert (view.get_end_time(), view.remot_node, view.mig_time, view.arr_time) == \
+            (task.get_end_time(), task.remot_node, task.mig_time, task.arr_time)
+    # the other rows are not changed
+    assert table.remot_node.tolist() == [-1, -1, 3, -1]
+
+def test_tasks_have_no_dict():
+    assert not hasattr(make_table()[0], '__dict__')
+    assert not hasattr(Task(0, 1.0, 1.0, 0), '__dict__')
+
+def test_table_queues_take_the_rows_of_the_table():
+    table = make_table()
+    queue = TableTaskQueue(table, [3, 1])
+    queue.append(table[0])
+    assert [int(task.tid) & 0xffffffff for task in queue] == [3, 1, 0]
+    # the queue grows beyond its first ring buffer
+    for i in range(40):
+        queue.appendleft(table[2])
+    assert len(queue) == 43 and queue.pop().idx == 0 and queue.popleft().idx == 2
+
+def test_tables_are_pickled_with_their_columns():
+    table = make_table()
+    table.dur[1] = 7.0
+    copied = pickle.loads(pickle.dumps(table))
+    assert copied.dur.tolist() == [1.0, 7.0, 3.0, 4.0]
+    copied.dur[0] = 5.0
+    assert copied.rows['dur'][0] == 5.0 and table.dur[0] == 1.0
+
+def test_task_ids_are_checked():
+    assert make_task_ids(2, 3, 5).tolist() == [(2 << 32) + 3, (2 << 32) + 4]
+    with pytest.raises(ValueError):
+        make_task_ids(0, 0, (1 << TASK_ID_RANK_SHIFT) + 1)
+
+def test_restored_workload_starts_from_the_initial_state():
+    workload = create_workload(3, 5, [0], [0.5], 100)
+    queues = workload.restore()
+    initial = [[(int(t.tid), float(t.dur)) for t in q] for q in queues]
+    # an iteration changes the queues and the tasks
+    task = queues[0].pop()
+    task.dur = 1.0
+    task.set_time(4.0, 5.0)
+    task.set_remote_node(2)
+    queues[2].append(task)
+    queues[1].popleft()
+    queues = workload.restore()
+    assert [[(int(t.tid), float(t.dur)) for t in q] for q in queues] == initial
+    assert (workload.table.remot_node == -1).all() and (workload.table.end_time == 0).all()
+
+@pytest.mark.parametrize('strategy', ['work_stealing', 'react_offloading'])
+def test_iterations_on_a_restored_workload_give_the_same_loads(strategy):
+    apply_scenario(Scenario(dict(BASE_CONTEXT, balancing_strategy=strategy)))
+    objects = [TaskQueue([Task(int(t.tid), float(t.dur), float(t.data), int(t.local_node)) for t in q])
+               for q in create_workload(4, 10, [0], [0.5], 100).restore()]
+    workload = create_workload(4, 10, [0], [0.5], 100)
+    loads = [simulate(queues, [0], [0.5], 0, 100, 2, 2, 0)[:2] for queues in (objects, workload, workload)]
+    assert loads[0] == loads[1] == loads[2]
+    assert sum(loads[0][1]) > 0
+    # the queues of objects are copied, not changed
+    assert [len(q) for q in objects] == [10] * 4
@@ -0,0 +1,71 @@
+import random
+
+import numpy as np
+import pytest
+
+from simulator import *
+
+# 8 ranks, 2 per node, 2 nodes per switch: nodes 0-3, switches 0-1
+COST_SCALES = {'intra_node': 0.1, 'intra_switch': 0.5, 'inter_switch': 1.0}
+
+@pytest.fixture
+def topology():
+    set_topology(2, 2, COST_SCALES)
+    yield create_topology(8)
+    set_topology(None)
+    create_topology(8)
+
+def test_levels_and_cost_scales_of_the_ranks(topology):
+    assert topology.node_of == [0, 0, 1, 1, 2, 2, 3, 3]
+    assert topology.switch_of == [0, 0, 0, 0, 1, 1, 1, 1]
+    assert [topology.get_level(0, r) for r in range(8)] == [0, 0, 1, 1, 2, 2, 2, 2]
+    assert [get_cost_scale(2, r) for r in (3, 0, 7, -1)] == [0.1, 0.5, 1.0, 1.0]
+    cost_matrix = topology.get_cost_matrix()
+    assert cost_matrix.shape == (8, 8) and cost_matrix[5, 4] == 0.1 and cost_matrix[5, 1] == 1.0
+
+def test_migration_delay_scales_by_the_level(topology):
+    set_network_model_from_context({})
+    set_migration_cost_model(None)
+    assert [get_migration_delay_cost(1.0, 20, 100, 0, r) for r in (1, 2, 4)] == [2.0, 10.0, 20.0]
+
+def test_wrong_topologies_are_errors():
+    try:
+        with pytest.raises(ValueError):
+            set_topology(0)
+        with pytest.raises(ValueError):
+            set_topology(2, 2, {'intra_rack': 0.5})
+        with pytest.raises(ValueError):
+            set_topology(2, 2, {'intra_node': 0})
+    finally:
+        set_topology(None)
+
+def make_steal_index(topology, busy_ranks):
+    lengths = [5 if r in busy_ranks else 0 for r in range(8)]
+    return StealIndex(lengths, create_network(8, topology), topology)
+
+def test_idle_ranks_are_paired_with_the_closest_busy_ranks(topology):
+    random.seed(1)
+    steal_index = make_steal_index(topology, [1, 3, 6])
+    # node-mates 0-1 and 2-3, 4 on the switch of 6
+    assert sorted(steal_index.pair_closest([4, 2, 0])) == [(1, 0), (3, 2), (6, 4)]
+    # a paired busy rank is not paired again, the next closest is taken
+    pairs = steal_index.pair_closest([0, 2])
+    assert sorted(pairs) == [(1, 0), (3, 2)]
+    pairs = dict((idle, busy) for busy, idle in steal_index.pair_closest([5, 4]))
+    assert pairs[4] == 6 or pairs[5] == 6
+    assert {pairs[4], pairs[5]} <= {1, 3, 6} and pairs[4] != pairs[5]
+    # the busy ranks are back in their groups after the pairing
+    assert sorted(steal_index.busy_ranks) == [1, 3, 6]
+    assert {node: sorted(group) for node, group in steal_index.busy_groups[0][1].items()} == \
+            {0: [1], 1: [3], 3: [6]}
+
+def test_random_pairs_without_topology():
+    random.seed(1)
+    steal_index = StealIndex([5, 0, 5, 0], create_network(4))
+    assert steal_index.busy_groups == []
+    pairs = steal_index.pair_closest([1, 3])
+    assert sorted(idle for busy, idle in pairs) == [1, 3] and sorted(busy for busy, idle in pairs) == [0, 2]
+
+@pytest.mark.parametrize('strategy', ['work_stealing', 'hierarchical_work_stealing'])
+def test_engines_give_the_same_loads_on_a_topology(run_engines, same_results, strategy):
+    same_results(run_engines(balancing_strategy=strategy, ranks_per_node=2, nodes_per_switch=2))
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from simulator import *
+
+SLD_PROCS = [0]
+SLD_SCALES = [0.5]
+CLOCK_RATE = 100
+
+@pytest.fixture
+def speed_model():
+    yield set_rank_speed_model
+    set_rank_speed_model(None)
+
+def get_durs(workload):
+    return [[float(task.dur) for task in queue] for queue in workload.restore()]
+
+def get_baseline_runtime(old_dur, origin, target):
+    # the runtime of a task migrated to a slowdown rank before the speed
+    # ratio, the one of a constant task there: 1/scale * clock_rate
+    if target in SLD_PROCS and origin != target:
+        return 1 / SLD_SCALES[SLD_PROCS.index(target)] * CLOCK_RATE
+    return old_dur
+
+def test_distributions_scale_the_base_runtime():
+    constant = get_durs(create_workload(3, 50, SLD_PROCS, SLD_SCALES, CLOCK_RATE))
+    assert constant == [[200.0] * 50, [100.0] * 50, [100.0] * 50]
+    lognormal = np.array(get_durs(create_workload(3, 5000, SLD_PROCS, SLD_SCALES, CLOCK_RATE,
+                                                   get_task_distribution('lognormal', {'task_dur_sigma': 0.5}))))
+    assert lognormal.mean(axis=1) == pytest.approx([200, 100, 100], rel=0.05)
+    assert (lognormal == np.round(lognormal)).all() and (lognormal >= 1).all()
+    uniform = np.array(get_durs(create_workload(2, 1000, [], [], CLOCK_RATE, get_task_distribution('uniform'))))
+    assert uniform.min() >= 50 and uniform.max() <= 150
+
+def test_imbalance_ratio_is_the_one_of_the_rank_loads():
+    distribution = get_task_distribution('imbalance', {'imbalance_ratio': 1.5})
+    loads = np.array(get_durs(create_workload(6, 10, [], [], CLOCK_RATE, distribution))).sum(axis=1)
+    assert loads.argmax() == 0
+    assert (loads.max() - loads.mean()) / loads.mean() == pytest.approx(1.5, rel=0.02)
+    with pytest.raises(ValueError):
+        create_workload(2, 10, [], [], CLOCK_RATE, get_task_distribution('imbalance', {'imbalance_ratio': 1.5}))
+
+def test_runtimes_do_not_depend_on_the_generation():
+    distribution = get_task_distribution('lognormal')
+    eager = get_durs(create_workload(2, 300, SLD_PROCS, SLD_SCALES, CLOCK_RATE, distribution, 'eager'))
+    lazy = get_durs(create_workload(2, 300, SLD_PROCS, SLD_SCALES, CLOCK_RATE, distribution, 'lazy', block_size=7))
+    assert lazy == eager
+
+def test_lazy_queues_hold_only_their_ends():
+    queue = create_workload(1, 1 << 20, [], [], CLOCK_RATE, generation='lazy', block_size=16).restore()[0]
+    assert len(queue) == 1 << 20
+    assert int(queue.popleft().tid) == 0 and int(queue.pop().tid) == (1 << 20) - 1
+    assert len(queue.front) + len(queue.rear) < 32 and queue.get_num_pending() == (1 << 20) - 32
+
+@pytest.mark.parametrize('scanned', [False, True])
+def test_migrated_runtime_scales_by_the_speed_ratio(speed_model, scanned):
+    speed_model(None if scanned else RankSpeedModel(3, SLD_PROCS, SLD_SCALES, CLOCK_RATE))
+    start_random_streams(0)
+    # a constant task takes the runtime of the baseline
+    assert estimate_new_task_runtime(100.0, SLD_PROCS, SLD_SCALES, 1, 0, 0, CLOCK_RATE) == \
+            get_baseline_runtime(100.0, 1, 0)
+    # the tasks of other runtimes keep their ratio, not the baseline one
+    lognormal = get_durs(create_workload(3, 20, SLD_PROCS, SLD_SCALES, CLOCK_RATE, get_task_distribution('lognormal')))
+    new_durs = [estimate_new_task_runtime(old_dur, SLD_PROCS, SLD_SCALES, 1, 0, 0, CLOCK_RATE) for old_dur in lognormal[1]]
+    assert new_durs == [max(1, round(old_dur / 0.5)) for old_dur in lognormal[1]]
+    assert [get_baseline_runtime(old_dur, 1, 0) for old_dur in lognormal[1]] == [200.0] * 20
+    assert len(set(new_durs)) > 1
+    assert estimate_new_task_runtime(37.0, SLD_PROCS, SLD_SCALES, 1, 2, 0, CLOCK_RATE) == 37.0
+
+def test_unknown_workload_settings_are_errors():
+    with pytest.raises(ValueError):
+        get_task_distribution('normal')
+    with pytest.raises(ValueError):
+        create_workload(2, 10, [], [], CLOCK_RATE, generation='streamed')
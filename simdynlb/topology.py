@@ -0,0 +1,121 @@
+"""Hierarchical topology of the ranks: ranks on nodes, nodes on switches.
+
+The cost of a message or a migration between two ranks depends on how far
+apart they are, a scale of the flat cost per level:
+    - intra-node: the ranks are on the same node, e.g., 0.1 (10x cheaper)
+    - intra-switch: on different nodes of the same switch
+    - inter-switch: on nodes of different switches
+The ranks are placed in order, ranks_per_node ranks per node and
+nodes_per_switch nodes per switch (all nodes on one switch if not given).
+The scales are precomputed as a nodes x nodes matrix, so the cost scale of
+a pair of ranks is two lookups, without a ranks x ranks matrix.
+
+The topology is set by the ranks_per_node, nodes_per_switch and
+*_cost_scale values of the context, and created for the ranks of a
+simulation by the balancing context. The network (network.py) scales its
+latency and the migrator its migration delay by get_cost_scale(sender,
+receiver). The hierarchical work stealing pairs idle ranks with busy ranks
+on the same node first, then on the same switch, then any busy rank.
+"""
+
+import numpy as np
+
+# -----------------------------------------------------
+# Constant Definition
+# -----------------------------------------------------
+TOPOLOGY_LEVELS = ['intra_node', 'intra_switch', 'inter_switch']
+DEFAULT_COST_SCALES = {'intra_node': 0.1, 'intra_switch': 1.0, 'inter_switch': 1.0}
+TOPOLOGY_SETTING = None # (ranks_per_node, nodes_per_switch, cost_scales), None: flat
+TOPOLOGY = None         # the Topology of the current simulation, None: flat
+
+# -----------------------------------------------------
+# Util Functions
+# -----------------------------------------------------
+def set_topology(ranks_per_node, nodes_per_switch=None, cost_scales=None):
+    """Group ranks_per_node ranks per node and nodes_per_switch nodes per
+    switch, with the cost scales per level in TOPOLOGY_LEVELS. A None
+    ranks_per_node: all ranks are apart at the same cost."""
+    global TOPOLOGY_SETTING, TOPOLOGY
+    TOPOLOGY = None
+    if ranks_per_node is None:
+        TOPOLOGY_SETTING = None
+        return
+    if ranks_per_node <= 0 or (nodes_per_switch is not None and nodes_per_switch <= 0):
+        raise ValueError('ranks_per_node and nodes_per_switch should be positive, got {} and {}'.format(
+                            ranks_per_node, nodes_per_switch))
+    scales = dict(DEFAULT_COST_SCALES)
+    if cost_scales is not None:
+        for level, scale in cost_scales.items():
+            if level not in DEFAULT_COST_SCALES:
+                raise ValueError('unknown topology level {}, should be one of {}'.format(level, TOPOLOGY_LEVELS))
+            if scale is not None:
+                if scale <= 0:
+                    raise ValueError('cost scale of {} should be positive, got {}'.format(level, scale))
+                scales[level] = scale
+    TOPOLOGY_SETTING = (ranks_per_node, nodes_per_switch, scales)
+
+def set_topology_from_context(context_info):
+    """Set the topology by the optional ranks_per_node, nodes_per_switch,
+    intra_node_cost_scale, intra_switch_cost_scale and inter_switch_cost_scale
+    values of the context, the missing ones are the defaults."""
+    set_topology(context_info.get('ranks_per_node', None), context_info.get('nodes_per_switch', None),
+                    {level: context_info.get(level + '_cost_scale', None) for level in TOPOLOGY_LEVELS})
+
+def create_topology(num_procs):
+    """Create the topology of the setting for num_procs ranks, as the one of
+    the current simulation, None if the ranks are flat."""
+    global TOPOLOGY
+    if TOPOLOGY_SETTING is None:
+        TOPOLOGY = None
+    elif TOPOLOGY is None or TOPOLOGY.num_procs != num_procs:
+        ranks_per_node, nodes_per_switch, scales = TOPOLOGY_SETTING
+        TOPOLOGY = Topology(num_procs, ranks_per_node, nodes_per_switch, scales)
+    return TOPOLOGY
+
+def get_cost_scale(sender, receiver):
+    """Get the cost scale between two ranks in the current topology."""
+    if TOPOLOGY is None:
+        return 1.0
+    return TOPOLOGY.get_cost_scale(sender, receiver)
+
+"""Class Topology holds the placement of the ranks
+    - node_of, switch_of: the node and the switch per rank (lists)
+    - node_scales: nodes x nodes, the cost scale between two nodes
+    - get_level(a, b), get_cost_scale(a, b): the level (index in
+      TOPOLOGY_LEVELS) and the cost scale of two ranks, 1.0 if one is -1
+      (any rank)
+"""
+class Topology:
+    def __init__(self, num_procs, ranks_per_node, nodes_per_switch=None, cost_scales=DEFAULT_COST_SCALES):
+        self.num_procs = num_procs
+        self.ranks_per_node = ranks_per_node
+        self.nodes_per_switch = nodes_per_switch
+        self.cost_scales = [cost_scales[level] for level in TOPOLOGY_LEVELS]
+        num_nodes = (num_procs + ranks_per_node - 1) // ranks_per_node
+        nodes = np.arange(num_procs) // ranks_per_node
+        if nodes_per_switch is None:
+            node_switches = np.zeros(num_nodes, dtype=np.int64)
+        else:
+            node_switches = np.arange(num_nodes) // nodes_per_switch
+        self.node_of = nodes.tolist()
+        self.switch_of = node_switches[nodes].tolist()
+
+        # the level and the cost scale of each pair of nodes
+        node_levels = np.where(node_switches[:, None] == node_switches[None, :], 1, 2)
+        np.fill_diagonal(node_levels, 0)
+        self.node_levels = node_levels
+        self.node_scales = np.asarray(self.cost_scales)[node_levels]
+        self.node_scales_list = self.node_scales.tolist()
+
+    def get_level(self, sender, receiver):
+        return int(self.node_levels[self.node_of[sender], self.node_of[receiver]])
+
+    def get_cost_scale(self, sender, receiver):
+        if sender < 0 or receiver < 0:
+            return 1.0
+        return self.node_scales_list[self.node_of[sender]][self.node_of[receiver]]
+
+    def get_cost_matrix(self):
+        """The ranks x ranks cost scales, e.g., for a latency matrix."""
+        nodes = np.asarray(self.node_of)
+        return self.node_scales[nodes[:, None], nodes[None, :]]
@@ -0,0 +1,349 @@
+"""Workload generation of the simulator: the tasks of each rank by a
+distribution of their runtime.
+
+The runtime of a task is the base one of its rank (1 second, divided by the
+slowdown scale on a slowdown rank, in clock ticks) times factors of a
+distribution in TASK_DISTRIBUTIONS:
+    - constant: all tasks take the base runtime
+    - uniform: a factor in [task_dur_low, task_dur_high] per task
+    - lognormal: a factor exp(sigma * z - sigma^2 / 2) per task, mean 1
+    - imbalance: a factor per rank by the imbalance ratio, rank 0 has the
+      max load, as generate_uniform_tasks of distributed_lb_problem
+The runtimes of the random distributions are rounded to clock ticks.
+
+The runtimes of a rank are drawn in blocks of TASK_DRAW_BLOCK_SIZE tasks,
+a block by its own Generator keyed by (rank, block), so a task gets the
+same runtime whenever and from whichever end of the queue it is generated,
+and the tasks are generated in blocks of task_block_size tasks:
+    - eager: all tasks are put in a TaskTable once (task.Workload)
+    - lazy: a LazyTaskQueue per rank holds only the blocks at its front and
+      rear, the tasks in between are counted and generated when the queue
+      drains to them, so the memory does not grow with the tasks per rank
+    - auto: lazy from LAZY_WORKLOAD_MIN_TASKS tasks in total
+The task ids are 64-bit, (rank << 32) + the index of the task on its rank.
+
+  Typical usage example:
+  workload = create_workload(num_procs, num_tasks, sld_procs, sld_scales, clock_rate,
+                                get_task_distribution('lognormal', {'task_dur_sigma': 0.5}), 'lazy')
+  local_queues = restore_local_queues(workload)
+"""
+
+import numpy as np
+from collections import deque
+
+from task import *
+from rng import *
+
+# -----------------------------------------------------
+# Constant Definition
+# -----------------------------------------------------
+TASK_BLOCK_SIZE = 4096              # tasks of a rank generated at once
+TASK_DRAW_BLOCK_SIZE = 4096         # runtimes of a rank drawn by a Generator
+LAZY_WORKLOAD_MIN_TASKS = 1 << 22   # tasks from which the auto generation is lazy
+WORKLOAD_GENERATIONS = ['auto', 'eager', 'lazy']
+TASK_DATA_SIZE = 1.0                # MB
+
+# -----------------------------------------------------
+# Distributions of the task runtime
+# -----------------------------------------------------
+"""Class TaskDistribution gives the runtime factors of the tasks, with its
+parameters from a dict or a scenario, e.g., {"task_dur_sigma": 0.5}
+    - get_rank_factors(num_procs, seed): a factor per rank
+    - sample(seed, key, num): a factor per task of the block with the key
+      (rank, block), None if all are 1
+    - rounded: the runtimes are rounded to clock ticks
+"""
+class TaskDistribution:
+    rounded = True
+
+    def __init__(self, params):
+        pass
+
+    def get_rank_factors(self, num_procs, seed):
+        return np.ones(num_procs, dtype=np.float64)
+
+    def sample(self, seed, key, num):
+        return None
+
+
+class ConstantDistribution(TaskDistribution):
+    rounded = False
+
+
+class UniformDistribution(TaskDistribution):
+    def __init__(self, params):
+        self.low = params.get('task_dur_low', 0.5)
+        self.high = params.get('task_dur_high', 1.5)
+        if not 0 < self.low <= self.high:
+            raise ValueError('task_dur_low and task_dur_high should be 0 < low <= high, got {} and {}'.format(
+                                self.low, self.high))
+
+    def sample(self, seed, key, num):
+        return get_workload_generator(seed, key).uniform(self.low, self.high, num)
+
+
+class LognormalDistribution(TaskDistribution):
+    def __init__(self, params):
+        self.sigma = params.get('task_dur_sigma', 0.5)
+        if self.sigma < 0:
+            raise ValueError('task_dur_sigma should be non-negative, got {}'.format(self.sigma))
+
+    def sample(self, seed, key, num):
+        z = get_workload_generator(seed, key).standard_normal(num)
+        return np.exp(self.sigma * z - self.sigma**2 / 2)
+
+
+class ImbalanceDistribution(TaskDistribution):
+    def __init__(self, params):
+        self.ratio = params.get('imbalance_ratio', 1.0)
+        if self.ratio < 0:
+            raise ValueError('imbalance_ratio should be non-negative, got {}'.format(self.ratio))
+
+    def get_rank_factors(self, num_procs, seed):
+        # the load of rank 0 is the max one (1.0), the other ranks share the
+        # rest of the average load: R1 takes 10-50% of it, the next ranks
+        # 20-70% of what is left, the last rank the remainder
+        if num_procs > 1 and self.ratio > num_procs - 1:
+            raise ValueError('imbalance_ratio should be at most num_process - 1 = {}, got {}'.format(
+                                num_procs - 1, self.ratio))
+        generator = get_workload_generator(seed)
+        loads = np.zeros(num_procs, dtype=np.float64)
+        loads[0] = 1.0
+        avg_load = 1.0 / (self.ratio + 1)
+        sum_loads = avg_load * num_procs - 1.0
+        for i in range(1, num_procs):
+            if i == num_procs - 1:
+                loads[i] = sum_loads - np.sum(loads[1:i])
+            elif i == 1:
+                loads[i] = generator.uniform(0.1 * sum_loads, 0.5 * sum_loads)
+            else:
+                left_loads = sum_loads - np.sum(loads[1:i])
+                loads[i] = generator.uniform(0.2 * left_loads, 0.7 * left_loads)
+        return loads
+
+
+TASK_DISTRIBUTIONS = {
+    'constant': ConstantDistribution,
+    'uniform': UniformDistribution,
+    'lognormal': LognormalDistribution,
+    'imbalance': ImbalanceDistribution
+}
+
+# -----------------------------------------------------
+# Util Functions
+# -----------------------------------------------------
+def get_task_distribution(name, params={}):
+    """Create a distribution of TASK_DISTRIBUTIONS, the missing parameters
+    are the defaults."""
+    if name not in TASK_DISTRIBUTIONS:
+        raise ValueError('unknown task distribution {}, should be one of {}'.format(
+                            name, list(TASK_DISTRIBUTIONS.keys())))
+    return TASK_DISTRIBUTIONS[name](params)
+
+def create_workload(num_procs, num_tasks, sld_procs, sld_scales, clock_rate, distribution=None,
+                        generation='auto', block_size=TASK_BLOCK_SIZE):
+    """Create the workload of a simulation, a Workload of all tasks or a
+    LazyWorkload by the generation mode in WORKLOAD_GENERATIONS."""
+    if distribution is None:
+        distribution = ConstantDistribution({})
+    generator = TaskGenerator(num_procs, num_tasks, sld_procs, sld_scales, clock_rate, distribution, block_size)
+    return create_generated_workload(generator, generation)
+
+def create_generated_workload(generator, generation='auto'):
+    """Create the workload of the tasks of a generator, e.g., a TaskGenerator
+    or a TraceTaskGenerator (replay.py)."""
+    if generation not in WORKLOAD_GENERATIONS:
+        raise ValueError('unknown workload generation {}, should be one of {}'.format(
+                            generation, WORKLOAD_GENERATIONS))
+    if generation == 'lazy' or (generation == 'auto' and generator.get_total_tasks() >= LAZY_WORKLOAD_MIN_TASKS):
+        return LazyWorkload(generator)
+    return generator.make_workload()
+
+# -----------------------------------------------------
+# Generators
+# -----------------------------------------------------
+"""Class TaskGenerator draws the tasks of the ranks block by block
+    - base_durs: the runtime of a task per rank before the distribution
+    - get_num_tasks(rank), get_total_tasks(): the tasks of a rank, of all
+    - get_block_durs(rank, block): the runtimes of a draw block of tasks
+    - get_durs(rank, start, end), get_data(rank, start, end): the runtimes
+      and data sizes of the tasks start..end-1 of a rank
+    - make_tasks(rank, start, end): the Tasks start..end-1 of a rank
+    - make_workload(): all tasks in a TaskTable, as task.Workload
+"""
+class TaskGenerator:
+    def __init__(self, num_procs, num_tasks, sld_procs, sld_scales, clock_rate, distribution, block_size):
+        self.num_procs = num_procs
+        self.num_tasks = num_tasks
+        self.distribution = distribution
+        self.block_size = block_size
+        # the seed of the scenario, also in forked or spawned processes
+        self.seed = RANDOM_SEED
+        make_task_ids(0, 0, num_tasks) # check the number of tasks
+
+        base_durs = np.ones(num_procs, dtype=np.float64)
+        for i in range(len(sld_procs)):
+            base_durs[sld_procs[i]] = 1.0 / sld_scales[i]
+        self.base_durs = base_durs * clock_rate * distribution.get_rank_factors(num_procs, self.seed)
+
+    def get_num_tasks(self, rank):
+        return self.num_tasks
+
+    def get_total_tasks(self):
+        return self.num_procs * self.num_tasks
+
+    def get_block_durs(self, rank, block):
+        start = block * TASK_DRAW_BLOCK_SIZE
+        num = min(self.num_tasks, start + TASK_DRAW_BLOCK_SIZE) - start
+        factors = self.distribution.sample(self.seed, (rank, block), num)
+        if factors is None:
+            durs = np.full(num, self.base_durs[rank])
+        else:
+            durs = self.base_durs[rank] * factors
+        if self.distribution.rounded:
+            durs = np.maximum(1, np.round(durs))
+        return durs
+
+    def get_durs(self, rank, start, end):
+        blocks = range(start // TASK_DRAW_BLOCK_SIZE, (end - 1) // TASK_DRAW_BLOCK_SIZE + 1)
+        durs = np.concatenate([self.get_block_durs(rank, b) for b in blocks])
+        offset = blocks[0] * TASK_DRAW_BLOCK_SIZE
+        return durs[start - offset:end - offset]
+
+    def get_data(self, rank, start, end):
+        return np.full(end - start, TASK_DATA_SIZE)
+
+    def make_tasks(self, rank, start, end):
+        if end <= start:
+            return []
+        tids = make_task_ids(rank, start, end).tolist()
+        durs = self.get_durs(rank, start, end).tolist()
+        data = self.get_data(rank, start, end).tolist()
+        return [Task(tids[i], durs[i], data[i], rank) for i in range(end - start)]
+
+    def make_workload(self):
+        task_table = TaskTable(self.get_total_tasks())
+        queue_ids = []
+        start = 0
+        for r in range(self.num_procs):
+            num_tasks = self.get_num_tasks(r)
+            if num_tasks > 0:
+                task_table.set_tasks(start, make_task_ids(r, 0, num_tasks), self.get_durs(r, 0, num_tasks),
+                                        self.get_data(r, 0, num_tasks), r)
+            queue_ids.append(np.arange(start, start + num_tasks))
+            start += num_tasks
+        return Workload(task_table, queue_ids)
+
+
+"""Class LazyWorkload is the workload of a generator without tasks
+    - restore() gives a fresh LazyTaskQueue per rank, as Workload
+"""
+class LazyWorkload:
+    def __init__(self, generator):
+        self.generator = generator
+
+    def __len__(self):
+        return self.generator.num_procs
+
+    def restore(self):
+        return [LazyTaskQueue(self.generator, r) for r in range(self.generator.num_procs)]
+
+
+"""Class LazyTaskQueue is the local queue of a rank with the tasks not yet
+generated in the middle: front + pending tasks + rear.
+    - front, rear: the generated tasks, the tasks appended by migrations go
+      to the rear after the pending ones
+    - next_task, end_task: the pending tasks next_task..end_task-1 of the
+      rank, a block of them is generated when the queue is accessed there
+    - same functions as TaskQueue, the pending tasks are never marked for
+      migration, so the migration cursor does not generate them
+"""
+class LazyTaskQueue(MigrationCursor, LengthObservers):
+    def __init__(self, generator, rank):
+        self.generator = generator
+        self.rank = rank
+        self.front = deque()
+        self.rear = deque()
+        self.next_task = 0
+        self.end_task = generator.get_num_tasks(rank)
+        self.num_marked_rear = 0
+
+    def get_num_pending(self):
+        return self.end_task - self.next_task
+
+    def __len__(self):
+        return len(self.front) + self.end_task - self.next_task + len(self.rear)
+
+    def fill_front(self):
+        # the pending tasks up to the end of the block of the next one
+        block_size = self.generator.block_size
+        end = min(self.end_task, (self.next_task // block_size + 1) * block_size)
+        self.front.extend(self.generator.make_tasks(self.rank, self.next_task, end))
+        self.next_task = end
+
+    def fill_rear(self):
+        # the pending tasks from the beginning of the block of the last one
+        block_size = self.generator.block_size
+        start = max(self.next_task, (self.end_task - 1) // block_size * block_size)
+        self.rear.extendleft(reversed(self.generator.make_tasks(self.rank, start, self.end_task)))
+        self.end_task = start
+
+    def get_position(self, idx):
+        size = len(self)
+        if idx < 0:
+            idx += size
+        if idx < 0 or idx >= size:
+            raise IndexError('LazyTaskQueue index out of range')
+        return idx
+
+    def __getitem__(self, idx):
+        idx = self.get_position(idx)
+        while len(self.front) <= idx < len(self.front) + self.get_num_pending():
+            # generate from the end of the queue closer to the index
+            if idx - len(self.front) < self.get_num_pending() // 2:
+                self.fill_front()
+            else:
+                self.fill_rear()
+        if idx < len(self.front):
+            return self.front[idx]
+        return self.rear[idx - len(self.front) - self.get_num_pending()]
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self[idx]
+
+    def is_marked(self, idx):
+        idx = self.get_position(idx)
+        if len(self.front) <= idx < len(self.front) + self.get_num_pending():
+            return False
+        return self[idx].remot_node != -1
+
+    def append(self, task):
+        self.rear.append(task)
+        self.cursor_on_append(task.remot_node != -1)
+        if self.length_observers:
+            self.notify_length()
+
+    def appendleft(self, task):
+        num_marked_rear = min(self.num_marked_rear, len(self))
+        self.front.appendleft(task)
+        self.cursor_on_appendleft(task.remot_node != -1, num_marked_rear)
+        if self.length_observers:
+            self.notify_length()
+
+    def popleft(self):
+        if len(self.front) == 0 and self.get_num_pending() != 0:
+            self.fill_front()
+        task = self.front.popleft() if len(self.front) != 0 else self.rear.popleft()
+        if self.length_observers:
+            self.notify_length()
+        return task
+
+    def pop(self):
+        if len(self.rear) == 0 and self.get_num_pending() != 0:
+            self.fill_rear()
+        task = self.rear.pop() if len(self.rear) != 0 else self.front.pop()
+        self.cursor_on_pop(task.remot_node != -1)
+        if self.length_observers:
+            self.notify_length()
+        return task